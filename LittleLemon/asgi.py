@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LittleLemon.settings')
+# Sin conexiones persistentes salvo que se pida: cada request ASGI usa un hilo distinto para el ORM
+# y dejaría abierta una conexión por hilo
+os.environ.setdefault('LITTLELEMON_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,13 @@
+"""
+URLconf for GET requests served under ASGI (see LittleLemonAPI.middleware.AsyncReadsMiddleware).
+
+The async read views come first; every other URL falls through to the regular urlpatterns.
+"""
+from django.urls import include, path
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/', include('LittleLemonAPI.async_urls')),
+    *sync_urlpatterns,
+]
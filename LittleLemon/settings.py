@@ -10,9 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 import rest_framework
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,6 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'LittleLemonAPI.middleware.QueryStatsMiddleware',
+    'LittleLemonAPI.middleware.AsyncReadsMiddleware',
+    'LittleLemonAPI.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,10 +86,111 @@ WSGI_APPLICATION = 'LittleLemon.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('LITTLELEMON_DB_NAME', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Perfil de base de datos: LITTLELEMON_DB_PROFILE=production activa WAL, busy_timeout,
+# synchronous=NORMAL, caché/mmap más grandes y conexiones persistentes. Los PRAGMA se
+# aplican en cada conexión nueva (init_command) y las transacciones empiezan con
+# BEGIN IMMEDIATE para que los escritores esperen al lock en vez de fallar al subirlo
+DATABASE_PROFILE = os.environ.get('LITTLELEMON_DB_PROFILE', 'default')
+
+SQLITE_PRODUCTION_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=20000',
+    'PRAGMA cache_size=-65536',     # 64 MiB
+    'PRAGMA mmap_size=268435456',   # 256 MiB
+    'PRAGMA temp_store=MEMORY',
+]
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update({
+        # Segundos que se reutiliza cada conexión (LITTLELEMON_CONN_MAX_AGE). asgi.py lo deja en 0:
+        # bajo ASGI cada request hace sus queries en un hilo propio y la conexión no se reutilizaría
+        'CONN_MAX_AGE': int(os.environ.get('LITTLELEMON_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': '; '.join(SQLITE_PRODUCTION_PRAGMAS),
+        },
+    })
+elif DATABASE_PROFILE != 'default':
+    raise ImproperlyConfigured(f"Unknown LITTLELEMON_DB_PROFILE '{DATABASE_PROFILE}' (use 'default' or 'production')")
+
+# Reintentos de los endpoints de escritura cuando SQLite devuelve "database is locked"
+DB_BUSY_RETRIES = 3
+DB_BUSY_BACKOFF = 0.05
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'littlelemon',
+    }
+}
+
+# Segundos que se guardan en caché los grupos (roles) de cada usuario
+ROLE_CACHE_TTL = 60
+
+# Tokens ya resueltos (LittleLemonAPI.authentication.CachedTokenAuthentication): LRU por proceso
+# con TTL corto y, si CACHES apunta a una caché compartida entre procesos (no LocMemCache), también
+# en ella. Logout y cambios en el usuario los invalidan al momento en el proceso que los atiende y
+# en la caché compartida; los demás procesos pueden aceptar el token hasta TOKEN_CACHE_LOCAL_TTL s más
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_LOCAL_TTL = 5
+TOKEN_CACHE_TTL = 300
+
+# Segundos que se guardan las páginas serializadas de menu-items y categories
+# (se invalidan antes al cambiar la versión del catálogo)
+CATALOG_CACHE_TIMEOUT = 300
+
+# Contador de queries SQL por request (LittleLemonAPI.middleware.QueryStatsMiddleware):
+# se agrega por endpoint en /api/stats/ y, con QUERY_STATS_HEADERS, se devuelve en
+# las cabeceras X-Query-Count y Server-Timing
+QUERY_STATS_ENABLED = True
+QUERY_STATS_HEADERS = DEBUG
+
+# Bajo ASGI (LittleLemon/asgi.py), los GET de menú, categorías, carrito y pedidos se sirven con
+# las vistas async de LittleLemonAPI/async_views.py (LittleLemonAPI.middleware.AsyncReadsMiddleware)
+ASYNC_READS_ENABLED = True
+
+# Asignación automática en el checkout al repartidor con menos pedidos abiertos
+# (LittleLemonAPI/dispatch.py). Los contadores en memoria se recargan de la base de datos
+# cada DISPATCH_RESYNC_INTERVAL segundos para recoger los cambios de otros procesos
+AUTO_DISPATCH_ENABLED = True
+DISPATCH_RESYNC_INTERVAL = 30
+
+# Control de admisión de las escrituras de carrito y checkout (LittleLemonAPI/admission.py):
+# token bucket por usuario (tokens por segundo, ráfaga) según su rol -> 429, y load shedding
+# cuando hay demasiadas escrituras en curso en el proceso o el p95 de sus queries en los
+# últimos LOAD_SHEDDING_WINDOW segundos supera LOAD_SHEDDING_DB_P95_MS -> 503. Ambos con Retry-After
+ADMISSION_CONTROL_ENABLED = True
+THROTTLE_RATES_PER_ROLE = {
+    'customer': (2, 20),
+    'delivery_crew': (5, 40),
+    'manager': (20, 100),
+}
+LOAD_SHEDDING_MAX_IN_FLIGHT = 32
+LOAD_SHEDDING_DB_P95_MS = 250
+LOAD_SHEDDING_WINDOW = 10
+LOAD_SHEDDING_RETRY_AFTER = 1
+
+# Compresión de respuestas (LittleLemonAPI.middleware.CompressionMiddleware): gzip o deflate
+# según Accept-Encoding, solo para cuerpos de al menos COMPRESSION_MIN_SIZE bytes.
+# Nivel 1: en los listados JSON ocupa ~20% más que el 6 con la quinta parte de CPU (bench_render)
+COMPRESSION_ENABLED = True
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_LEVEL = 1
+
+# La API navegable (BrowsableAPIRenderer) no se ofrece con el perfil de producción
+BROWSABLE_API_ENABLED = DATABASE_PROFILE != 'production'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,9 +236,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
         'DEFAULT_AUTHENTICATION_CLASSES': (
-            'rest_framework.authentication.TokenAuthentication',
+            'LittleLemonAPI.authentication.CachedTokenAuthentication',
             'rest_framework.authentication.SessionAuthentication',
         ),
+        'DEFAULT_RENDERER_CLASSES': [
+            'LittleLemonAPI.renderers.CompactJSONRenderer',
+            *(['rest_framework.renderers.BrowsableAPIRenderer'] if BROWSABLE_API_ENABLED else []),
+        ],
         'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
         'PAGE_SIZE': 2,  # Número de elementos por página
         'DEFAULT_FILTER_BACKENDS': [
@@ -0,0 +1,203 @@
+import math
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+from django.conf import settings
+from django.db import connection
+from rest_framework import exceptions, status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from .roles import get_roles, MANAGER, DELIVERY_CREW
+
+# Control de admisión de las escrituras de carrito y checkout: un token bucket por usuario con
+# ritmo y ráfaga según su rol (429) y, por encima, load shedding del proceso según las escrituras
+# en curso y el p95 reciente de las queries de estas vistas (503). Los rechazos son inmediatos y
+# llevan Retry-After, en lugar de esperar el lock de escritura de SQLite hasta agotar el timeout.
+# Todo vive en memoria del proceso: con varios workers cada uno aplica sus propios límites.
+# Los ritmos por rol salen solo de settings.THROTTLE_RATES_PER_ROLE
+
+CUSTOMER = 'customer'
+
+# Buckets en memoria como máximo (los más antiguos se descartan: volverán llenos)
+MAX_BUCKETS = 10000
+# Latencias de query recientes para el p95
+LATENCY_SAMPLES = 512
+# Por debajo de este número de muestras en la ventana no se calcula p95 (sin señal)
+MIN_LATENCY_SAMPLES = 20
+
+
+def role_of(user):
+    # Rol que decide el presupuesto; el superusuario cuenta como manager
+    roles = get_roles(user)
+    if user.is_superuser or MANAGER in roles:
+        return 'manager'
+    if DELIVERY_CREW in roles:
+        return 'delivery_crew'
+    return CUSTOMER
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now):
+        # Gasta un token; devuelve 0 si lo había o los segundos hasta el siguiente
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Overloaded(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Service temporarily overloaded, try again later.'
+    default_code = 'overloaded'
+
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = wait  # el exception handler de DRF lo devuelve en Retry-After
+
+
+class AdmissionController:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)  # (instante, segundos)
+        self._p95 = 0.0
+        self._p95_at = 0.0
+        self.in_flight = 0
+        self.counters = Counter()
+
+    def throttle(self, role, key):
+        # Segundos que debe esperar el usuario (0 = admitido)
+        rate, burst = settings.THROTTLE_RATES_PER_ROLE[role]
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, burst, now)
+                if len(self._buckets) > MAX_BUCKETS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.take(now)
+            if wait:
+                self.counters[f'throttled_{role}'] += 1
+        return wait
+
+    def admit(self):
+        # Admite una escritura o lanza Overloaded; cada admit() exitoso necesita su release()
+        retry_after = getattr(settings, 'LOAD_SHEDDING_RETRY_AFTER', 1)
+        with self._lock:
+            if self.in_flight >= getattr(settings, 'LOAD_SHEDDING_MAX_IN_FLIGHT', 32):
+                self.counters['shed_in_flight'] += 1
+                raise Overloaded(retry_after)
+            if self._db_p95(time.monotonic()) * 1000 > getattr(settings, 'LOAD_SHEDDING_DB_P95_MS', 250):
+                self.counters['shed_db_latency'] += 1
+                raise Overloaded(retry_after)
+            self.in_flight += 1
+            self.counters['admitted'] += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_query(self, seconds):
+        self._latencies.append((time.monotonic(), seconds))  # deque.append es atómico
+
+    def _db_p95(self, now):
+        # Recalculado como mucho cada 100 ms con las muestras de la ventana
+        if now - self._p95_at > 0.1:
+            window = getattr(settings, 'LOAD_SHEDDING_WINDOW', 10)
+            recent = sorted(seconds for at, seconds in list(self._latencies) if now - at <= window)
+            self._p95 = recent[math.ceil(len(recent) * 0.95) - 1] if len(recent) >= MIN_LATENCY_SAMPLES else 0.0
+            self._p95_at = now
+        return self._p95
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'db_p95_ms': round(self._db_p95(time.monotonic()) * 1000, 3),
+                **{name: self.counters[name] for name in (
+                    'admitted', 'shed_in_flight', 'shed_db_latency',
+                    *(f'throttled_{role}' for role in settings.THROTTLE_RATES_PER_ROLE),
+                )},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._latencies.clear()
+            self._p95 = self._p95_at = 0.0
+            self.counters.clear()
+
+
+controller = AdmissionController()
+
+
+def admission_stats():
+    return controller.stats()
+
+
+def reset_admission():
+    controller.reset()
+
+
+class RoleRateThrottle(BaseThrottle):
+    # Throttle de DRF sobre el token bucket del usuario; las lecturas no gastan tokens
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS or not getattr(settings, 'ADMISSION_CONTROL_ENABLED', True):
+            return True
+        user = request.user
+        role = role_of(user)
+        self.wait_time = controller.throttle(role, (role, user.pk if user.is_authenticated else self.get_ident(request)))
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time
+
+
+class _QueryTimer:
+    # execute_wrapper: alimenta el p95 con las queries de las vistas con control de admisión
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            controller.record_query(time.perf_counter() - start)
+
+
+_query_timer = _QueryTimer()
+
+
+class AdmissionControlMixin:
+    # Para APIView: throttling por rol y load shedding en las escrituras (tras autenticar y
+    # comprobar permisos, para no gastar tokens en requests que se iban a rechazar igualmente)
+    throttle_classes = [RoleRateThrottle]
+
+    def dispatch(self, request, *args, **kwargs):
+        with connection.execute_wrapper(_query_timer):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS and getattr(settings, 'ADMISSION_CONTROL_ENABLED', True):
+            controller.admit()
+            request._admitted = True
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # DRF la llama siempre, también cuando la vista lanza una excepción
+        if getattr(request, '_admitted', False):
+            request._admitted = False
+            controller.release()
+        return super().finalize_response(request, response, *args, **kwargs)
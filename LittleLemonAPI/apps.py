@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class LittlelemonapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'LittleLemonAPI'
+
+    def ready(self):
+        # Registra los receivers que invalidan las cachés de tokens, roles y catálogo
+        # y los que mantienen al día el dispatcher de repartidores y los rollups de ventas
+        from . import authentication, catalog, dispatch, roles, rollups  # noqa: F401
@@ -0,0 +1,11 @@
+from django.urls import path
+from . import async_views
+
+# Lecturas async (solo GET bajo ASGI, ver AsyncReadsMiddleware). Mismos paths y nombres que en urls.py
+urlpatterns = [
+    path('menu-items/', async_views.MenuItemView.as_view(), name='menu-items'),
+    path('menu-items/<int:pk>/', async_views.MenuItemDetailView.as_view(), name='menu-item-detail'),
+    path('cart/menu-items/', async_views.CartView.as_view(), name='cart'),
+    path('orders/', async_views.OrderView.as_view(), name='orders'),
+    path('categories/', async_views.CategoryView.as_view(), name='categories'),
+]
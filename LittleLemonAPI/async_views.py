@@ -0,0 +1,157 @@
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.filters import OrderingFilter
+from rest_framework.request import Request
+
+from .authentication import CachedTokenAuthentication
+from .catalog import acatalog_fingerprint, page_cache_key, conditional_page, cached_page, store_page
+from .models import MenuItem, Category, Cart, Order
+from .pagination import AsyncPageNumberPagination, KeysetPagination
+from .renderers import CompactJSONRenderer
+from .roles import aget_roles, MANAGER, DELIVERY_CREW
+from .search import MenuItemSearchFilter
+from .serializers import menu_item_reader, category_reader, cart_reader, order_reader
+
+# Versiones async nativas de las lecturas del API: menú, categorías, carrito y pedidos.
+# Solo se usan bajo ASGI (AsyncReadsMiddleware enruta aquí los GET con LittleLemon.async_urls);
+# las escrituras y WSGI siguen en las vistas DRF de views.py, con la misma salida.
+# LocMemCache no hace I/O, así que la caché se usa con su API síncrona: las variantes a*
+# de BaseCache solo la envuelven en sync_to_async y añadirían un salto de hilo por llamada.
+
+
+class AsyncReadView(View):
+    # Autenticación (token cacheado o sesión), permisos y errores como en DRF, sin ocupar un hilo
+    http_method_names = ['get', 'head']
+    customer_only = False
+    renderer = CompactJSONRenderer()
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Request de DRF solo para query_params y build_absolute_uri (filtros y paginación)
+        self.drf_request = Request(request)
+        try:
+            self.user = await self.authenticate(request)
+            await self.check_permissions(self.user)
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            # Como el exception handler de DRF: los errores de validación van tal cual
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = self.render(data, status=exc.status_code)
+            if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+                response['WWW-Authenticate'] = CachedTokenAuthentication().authenticate_header(request)
+            return response
+
+    async def authenticate(self, request):
+        credentials = await CachedTokenAuthentication().aauthenticate(request)
+        if credentials is not None:
+            return credentials[0]
+        # Sin cabecera Token: sesión (mismo orden que DEFAULT_AUTHENTICATION_CLASSES)
+        return await request.auser()
+
+    async def check_permissions(self, user):
+        if not user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        if self.customer_only and not user.is_superuser and await aget_roles(user):
+            raise exceptions.PermissionDenied()
+
+    def render(self, data, status=status.HTTP_200_OK, headers=None):
+        response = HttpResponse(self.renderer.render(data), status=status,
+                                content_type='application/json', headers=headers)
+        response['Vary'] = 'Accept'
+        return response
+
+
+class AsyncCatalogListView(AsyncReadView):
+    # Mismo flujo que CachedCatalogListMixin: 304, página en caché o lectura paginada con values()
+    # Como en GenericAPIView: cada subclase declara queryset (o sobrescribe get_queryset)
+    queryset = None
+    catalog_cache_prefix = None
+    values_reader = None
+    filter_backends = [OrderingFilter]
+    ordering_fields = None
+    ordering = None
+
+    def get_queryset(self):
+        assert self.queryset is not None, f"{type(self).__name__} should include a `queryset` attribute"
+        return self.queryset.all()
+
+    async def get(self, request):
+        fingerprint = await acatalog_fingerprint()
+        key = page_cache_key(self.catalog_cache_prefix, self.drf_request, fingerprint)
+        validators, not_modified = conditional_page(request, key, fingerprint)
+        if not_modified is not None:
+            return not_modified
+
+        data = cached_page(key)
+        if data is not None:
+            return self.render(data, headers={'X-Cache': 'HIT', **validators})
+
+        shape = self.values_reader.shape(self.drf_request.query_params)
+        queryset = self.get_queryset()
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(self.drf_request, queryset, self)
+        paginator = AsyncPageNumberPagination()
+        page = await paginator.apaginate_queryset(self.values_reader.values(queryset, shape), self.drf_request, view=self)
+        data = paginator.get_paginated_response(self.values_reader.to_representation(page, shape)).data
+        store_page(key, data)
+        return self.render(data, headers={'X-Cache': 'MISS', **validators})
+
+
+class MenuItemView(AsyncCatalogListView):
+    queryset = MenuItem.objects.all()
+    catalog_cache_prefix = 'menu-items'
+    values_reader = menu_item_reader
+    filter_backends = [MenuItemSearchFilter, OrderingFilter]
+    ordering_fields = ['price']
+    ordering = ['id']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        category_name = self.drf_request.query_params.get('category')
+        if category_name:
+            queryset = queryset.filter(category__title__iexact=category_name)
+        return queryset
+
+
+class CategoryView(AsyncCatalogListView):
+    queryset = Category.objects.all()
+    catalog_cache_prefix = 'categories'
+    values_reader = category_reader
+    ordering_fields = ['id', 'slug', 'title']  # los del serializer, como el OrderingFilter de CategoryView
+
+
+class MenuItemDetailView(AsyncReadView):
+    async def get(self, request, pk):
+        shape = menu_item_reader.shape(self.drf_request.query_params)
+        try:
+            row = await menu_item_reader.values(MenuItem.objects.filter(pk=pk), shape).aget()
+        except MenuItem.DoesNotExist:
+            return self.render({"error": "Menu item not found"}, status=status.HTTP_404_NOT_FOUND)
+        return self.render(menu_item_reader.to_representation([row], shape)[0])
+
+
+class CartView(AsyncReadView):
+    customer_only = True
+
+    async def get(self, request):
+        shape = cart_reader.shape(self.drf_request.query_params)
+        rows = [row async for row in cart_reader.values(Cart.objects.filter(user=self.user), shape)]
+        return self.render(cart_reader.to_representation(rows, shape))
+
+
+class OrderView(AsyncReadView):
+    async def get(self, request):
+        shape = order_reader.shape(self.drf_request.query_params)
+        roles = await aget_roles(self.user)
+        if not roles:
+            orders = Order.objects.filter(user=self.user)
+        elif MANAGER in roles:
+            orders = Order.objects.all()
+        elif DELIVERY_CREW in roles:
+            orders = Order.objects.filter(delivery_crew=self.user)
+        else:
+            return self.render([])
+
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(order_reader.values(orders, shape), self.drf_request, view=self)
+        return self.render(paginator.get_paginated_response(order_reader.to_representation(page, shape)).data)
@@ -0,0 +1,205 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import router
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+TOKEN_CACHE_PREFIX = "token:"
+TOKEN_GENERATION_PREFIX = "token-gen:"
+
+USER_FIELDS = [field.attname for field in User._meta.concrete_fields]
+
+
+class LRUCache:
+    # LRU acotado con TTL, en memoria del proceso. epoch cambia con cada delete/clear: una carga
+    # que empezó antes de una invalidación no puede volver a guardar su entrada después
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.epoch = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, epoch=None):
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self.epoch += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.epoch += 1
+            self._data.clear()
+
+
+_local_tokens = LRUCache(
+    getattr(settings, "TOKEN_CACHE_SIZE", 10000),
+    getattr(settings, "TOKEN_CACHE_LOCAL_TTL", 5),
+)
+
+
+def _digest(key):
+    # En la caché compartida no se guarda el token en claro
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def shared_cache_enabled():
+    # La caché compartida solo se usa si la ven todos los workers: con LocMemCache cada proceso
+    # tiene la suya y una invalidación no llegaría a los demás, que seguirían aceptando el token
+    # hasta TOKEN_CACHE_TTL. Sin ella solo queda el LRU local, con su TTL corto
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _generation_timeout():
+    # Más que la vida de una entrada: si la generación caducase antes, una entrada guardada
+    # por una carga anterior a la invalidación volvería a ser válida
+    return 2 * getattr(settings, "TOKEN_CACHE_TTL", 300)
+
+
+def invalidate_token(key):
+    _local_tokens.delete(key)
+    if shared_cache_enabled():
+        digest = _digest(key)
+        generation_key = TOKEN_GENERATION_PREFIX + digest
+        try:
+            cache.incr(generation_key)
+        except ValueError:
+            cache.set(generation_key, 1, _generation_timeout())
+        cache.delete(TOKEN_CACHE_PREFIX + digest)
+
+
+def clear_token_cache():
+    _local_tokens.clear()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # TokenAuthentication sin la query token + usuario en cada request: los tokens resueltos se
+    # guardan en un LRU del proceso (TTL corto) y, si la caché es compartida entre procesos, también
+    # en ella. Logout (borrado del token), cambios en el usuario (p. ej. desactivarlo) y su borrado
+    # invalidan al momento las entradas de este proceso y las de la caché compartida; el LRU de los
+    # demás procesos las conserva como mucho TOKEN_CACHE_LOCAL_TTL segundos.
+    # Las entradas compartidas llevan la generación del token leída antes de ir a la base de datos:
+    # si se invalida mientras tanto, la entrada que se guarde después ya no es válida
+    def authenticate_credentials(self, key):
+        entry, stamp = self._cached_entry(key)
+        if entry is None:
+            entry = self._load(key)
+            self._store(key, entry, stamp)
+        return self._credentials(key, entry)
+
+    async def aauthenticate(self, request):
+        # authenticate() para las vistas async: mismo parseo de la cabecera y misma caché,
+        # pero el token que no está en caché se resuelve con el ORM async
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed('Invalid token header. No credentials provided.')
+        if len(auth) > 2:
+            raise exceptions.AuthenticationFailed('Invalid token header. Token string should not contain spaces.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header. Token string should not contain invalid characters.')
+
+        entry, stamp = self._cached_entry(key)
+        if entry is None:
+            entry = await self._aload(key)
+            self._store(key, entry, stamp)
+        return self._credentials(key, entry)
+
+    def _cached_entry(self, key):
+        # (entrada o None, marca para _store): la marca es el epoch del LRU y la generación
+        # compartida del token antes de cargarlo
+        epoch = _local_tokens.epoch
+        entry = _local_tokens.get(key)
+        if entry is not None:
+            return entry, None
+        if not shared_cache_enabled():
+            return None, (epoch, None)
+        digest = _digest(key)
+        found = cache.get_many([TOKEN_CACHE_PREFIX + digest, TOKEN_GENERATION_PREFIX + digest])
+        generation = found.get(TOKEN_GENERATION_PREFIX + digest, 0)
+        shared = found.get(TOKEN_CACHE_PREFIX + digest)
+        if shared is not None and shared[0] == generation:
+            _local_tokens.set(key, shared[1], epoch)
+            return shared[1], None
+        return None, (epoch, generation)
+
+    def _store(self, key, entry, stamp):
+        epoch, generation = stamp
+        if generation is not None:
+            cache.set(TOKEN_CACHE_PREFIX + _digest(key), (generation, entry), getattr(settings, "TOKEN_CACHE_TTL", 300))
+        _local_tokens.set(key, entry, epoch)
+
+    def _credentials(self, key, entry):
+        created, user_values = entry
+        # Instancias nuevas en cada request: nada de lo que se cuelgue del usuario pasa a la siguiente
+        user = User.from_db(router.db_for_read(User), USER_FIELDS, user_values)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        token = Token(key=key, user=user, created=created)
+        token._state.adding = False
+        return (user, token)
+
+    def _load(self, key):
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        return self._entry(token)
+
+    async def _aload(self, key):
+        try:
+            token = await Token.objects.select_related('user').aget(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        return self._entry(token)
+
+    def _entry(self, token):
+        return token.created, tuple(getattr(token.user, name) for name in USER_FIELDS)
+
+
+@receiver(post_delete, sender=Token)
+def _token_deleted(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def _user_changed(sender, instance, created, update_fields=None, **kwargs):
+    # El login solo actualiza last_login, que no afecta a la autenticación
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+        invalidate_token(key)
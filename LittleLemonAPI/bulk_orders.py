@@ -0,0 +1,76 @@
+from collections import Counter, defaultdict
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .dispatch import dispatcher, open_assignment
+from .models import Order
+from .roles import DELIVERY_CREW
+
+# Máximo de pedidos por petición (y de ids por UPDATE, lejos del límite de parámetros de SQLite)
+BULK_ORDER_LIMIT = 500
+
+NOT_FOUND = "Order not found"
+DUPLICATED = "Order appears more than once in the request"
+NOT_CREW = "the user is not from Delivery crew."
+
+
+def bulk_update_orders(changes):
+    # changes: [{'order': id, 'delivery_crew'?: id|None, 'status'?: bool}, ...] ya validados.
+    # Una query para validar todos los repartidores, otra para leer los pedidos y un UPDATE por
+    # cada combinación distinta de valores nuevos, todo en una transacción. Devuelve un resultado
+    # por entrada, en el mismo orden
+    repeated = {order_id for order_id, n in Counter(change['order'] for change in changes).items() if n > 1}
+    crew_ids = {change['delivery_crew'] for change in changes if change.get('delivery_crew') is not None}
+    valid_crew = set(
+        User.objects.filter(pk__in=crew_ids, groups__name=DELIVERY_CREW).values_list('id', flat=True)
+    ) if crew_ids else set()
+
+    results = []
+    with transaction.atomic():
+        ids = [change['order'] for change in changes if change['order'] not in repeated]
+        current = {
+            order_id: (crew_id, status)
+            for order_id, crew_id, status in Order.objects.filter(pk__in=ids).values_list('id', 'delivery_crew_id', 'status')
+        }
+
+        groups = defaultdict(list)  # {(('delivery_crew', 3), ('status', True)): [order ids]}
+        open_deltas = Counter()  # pedidos abiertos por repartidor que cambian (las señales no ven los UPDATE)
+        for change in changes:
+            order_id = change['order']
+            if order_id in repeated:
+                results.append({'order': order_id, 'error': DUPLICATED})
+                continue
+            if order_id not in current:
+                results.append({'order': order_id, 'error': NOT_FOUND})
+                continue
+            crew_id = change.get('delivery_crew')
+            if crew_id is not None and crew_id not in valid_crew:
+                results.append({'order': order_id, 'error': NOT_CREW})
+                continue
+
+            fields = {}
+            if 'delivery_crew' in change:
+                fields['delivery_crew_id'] = crew_id
+            if 'status' in change:
+                fields['status'] = change['status']
+            groups[tuple(sorted(fields.items()))].append(order_id)
+
+            before_crew, before_status = current[order_id]
+            after_crew = fields.get('delivery_crew_id', before_crew)
+            after_status = fields.get('status', before_status)
+            before, after = open_assignment(before_crew, before_status), open_assignment(after_crew, after_status)
+            if before != after:
+                open_deltas[before] -= 1
+                open_deltas[after] += 1
+            results.append({'order': order_id, 'delivery_crew': after_crew, 'status': after_status})
+
+        for fields, order_ids in groups.items():
+            Order.objects.filter(pk__in=order_ids).update(**dict(fields))
+
+        open_deltas.pop(None, None)
+        for crew_id, delta in open_deltas.items():
+            if delta:
+                transaction.on_commit(lambda crew_id=crew_id, delta=delta: dispatcher.adjust(crew_id, delta))
+
+    return results
@@ -0,0 +1,73 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.backends.base.operations import BaseDatabaseOperations
+
+from .db import upsert_batches, upsert_sql
+from .models import Cart, MenuItem
+
+# Límites de las columnas de Cart (SQLite no los aplica: un valor mayor se guardaría y rompería
+# después la lectura del carrito y el checkout)
+_quantity, _price = Cart._meta.get_field('quantity'), Cart._meta.get_field('price')
+MAX_QUANTITY = BaseDatabaseOperations.integer_field_ranges[_quantity.get_internal_type()][1]
+MAX_PRICE = Decimal(10) ** (_price.max_digits - _price.decimal_places) - Decimal(1).scaleb(-_price.decimal_places)
+
+
+class UnknownMenuItems(Exception):
+    def __init__(self, ids):
+        super().__init__(ids)
+        self.ids = ids
+
+
+class CartLimitExceeded(Exception):
+    # Líneas cuya cantidad o precio total pasarían del máximo de la columna
+    def __init__(self, ids):
+        super().__init__(ids)
+        self.ids = ids
+
+
+def _upsert_sql(rows):
+    qn = connection.ops.quote_name
+    # Si la línea ya existe se suma la cantidad y se recalcula el precio con el precio actual,
+    # salvo que alguno pase del límite: esas filas no se tocan ni se devuelven en RETURNING
+    quantity = f"{qn(Cart._meta.db_table)}.{qn('quantity')} + excluded.{qn('quantity')}"
+    price = f"ROUND(({quantity}) * excluded.{qn('unit_price')}, 2)"
+    return upsert_sql(
+        Cart, ['user_id', 'menuitem_id', 'quantity', 'unit_price', 'price'], ['menuitem_id', 'user_id'],
+        {'quantity': quantity, 'unit_price': f"excluded.{qn('unit_price')}", 'price': price}, rows,
+        where=f"{quantity} <= %s AND {price} <= %s", returning=['menuitem_id'],
+    )
+
+
+def add_to_cart(user, entries):
+    # entries: [(menuitem_id, quantity), ...]. Resuelve todos los menuitems en una query
+    # y aplica las líneas con un único INSERT ... ON CONFLICT DO UPDATE (por bloque) en una transacción
+    quantities = {}
+    for menuitem_id, quantity in entries:
+        # Repetidos en la misma petición se suman antes: ON CONFLICT no puede tocar la misma fila dos veces
+        quantities[menuitem_id] = quantities.get(menuitem_id, 0) + quantity
+
+    with transaction.atomic():
+        prices = dict(MenuItem.objects.filter(pk__in=quantities).values_list('id', 'price'))
+        missing = sorted(set(quantities) - set(prices))
+        if missing:
+            raise UnknownMenuItems(missing)
+
+        rows = [
+            (user.pk, menuitem_id, quantity, prices[menuitem_id], prices[menuitem_id] * quantity)
+            for menuitem_id, quantity in quantities.items()
+        ]
+        # Lo que ya viene en la petición se comprueba aquí; lo que se suma a una línea existente,
+        # en el propio upsert (sin leer el carrito antes)
+        too_big = sorted(row[1] for row in rows if row[2] > MAX_QUANTITY or row[4] > MAX_PRICE)
+        if too_big:
+            raise CartLimitExceeded(too_big)
+        with connection.cursor() as cursor:
+            for batch, params in upsert_batches(rows):
+                cursor.execute(_upsert_sql(len(batch)), params + [MAX_QUANTITY, float(MAX_PRICE)])
+                applied = {menuitem_id for menuitem_id, in cursor.fetchall()}
+                if len(applied) < len(batch):
+                    # Se deshace toda la petición (también los bloques anteriores)
+                    raise CartLimitExceeded(sorted(row[1] for row in batch if row[1] not in applied))
+
+    return len(rows)
@@ -0,0 +1,175 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, migrations
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .db import create_triggers, drop_triggers
+from .models import CatalogState, Category, MenuItem
+from .search import SEARCH_TRIGGERS
+
+STATE_TABLE = 'LittleLemonAPI_catalogstate'
+
+# Cada escritura en menuitem o category suma 1 a CatalogState.version y anota el instante
+_BUMP = f"""BEGIN
+        UPDATE "{STATE_TABLE}" SET version = version + 1,
+            modified = CAST((julianday('now') - 2440587.5) * 86400 AS INTEGER)
+        WHERE id = 1;
+    END"""
+
+CATALOG_TRIGGERS = {
+    f'LittleLemonAPI_{table}_catalog_{event.lower()}': f'AFTER {event} ON "LittleLemonAPI_{table}" {_BUMP}'
+    for table in ('menuitem', 'category')
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+}
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+
+
+def _record(counter):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        for counter in _stats:
+            _stats[counter] = 0
+
+
+def without_catalog_triggers(*operations):
+    # Para las migraciones que cambian MenuItem o Category: en SQLite AddField, AlterField o
+    # RemoveField rehacen la tabla (copia + DROP + RENAME), lo que falla con los triggers de
+    # búsqueda que la referencian y perdería los de este módulo. Se quitan antes y se vuelven a
+    # crear después, también al deshacer:
+    #     operations = without_catalog_triggers(migrations.AddField('menuitem', ...))
+    # Las filas se copian con el mismo id, así que el índice FTS sigue siendo válido
+    triggers = {**SEARCH_TRIGGERS, **CATALOG_TRIGGERS}
+    drop = lambda apps, schema_editor: drop_triggers(schema_editor, triggers)
+    create = lambda apps, schema_editor: create_triggers(schema_editor, triggers)
+    return [migrations.RunPython(drop, create), *operations, migrations.RunPython(create, drop)]
+
+
+def _fingerprint_query():
+    # Una query por índices: contador de cambios, instante y últimos ids (estos cubren las
+    # altas y bajas en otros motores, donde no hay triggers y solo cuentan las señales)
+    last_id = lambda model: RawSQL(f'SELECT MAX(id) FROM "{model._meta.db_table}"', [])  # MAX sobre la PK: sin recorrer la tabla
+    return CatalogState.objects.filter(pk=1).values_list('version', 'modified', last_id(MenuItem), last_id(Category))
+
+
+def _fingerprint(row):
+    version, modified, menu_item_id, category_id = row
+    return f"{version}.{menu_item_id or 0}.{category_id or 0}", modified
+
+
+def catalog_fingerprint():
+    # (huella, segundos del último cambio) del catálogo, leída de la base de datos en cada request:
+    # cambia con escrituras de cualquier proceso, seed_data, update() o SQL directo
+    row = _fingerprint_query().first()
+    if row is None:
+        # Fila perdida (p. ej. tras un flush): se recrea
+        CatalogState.objects.get_or_create(pk=1, defaults={'modified': int(time.time())})
+        row = _fingerprint_query().first()
+    return _fingerprint(row)
+
+
+async def acatalog_fingerprint():
+    row = await _fingerprint_query().afirst()
+    if row is None:
+        await CatalogState.objects.aget_or_create(pk=1, defaults={'modified': int(time.time())})
+        row = await _fingerprint_query().afirst()
+    return _fingerprint(row)
+
+
+def bump_catalog_version(using='default'):
+    # Donde no hay triggers (otros motores)
+    CatalogState.objects.using(using).filter(pk=1).update(version=F('version') + 1, modified=int(time.time()))
+
+
+def page_cache_key(prefix, request, fingerprint):
+    # Parámetros (filtros, ordering, page) ordenados para que ?a=1&b=2 y ?b=2&a=1 compartan entrada
+    params = sorted(request.query_params.lists())
+    raw = f"{request.get_host()}|{request.path}|{params}"
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f"catalog:{prefix}:{fingerprint[0]}:{digest}"
+
+
+def page_etag(key):
+    # ETag fuerte: la clave ya incluye la huella del catálogo y los parámetros de la página
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def conditional_page(request, key, fingerprint):
+    # Validadores (ETag, Last-Modified) de una página del catálogo y, si el cliente
+    # ya la tiene, la respuesta 304 lista para devolver (None en caso contrario)
+    etag = page_etag(key)
+    last_modified = fingerprint[1]
+
+    validators = {"ETag": etag, "Last-Modified": http_date(last_modified)}
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if not_modified is not None:
+        _record("not_modified")
+        for header, value in validators.items():
+            not_modified[header] = value
+    return validators, not_modified
+
+
+def cached_page(key):
+    data = cache.get(key)
+    _record("hits" if data is not None else "misses")
+    return data
+
+
+def store_page(key, data):
+    cache.set(key, data, getattr(settings, "CATALOG_CACHE_TIMEOUT", 300))
+
+
+class CachedCatalogListMixin:
+    # Guarda en caché la página ya serializada de un ListAPIView del catálogo y responde 304 a
+    # If-None-Match / If-Modified-Since; en ambos casos la única query es la de la huella
+    catalog_cache_prefix = None
+
+    def list(self, request, *args, **kwargs):
+        fingerprint = catalog_fingerprint()
+        key = page_cache_key(self.catalog_cache_prefix, request, fingerprint)
+        validators, not_modified = conditional_page(request._request, key, fingerprint)
+        if not_modified is not None:
+            return not_modified
+
+        data = cached_page(key)
+        if data is not None:
+            return Response(data, headers={"X-Cache": "HIT", **validators})
+
+        response = super().list(request, *args, **kwargs)
+        store_page(key, response.data)
+        response["X-Cache"] = "MISS"
+        for header, value in validators.items():
+            response[header] = value
+        return response
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def _catalog_changed(sender, using, **kwargs):
+    # Las páginas guardadas con la huella anterior quedan huérfanas y caducan solas. En SQLite
+    # la huella la cambian los triggers; aquí solo se cuenta la invalidación
+    _record("invalidations")
+    if connections[using].vendor != 'sqlite':
+        bump_catalog_version(using)
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.db import transaction
+
+from .dispatch import dispatcher
+from .models import Cart, Order, OrderItem
+from .order_totals import MAX_ORDER_TOTAL
+from .rollups import add_order
+
+
+class EmptyCartError(Exception):
+    pass
+
+
+class OrderTotalExceeded(Exception):
+    # El total del carrito no cabe en Order.total (cada línea cabe, pero su suma no)
+    pass
+
+
+def checkout(user):
+    # Convierte el carrito del usuario en una orden con un número fijo de queries
+    # (lectura del carrito, orden, bulk_create de items y vaciado del carrito),
+    # todo dentro de una transacción para no dejar órdenes a medias.
+    # Con AUTO_DISPATCH_ENABLED la orden sale ya asignada al repartidor menos cargado
+    with transaction.atomic():
+        cart_items = list(Cart.objects.filter(user=user).select_related('menuitem'))
+        if not cart_items:
+            raise EmptyCartError()
+
+        order_items = []
+        total = 0
+        for item in cart_items:
+            unit_price = item.menuitem.price
+            price = unit_price * item.quantity
+            total += price
+            order_items.append(OrderItem(
+                menuitem=item.menuitem,
+                quantity=item.quantity,
+                unit_price=unit_price,
+                price=price,
+            ))
+
+        if total > MAX_ORDER_TOTAL:
+            raise OrderTotalExceeded()
+
+        delivery_crew_id = dispatcher.pick() if getattr(settings, 'AUTO_DISPATCH_ENABLED', True) else None
+        item_count = sum(item.quantity for item in cart_items)
+        order = Order.objects.create(user=user, total=total, item_count=item_count, delivery_crew_id=delivery_crew_id)
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
+        add_order(order, order_items)  # rollups de ventas en la misma transacción
+
+        Cart.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+
+    return order
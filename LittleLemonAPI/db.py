@@ -0,0 +1,72 @@
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+
+def is_busy_error(exc):
+    return 'database is locked' in str(exc) or 'database table is locked' in str(exc)
+
+
+def retry_on_busy(handler):
+    # Reintenta un handler de escritura si SQLite devuelve "database is locked", con backoff
+    # exponencial y jitter. Solo fuera de un atomic(): dentro, la transacción ya está rota
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        retries = getattr(settings, 'DB_BUSY_RETRIES', 3)
+        backoff = getattr(settings, 'DB_BUSY_BACKOFF', 0.05)
+        attempt = 0
+        while True:
+            try:
+                return handler(*args, **kwargs)
+            except OperationalError as exc:
+                if attempt >= retries or not is_busy_error(exc) or connection.in_atomic_block:
+                    raise
+                time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+                attempt += 1
+    return wrapper
+
+
+def create_triggers(schema_editor, triggers):
+    # triggers: {nombre: cuerpo tras CREATE TRIGGER "nombre"}. Solo en SQLite
+    if schema_editor.connection.vendor == 'sqlite':
+        for name, body in triggers.items():
+            schema_editor.execute(f'CREATE TRIGGER "{name}" {body}')
+
+
+def drop_triggers(schema_editor, triggers):
+    if schema_editor.connection.vendor == 'sqlite':
+        for name in reversed(list(triggers)):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+
+
+# Filas por sentencia en upsert_batches: con 5 columnas son 2500 parámetros, lejos del límite de SQLite
+UPSERT_BATCH_SIZE = 500
+
+
+def upsert_sql(model, columns, conflict, updates, rows, where=None, returning=None):
+    # INSERT ... VALUES (...), ... ON CONFLICT (conflict) DO UPDATE SET columna = expresión.
+    # updates: {columna: expresión SQL}; en las expresiones, excluded.<columna> es la fila nueva.
+    # where limita qué filas existentes se actualizan; returning, las columnas a devolver
+    qn = connection.ops.quote_name
+    row = '(%s)' % ', '.join(['%s'] * len(columns))
+    sql = (
+        f"INSERT INTO {qn(model._meta.db_table)} ({', '.join(qn(c) for c in columns)}) "
+        f"VALUES {', '.join([row] * rows)} "
+        f"ON CONFLICT ({', '.join(qn(c) for c in conflict)}) DO UPDATE SET "
+        f"{', '.join(f'{qn(column)} = {value}' for column, value in updates.items())}"
+    )
+    if where:
+        sql += f" WHERE {where}"
+    if returning:
+        sql += f" RETURNING {', '.join(qn(c) for c in returning)}"
+    return sql
+
+
+def upsert_batches(rows):
+    # Bloques de filas y sus parámetros aplanados, para un upsert_sql por bloque
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = rows[start:start + UPSERT_BATCH_SIZE]
+        yield batch, [value for row in batch for value in row]
@@ -0,0 +1,131 @@
+import heapq
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import Order
+from .roles import DELIVERY_CREW
+
+
+class CrewDispatcher:
+    # Heap en memoria de (pedidos abiertos, id) de cada repartidor activo: el menos cargado
+    # se elige en O(log n) sin consultar la base de datos. Los cambios de cada pedido se aplican
+    # tras el commit (señales de Order), los cambios en el grupo o en un repartidor fuerzan
+    # una recarga, y cada DISPATCH_RESYNC_INTERVAL segundos se recarga igualmente para
+    # recoger lo que hayan hecho otros procesos o los UPDATE en bloque
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = None  # {crew_id: pedidos abiertos}; None = hay que cargar
+        self._heap = []
+        self._loaded_at = 0.0
+
+    def pick(self):
+        # Repartidor con menos pedidos abiertos (a igualdad, el de id menor) o None si no hay
+        with self._lock:
+            if self._stale():
+                self._load()
+            heap, counts = self._heap, self._counts
+            # Borrado perezoso: se descartan las entradas que ya no coinciden con el contador
+            while heap and counts.get(heap[0][1]) != heap[0][0]:
+                heapq.heappop(heap)
+            return heap[0][1] if heap else None
+
+    def open_counts(self):
+        with self._lock:
+            if self._stale():
+                self._load()
+            return dict(self._counts)
+
+    def adjust(self, crew_id, delta):
+        with self._lock:
+            if self._counts is None or crew_id not in self._counts:
+                return  # sin cargar, o no es un repartidor activo: lo recoge la siguiente recarga
+            count = self._counts[crew_id] = max(0, self._counts[crew_id] + delta)
+            heapq.heappush(self._heap, (count, crew_id))
+            if len(self._heap) > 2 * len(self._counts) + 64:
+                self._rebuild()
+
+    def invalidate(self):
+        with self._lock:
+            self._counts = None
+
+    def is_crew(self, user_id):
+        with self._lock:
+            return self._counts is not None and user_id in self._counts
+
+    def _stale(self):
+        interval = getattr(settings, 'DISPATCH_RESYNC_INTERVAL', 30)
+        return self._counts is None or time.monotonic() - self._loaded_at > interval
+
+    def _load(self):
+        # Una query: repartidores activos con su número de pedidos abiertos (índice delivery_crew, status)
+        crew = (
+            User.objects.filter(groups__name=DELIVERY_CREW, is_active=True)
+            .annotate(open_orders=Count('delivery_crew', filter=Q(delivery_crew__status=False)))
+            .values_list('id', 'open_orders')
+        )
+        self._counts = dict(crew)
+        self._rebuild()
+        self._loaded_at = time.monotonic()
+
+    def _rebuild(self):
+        self._heap = [(count, crew_id) for crew_id, count in self._counts.items()]
+        heapq.heapify(self._heap)
+
+
+dispatcher = CrewDispatcher()
+
+
+def open_assignment(crew_id, status):
+    # Repartidor cuyo contador incluye un pedido así (None si está entregado o sin asignar)
+    return crew_id if crew_id is not None and not status else None
+
+
+def _open_assignment(order):
+    return open_assignment(order.delivery_crew_id, order.status)
+
+
+@receiver(post_init, sender=Order)
+def _remember_assignment(sender, instance, **kwargs):
+    instance._dispatch_assignment = _open_assignment(instance)
+
+
+@receiver(post_save, sender=Order)
+def _order_saved(sender, instance, created, **kwargs):
+    before = None if created else instance._dispatch_assignment
+    after = _open_assignment(instance)
+    instance._dispatch_assignment = after
+    if before != after:
+        if before is not None:
+            transaction.on_commit(lambda: dispatcher.adjust(before, -1))
+        if after is not None:
+            transaction.on_commit(lambda: dispatcher.adjust(after, 1))
+
+
+@receiver(post_delete, sender=Order)
+def _order_deleted(sender, instance, **kwargs):
+    crew_id = _open_assignment(instance)
+    if crew_id is not None:
+        transaction.on_commit(lambda: dispatcher.adjust(crew_id, -1))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def _membership_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(dispatcher.invalidate)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _user_changed(sender, instance, update_fields=None, **kwargs):
+    # Un repartidor desactivado o borrado deja de recibir pedidos (el login solo toca last_login)
+    if update_fields == frozenset({'last_login'}):
+        return
+    if dispatcher.is_crew(instance.pk):
+        transaction.on_commit(dispatcher.invalidate)
@@ -0,0 +1,79 @@
+import csv
+import json
+
+from django.db.models import Prefetch
+
+from .models import Order, OrderItem
+
+EXPORT_CHUNK_SIZE = 2000
+
+ORDER_FIELDS = ['order_id', 'user', 'delivery_crew', 'status', 'total', 'date']
+ITEM_FIELDS = ['item_id', 'menuitem', 'quantity', 'unit_price', 'price']
+
+
+def export_queryset(date_from=None, date_to=None, status=None):
+    # Filtra por las columnas indexadas Order.date / Order.status
+    orders = Order.objects.all()
+    if date_from is not None:
+        orders = orders.filter(date__gte=date_from)
+    if date_to is not None:
+        orders = orders.filter(date__lte=date_to)
+    if status is not None:
+        # status__in en vez de status=False: SQLite no usa el índice con "WHERE NOT status"
+        orders = orders.filter(status__in=[status])
+    items = Prefetch('orderitem_set', queryset=OrderItem.objects.order_by('id'))
+    # Orden cronológico (date, id): lo sirve el mismo índice de date que el filtro por rango
+    return orders.order_by('date', 'id').prefetch_related(items)
+
+
+def _iter_orders(orders):
+    # iterator(chunk_size) carga los pedidos por bloques (y sus items, un prefetch por bloque),
+    # así la memoria no crece con el tamaño de la tabla
+    return orders.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _order_row(order):
+    return {
+        'order_id': order.id,
+        'user': order.user_id,
+        'delivery_crew': order.delivery_crew_id,
+        'status': order.status,
+        'total': str(order.total),
+        'date': order.date.isoformat(),
+    }
+
+
+def _item_row(item):
+    return {
+        'item_id': item.id,
+        'menuitem': item.menuitem_id,
+        'quantity': item.quantity,
+        'unit_price': str(item.unit_price),
+        'price': str(item.price),
+    }
+
+
+def iter_ndjson(orders):
+    # Una línea JSON por pedido, con sus items anidados
+    for order in _iter_orders(orders):
+        row = _order_row(order)
+        row['items'] = [_item_row(item) for item in order.orderitem_set.all()]
+        yield json.dumps(row) + '\n'
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(orders):
+    # Una fila por OrderItem con las columnas del pedido repetidas
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ORDER_FIELDS + ITEM_FIELDS)
+    for order in _iter_orders(orders):
+        order_values = list(_order_row(order).values())
+        items = order.orderitem_set.all()
+        if not items:
+            yield writer.writerow(order_values + [''] * len(ITEM_FIELDS))
+        for item in items:
+            yield writer.writerow(order_values + list(_item_row(item).values()))
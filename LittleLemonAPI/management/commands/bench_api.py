@@ -0,0 +1,228 @@
+import json
+import platform
+import random
+import time
+from datetime import date, timedelta
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.models import Cart, MenuItem, Order
+from LittleLemonAPI.roles import DELIVERY_CREW
+from LittleLemonAPI.seeding import DEFAULT_VOLUMES, seed_database
+
+from ._bench import summarize, compare
+
+
+# Usuarios por petición en los escenarios de grupos en bloque
+GROUP_BULK_SIZE = 100
+
+
+class Scenario:
+    # Una ruta de LittleLemonAPI/urls.py, el rol con el que se llama y cómo construir cada request
+    def __init__(self, name, role, method, path, data=None, setup=None, expected=(200,)):
+        self.name = name
+        self.role = role
+        self.method = method
+        self.path = path
+        self.data = data
+        self.setup = setup
+        self.expected = expected
+
+
+def build_scenarios(dataset, rng, clients):
+    menu_items = dataset.menu_items
+    today = date.today()
+
+    def customer_order(client):
+        return Order.objects.filter(user=client.user_id).values_list('id', flat=True).first()
+
+    def fill_cart(client):
+        Cart.objects.filter(user_id=client.user_id).delete()
+        for menuitem_id in rng.sample(menu_items, 3):
+            price = MenuItem.objects.get(pk=menuitem_id).price
+            Cart.objects.create(user_id=client.user_id, menuitem_id=menuitem_id, quantity=1, unit_price=price, price=price)
+
+    def clear_cart(client):
+        Cart.objects.filter(user_id=client.user_id).delete()
+
+    crew = list(User.objects.filter(groups__name=DELIVERY_CREW).values_list('id', flat=True))
+
+    def reassign_orders(client):
+        # Cambio de turno: 50 pedidos al azar repartidos entre el equipo
+        orders = Order.objects.order_by('?').values_list('id', flat=True)[:50]
+        return [{'order': order_id, 'delivery_crew': rng.choice(crew) if crew else None} for order_id in orders]
+
+    # Altas y bajas de grupos con clientes que no son de ningún APIClient: los roles de los
+    # clientes que miden el resto de escenarios no cambian
+    in_use = {client.user_id for role_clients in clients.values() for client in role_clients}
+    spare = [user_id for user_id in User.objects.filter(groups=None).order_by('id').values_list('id', flat=True)
+             if user_id not in in_use]
+
+    def spare_users(client):
+        return {'user_ids': rng.sample(spare, min(GROUP_BULK_SIZE, len(spare)))}
+
+    def crew_and_spare_users(client):
+        # PUT conserva el equipo real y cambia el resto de miembros
+        return {'user_ids': crew + spare_users(client)['user_ids']}
+
+    return [
+        Scenario('menu-items', 'customer', 'get', lambda c: '/api/menu-items/'),
+        Scenario('menu-items?category', 'customer', 'get', lambda c: f'/api/menu-items/?category=Category%20{rng.choice(dataset.categories)}'),
+        Scenario('menu-items?search', 'customer', 'get', lambda c: f'/api/menu-items/?search={str(rng.choice(menu_items))[:3]}'),
+        Scenario('menu-items?ordering', 'customer', 'get', lambda c: f'/api/menu-items/?ordering=price&page={rng.randint(1, max(1, len(menu_items) // 2))}'),
+        Scenario('menu-items POST', 'manager', 'post', lambda c: '/api/menu-items/',
+                 data=lambda c: {'title': 'Bench item', 'price': '9.99', 'featured': False, 'category': rng.choice(dataset.categories)},
+                 expected=(201,)),
+        Scenario('menu-item-detail', 'customer', 'get', lambda c: f'/api/menu-items/{rng.choice(menu_items)}/'),
+        Scenario('menu-item-detail PATCH', 'manager', 'patch', lambda c: f'/api/menu-items/{rng.choice(menu_items)}/',
+                 data=lambda c: {'featured': rng.random() < 0.5}),
+        Scenario('categories', 'customer', 'get', lambda c: '/api/categories/'),
+        Scenario('cart', 'customer', 'get', lambda c: '/api/cart/menu-items/', setup=fill_cart),
+        Scenario('cart POST', 'customer', 'post', lambda c: '/api/cart/menu-items/',
+                 data=lambda c: {'menuitem': rng.choice(menu_items), 'quantity': 1}, setup=clear_cart, expected=(201,)),
+        Scenario('cart POST basket', 'customer', 'post', lambda c: '/api/cart/menu-items/',
+                 data=lambda c: [{'menuitem': m, 'quantity': 1} for m in rng.sample(menu_items, min(10, len(menu_items)))],
+                 expected=(201,)),
+        Scenario('orders (customer)', 'customer', 'get', lambda c: '/api/orders/'),
+        Scenario('orders (delivery crew)', 'delivery_crew', 'get', lambda c: '/api/orders/'),
+        Scenario('orders (manager)', 'manager', 'get', lambda c: '/api/orders/'),
+        Scenario('orders POST', 'customer', 'post', lambda c: '/api/orders/', setup=fill_cart, expected=(201,)),
+        Scenario('order-detail', 'customer', 'get', lambda c: f'/api/orders/{customer_order(c)}/'),
+        Scenario('order-detail PATCH', 'manager', 'patch',
+                 lambda c: f'/api/orders/{Order.objects.order_by("?").values_list("id", flat=True).first()}/',
+                 data=lambda c: {'status': rng.randint(0, 1)}),
+        Scenario('orders-bulk PATCH', 'manager', 'patch', lambda c: '/api/orders/bulk/', data=reassign_orders),
+        Scenario('orders-export', 'manager', 'get', lambda c: f'/api/orders/export/?date_from={today - timedelta(days=1)}'),
+        Scenario('manager-users', 'manager', 'get', lambda c: '/api/groups/manager/users'),
+        Scenario('delivery-crew-users', 'manager', 'get', lambda c: '/api/groups/delivery-crew/users'),
+        Scenario('manager-users POST', 'manager', 'post', lambda c: '/api/groups/manager/users',
+                 data=lambda c: {'user_id': rng.choice(spare)}, expected=(201,)),
+        Scenario('delivery-crew-users POST', 'manager', 'post', lambda c: '/api/groups/delivery-crew/users',
+                 data=lambda c: {'user_id': rng.choice(spare)}, expected=(201,)),
+        Scenario('delivery-crew-users-bulk POST', 'manager', 'post', lambda c: '/api/groups/delivery-crew/users/bulk',
+                 data=spare_users),
+        Scenario('delivery-crew-users-bulk DELETE', 'manager', 'delete', lambda c: '/api/groups/delivery-crew/users/bulk',
+                 data=spare_users),
+        Scenario('delivery-crew-users-bulk PUT', 'manager', 'put', lambda c: '/api/groups/delivery-crew/users/bulk',
+                 data=crew_and_spare_users),
+        Scenario('stats', 'manager', 'get', lambda c: '/api/stats/'),
+        Scenario('sales-report', 'manager', 'get', lambda c: f'/api/reports/sales/?date_from={today - timedelta(days=rng.randint(0, 364))}'),
+    ]
+
+
+def run_scenario(scenario, clients, requests, warmup, rng):
+    samples = []
+    errors = 0
+    for i in range(warmup + requests):
+        client = rng.choice(clients[scenario.role])
+        if scenario.setup is not None:
+            scenario.setup(client)
+        path = scenario.path(client)
+        data = scenario.data(client) if scenario.data else None
+        start = time.perf_counter()
+        response = getattr(client, scenario.method)(path, data, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - start
+        if i < warmup:
+            continue
+        samples.append(elapsed)
+        if response.status_code not in scenario.expected:
+            errors += 1
+
+    result = summarize(samples)
+    result['throughput_rps'] = round(len(samples) / sum(samples), 1)
+    result['errors'] = errors
+    return result
+
+
+class Command(BaseCommand):
+    help = ("Siembra un dataset realista en una base de datos de test y mide throughput y "
+            "latencia p50/p95/p99 de cada endpoint con el token del rol adecuado")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests medidas por endpoint')
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Multiplica los volúmenes por defecto (p. ej. 0.01 para una pasada rápida)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', nargs='+', help='Nombres de escenario a ejecutar')
+        parser.add_argument('--output', default='bench_results.json', help='Fichero JSON con los resultados')
+        parser.add_argument('--compare', help='JSON de una ejecución anterior con el que comparar')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Empeoramiento relativo de p95 o throughput que cuenta como regresión')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)
+
+        volumes = {name: max(1, int(count * options['scale'])) for name, count in DEFAULT_VOLUMES.items()}
+        rng = random.Random(options['seed'])
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # Sin control de admisión: se mide el coste de cada endpoint, no los límites por usuario
+            with override_settings(DEBUG=False, ADMISSION_CONTROL_ENABLED=False):
+                cache.clear()
+                start = time.perf_counter()
+                dataset = seed_database(volumes, seed=options['seed'])
+                self.stdout.write(f"Seeded {volumes} in {time.perf_counter() - start:.1f}s")
+
+                clients = {}
+                for role, keys in dataset.tokens.items():
+                    clients[role] = []
+                    for key in rng.sample(keys, min(len(keys), 20)):
+                        client = APIClient()
+                        client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+                        client.user_id = Token.objects.values_list('user_id', flat=True).get(key=key)
+                        clients[role].append(client)
+
+                scenarios = build_scenarios(dataset, rng, clients)
+                if options['only']:
+                    scenarios = [s for s in scenarios if s.name in options['only']]
+                    if not scenarios:
+                        raise CommandError('No scenario matches --only')
+
+                results = {}
+                for scenario in scenarios:
+                    results[scenario.name] = run_scenario(scenario, clients, options['requests'], options['warmup'], rng)
+                    row = results[scenario.name]
+                    self.stdout.write(
+                        f"{scenario.name:<32} {row['throughput_rps']:>8} req/s  p50={row['p50_ms']}ms  "
+                        f"p95={row['p95_ms']}ms  p99={row['p99_ms']}ms  errors={row['errors']}"
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'volumes': volumes,
+                'requests': options['requests'],
+                'seed': options['seed'],
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare(baseline['results'], results, options['threshold'])
+            for line in regressions:
+                self.stderr.write(f"REGRESSION {line}")
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS('No regressions'))
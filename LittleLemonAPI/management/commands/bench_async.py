@@ -0,0 +1,200 @@
+import asyncio
+import io
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from LittleLemonAPI.seeding import seed_database
+
+from ._bench import summarize
+
+# Lecturas que tienen versión async (async_views.py)
+READ_PATHS = [
+    '/api/menu-items/',
+    '/api/menu-items/?ordering=price&page=2',
+    '/api/menu-items/{menuitem}/',
+    '/api/categories/',
+    '/api/cart/menu-items/',
+    '/api/orders/',
+]
+
+DEPLOYMENTS = ['wsgi', 'asgi-sync-views', 'asgi']
+
+
+class Command(BaseCommand):
+    help = ("Compara throughput y latencia de las lecturas del API con N clientes concurrentes "
+            "servidos por WSGI (pool de hilos, como gunicorn gthread), ASGI con las vistas DRF "
+            "y ASGI con las vistas async. --client-latency simula clientes lentos: el tiempo que "
+            "tarda en enviarse la respuesta, durante el que WSGI mantiene ocupado su hilo")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 500])
+        parser.add_argument('--requests', type=int, default=1000, help='Requests por despliegue y concurrencia')
+        parser.add_argument('--threads', type=int, default=8, help='Hilos del servidor WSGI')
+        parser.add_argument('--client-latency', type=float, default=100.0, help='Milisegundos por respuesta')
+        parser.add_argument('--deployments', nargs='+', default=DEPLOYMENTS, choices=DEPLOYMENTS)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Fichero JSON con los resultados')
+
+    def handle(self, *args, **options):
+        volumes = {'categories': 10, 'menu_items': 200, 'managers': 1, 'delivery_crew': 5,
+                   'customers': 200, 'orders': 5000, 'carts': 200}
+        rng = random.Random(options['seed'])
+        latency = options['client_latency'] / 1000
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(DEBUG=False):
+                cache.clear()
+                dataset = seed_database(volumes, seed=options['seed'])
+                tokens = dataset.tokens['customer']
+                requests = [
+                    (path.format(menuitem=rng.choice(dataset.menu_items)), rng.choice(tokens))
+                    for path in rng.choices(READ_PATHS, k=options['requests'])
+                ]
+
+                results = {}
+                for deployment in options['deployments']:
+                    results[deployment] = {}
+                    for concurrency in options['concurrency']:
+                        cache.clear()
+                        with override_settings(ASYNC_READS_ENABLED=deployment == 'asgi'):
+                            if deployment == 'wsgi':
+                                row = run_wsgi(requests, concurrency, options['threads'], latency)
+                            else:
+                                row = asyncio.run(run_asgi(requests, concurrency, latency))
+                        if row['errors']:
+                            raise CommandError(f"{row['errors']} failed requests under {deployment}")
+                        results[deployment][concurrency] = row
+                        self.stdout.write(
+                            f"{deployment:<16} c={concurrency:<5} {row['throughput_rps']:>8} req/s  "
+                            f"p50={row['p50_ms']}ms  p95={row['p95_ms']}ms  p99={row['p99_ms']}ms  "
+                            f"threads={row['peak_threads']}"
+                        )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+
+
+def _result(samples, errors, elapsed, peak_threads):
+    result = summarize(samples)
+    result['throughput_rps'] = round(len(samples) / elapsed, 1)
+    result['errors'] = errors
+    result['peak_threads'] = peak_threads
+    return result
+
+
+def run_wsgi(requests, concurrency, threads, latency):
+    # Cada cliente espera a que un hilo del servidor atienda su request y termine de enviarla
+    handler = WSGIHandler()
+    pending = iter(requests)
+    lock = threading.Lock()
+    samples = []
+    errors = 0
+    peak = threading.active_count()
+
+    def serve(path, token):
+        status = []
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'HTTP_HOST': 'testserver',
+            'HTTP_AUTHORIZATION': f'Token {token}', 'HTTP_ACCEPT': 'application/json',
+            'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        body = handler(environ, lambda s, headers, exc_info=None: status.append(s))
+        try:
+            b''.join(body)
+            time.sleep(latency)  # envío al cliente lento: el hilo sigue ocupado
+        finally:
+            body.close()
+        return status[0].startswith('200')
+
+    def client(server):
+        nonlocal errors, peak
+        while True:
+            with lock:
+                request = next(pending, None)
+            if request is None:
+                return
+            start = time.perf_counter()
+            ok = server.submit(serve, *request).result()
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append(elapsed)
+                errors += not ok
+                peak = max(peak, threading.active_count())
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as server, ThreadPoolExecutor(concurrency) as clients:
+        for _ in range(concurrency):
+            clients.submit(client, server)
+    return _result(samples, errors, time.perf_counter() - start, peak)
+
+
+async def run_asgi(requests, concurrency, latency):
+    # Los clientes son tareas del mismo event loop; el envío lento solo suspende la tarea
+    handler = ASGIHandler()
+    pending = iter(requests)
+    samples = []
+    errors = 0
+    peak = threading.active_count()
+
+    async def serve(path, token):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+            'root_path': '', 'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Token {token}'.encode()),
+                        (b'accept', b'application/json')],
+        }
+        done = asyncio.Event()
+        status = []
+        received = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not message.get('more_body', False):
+                await asyncio.sleep(latency)  # envío al cliente lento
+                done.set()
+
+        await handler(scope, receive, send)
+        return status[0] == 200
+
+    async def client():
+        nonlocal errors, peak
+        for request in pending:
+            start = time.perf_counter()
+            ok = await serve(*request)
+            samples.append(time.perf_counter() - start)
+            errors += not ok
+            peak = max(peak, threading.active_count())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return _result(samples, errors, time.perf_counter() - start, peak)
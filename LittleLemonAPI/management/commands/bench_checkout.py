@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.checkout import checkout
+from LittleLemonAPI.models import Category, MenuItem, Cart, Order, OrderItem
+
+from ._bench import rolled_back, measure, summarize
+
+
+def legacy_checkout(user):
+    # Implementación anterior de OrderView.post (N+1, sin transacción), solo para comparar
+    cart_items = Cart.objects.filter(user=user)
+    if not cart_items.exists():
+        return None
+    total = sum(item.menuitem.price * item.quantity for item in cart_items)
+    order = Order.objects.create(user=user, total=total)
+    for item in cart_items:
+        OrderItem.objects.create(
+            order=order,
+            menuitem=item.menuitem,
+            quantity=item.quantity,
+            unit_price=item.menuitem.price,
+            price=item.menuitem.price * item.quantity
+        )
+    cart_items.delete()
+    return order
+
+
+class Command(BaseCommand):
+    help = "Mide la latencia del checkout para carritos de 1, 10 y 100 items (antes y después)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100])
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            category = Category.objects.create(slug='bench', title='Bench')
+            menu = MenuItem.objects.bulk_create(
+                MenuItem(title=f'Bench item {i}', price=Decimal('5.00'), featured=False, category=category)
+                for i in range(max(options['sizes']))
+            )
+            user = User.objects.create_user('bench-checkout')
+
+            def fill_cart(size):
+                Cart.objects.bulk_create(
+                    Cart(user=user, menuitem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+                    for item in menu[:size]
+                )
+
+            for size in options['sizes']:
+                for name, fn in (('before', legacy_checkout), ('after', checkout)):
+                    stats = summarize(measure(lambda: fn(user), options['repeat'], setup=lambda: fill_cart(size)))
+                    self.stdout.write(
+                        f"{size:>4} items  {name:<6}  p50={stats['p50_ms']}ms  p95={stats['p95_ms']}ms  mean={stats['mean_ms']}ms"
+                    )
@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_test_environment
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.models import MenuItem
+
+from ._bench import summarize
+
+
+class Command(BaseCommand):
+    help = ("Lanza varios procesos que hacen checkouts a la vez sobre un fichero SQLite y compara "
+            "throughput y tasa de errores con el perfil de base de datos por defecto y el de producción")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10.0, help='Segundos por perfil')
+        parser.add_argument('--profiles', nargs='+', default=['default', 'production'])
+        parser.add_argument('--admission-control', action='store_true',
+                            help='Activa el load shedding (cada worker es un único cliente: sin límite por usuario)')
+        parser.add_argument('--db-p95-ms', type=float, default=settings.LOAD_SHEDDING_DB_P95_MS,
+                            help='Umbral de p95 de las queries para el load shedding')
+        parser.add_argument('--output', help='Fichero JSON con los resultados')
+        parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)  # uso interno: proceso worker
+
+    def handle(self, *args, **options):
+        if options['worker'] is not None:
+            return self.run_worker(options['worker'], options['duration'], options['admission_control'], options['db_p95_ms'])
+
+        results = {}
+        for profile in options['profiles']:
+            with tempfile.TemporaryDirectory() as tmp:
+                env = {
+                    **os.environ,
+                    'LITTLELEMON_DB_PROFILE': profile,
+                    'LITTLELEMON_DB_NAME': os.path.join(tmp, 'contention.sqlite3'),
+                }
+                self.manage(env, 'migrate', '--verbosity', '0')
+                self.manage(env, 'seed_data', '--customers', str(options['workers']), '--menu-items', '50',
+                            '--orders', '1000', '--carts', '0', '--delivery-crew', '5', '--managers', '1',
+                            '--categories', '5')
+
+                workers = [
+                    subprocess.Popen(
+                        [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_contention',
+                         '--worker', str(i), '--duration', str(options['duration']),
+                         '--db-p95-ms', str(options['db_p95_ms']),
+                         *(['--admission-control'] if options['admission_control'] else [])],
+                        env=env, stdout=subprocess.PIPE, text=True,
+                    )
+                    for i in range(options['workers'])
+                ]
+                totals = {'checkouts': 0, 'errors': 0, 'rejected': 0}
+                samples = []
+                for worker in workers:
+                    out, _ = worker.communicate()
+                    if worker.returncode != 0:
+                        raise CommandError(f'Worker failed under profile {profile}')
+                    row = json.loads(out.strip().splitlines()[-1])
+                    totals['checkouts'] += row['checkouts']
+                    totals['errors'] += row['errors']
+                    totals['rejected'] += row['rejected']
+                    samples += row['samples']
+
+            attempts = totals['checkouts'] + totals['errors'] + totals['rejected']
+            results[profile] = {
+                'workers': options['workers'],
+                'checkouts': totals['checkouts'],
+                'errors': totals['errors'],
+                'rejected': totals['rejected'],
+                'checkouts_per_s': round(totals['checkouts'] / options['duration'], 1),
+                'error_rate': round(totals['errors'] / attempts, 4) if attempts else 0.0,
+                **summarize(samples),
+            }
+            row = results[profile]
+            self.stdout.write(
+                f"{profile:<11} {row['checkouts_per_s']:>8} checkouts/s  "
+                f"errors={row['errors']} ({row['error_rate']:.2%})  rejected={row['rejected']}  "
+                f"p50={row['p50_ms']}ms  p99={row['p99_ms']}ms"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+
+    def manage(self, env, *args):
+        subprocess.run([sys.executable, str(settings.BASE_DIR / 'manage.py'), *args],
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+
+    def run_worker(self, index, duration, admission_control, db_p95_ms):
+        # Cada worker usa su propio cliente: solo compiten por el lock de escritura de SQLite.
+        # Un 429/503 del control de admisión es un rechazo rápido, no un error
+        setup_test_environment()
+        token = Token.objects.filter(user__groups__isnull=True).order_by('user_id')[index]
+        menu = list(MenuItem.objects.values_list('id', flat=True)[:3])
+        client = APIClient(raise_request_exception=False)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        checkouts = errors = rejected = 0
+        samples = []
+        deadline = time.monotonic() + duration
+        unlimited = {role: (1e9, 1e9) for role in settings.THROTTLE_RATES_PER_ROLE}
+        with override_settings(DEBUG=False, ADMISSION_CONTROL_ENABLED=admission_control,
+                               THROTTLE_RATES_PER_ROLE=unlimited, LOAD_SHEDDING_DB_P95_MS=db_p95_ms):
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                basket = [{'menuitem': menuitem, 'quantity': 1} for menuitem in menu]
+                response = client.post('/api/cart/menu-items/', basket, format='json')
+                if response.status_code == 201:
+                    response = client.post('/api/orders/')
+                samples.append(time.perf_counter() - start)
+                if response.status_code == 201:
+                    checkouts += 1
+                elif response.status_code in (429, 503):
+                    rejected += 1
+                    time.sleep(int(response['Retry-After']))
+                else:
+                    errors += 1
+        self.stdout.write(json.dumps({'checkouts': checkouts, 'errors': errors, 'rejected': rejected,
+                                      'samples': samples}))
@@ -0,0 +1,87 @@
+import json
+import time
+import zlib
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from LittleLemonAPI.middleware import CODINGS
+from LittleLemonAPI.models import MenuItem, Order
+from LittleLemonAPI.renderers import CompactJSONRenderer
+from LittleLemonAPI.seeding import seed_database
+from LittleLemonAPI.serializers import menu_item_reader, order_reader
+
+RENDERERS = [
+    ('drf', JSONRenderer(), None),
+    ('drf indent=4', JSONRenderer(), 'application/json; indent=4'),  # salida tipo API navegable
+    ('compact', CompactJSONRenderer(), None),
+]
+
+
+def cpu_us(fn, repeat):
+    # Microsegundos de CPU del proceso por llamada
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return round((time.process_time() - start) / repeat * 1e6, 1)
+
+
+class Command(BaseCommand):
+    help = ("Mide bytes enviados y CPU por respuesta al renderizar los listados de menú y pedidos "
+            "con el JSONRenderer de DRF y con CompactJSONRenderer, y al comprimirlos con gzip/deflate")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Filas de la página grande (max_page_size)')
+        parser.add_argument('--repeat', type=int, default=2000)
+        parser.add_argument('--level', type=int, default=settings.COMPRESSION_LEVEL)
+        parser.add_argument('--output', help='Fichero JSON con los resultados')
+
+    def handle(self, *args, **options):
+        rows, repeat, level = options['rows'], options['repeat'], options['level']
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed_database({'categories': 10, 'menu_items': rows * 2, 'managers': 1, 'delivery_crew': 5,
+                           'customers': 50, 'orders': rows * 2, 'carts': 0})
+            page_size = api_settings.PAGE_SIZE
+            menu = MenuItem.objects.order_by('id')
+            orders = Order.objects.order_by('-date', '-id')
+            url = 'http://testserver/api/{}/?page=2'
+            payloads = {
+                f'menu-items ({page_size} rows)': {'count': menu.count(), 'next': url.format('menu-items'),
+                                                   'previous': None, 'results': menu_item_reader.read(menu[:page_size])},
+                f'menu-items ({rows} rows)': {'count': menu.count(), 'next': url.format('menu-items'),
+                                              'previous': None, 'results': menu_item_reader.read(menu[:rows])},
+                f'orders ({page_size} rows)': {'next': url.format('orders'), 'previous': None,
+                                               'results': order_reader.read(orders[:page_size])},
+                f'orders ({rows} rows)': {'next': url.format('orders'), 'previous': None,
+                                          'results': order_reader.read(orders[:rows])},
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        results = {}
+        for name, data in payloads.items():
+            results[name] = row = {}
+            for label, renderer, media_type in RENDERERS:
+                body = renderer.render(data, media_type)
+                row[label] = {'bytes': len(body), 'cpu_us': cpu_us(lambda: renderer.render(data, media_type), repeat)}
+            body = CompactJSONRenderer().render(data)
+            for coding, wbits in CODINGS.items():
+                def compress():
+                    compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+                    return compressor.compress(body) + compressor.flush()
+                row[coding] = {'bytes': len(compress()), 'cpu_us': cpu_us(compress, max(1, repeat // 4))}
+
+            self.stdout.write(name)
+            for label, cell in row.items():
+                self.stdout.write(f"  {label:<14} {cell['bytes']:>8} bytes  {cell['cpu_us']:>9} us")
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2)
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.models import Cart, MenuItem, Order
+from LittleLemonAPI.seeding import seed_database
+from LittleLemonAPI.serializers import (
+    CartSerializer, MenuItemSerializer, OrderSerializer, cart_reader, menu_item_reader, order_reader,
+)
+
+from ._bench import rolled_back
+
+
+def rows_per_second(fn, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return rows / best
+
+
+class Command(BaseCommand):
+    help = "Compara filas/segundo de ModelSerializer frente a ValuesReader en los listados de menú, carrito y pedidos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with rolled_back():
+            seed_database({
+                'categories': 10, 'menu_items': rows, 'managers': 1, 'delivery_crew': 10,
+                'customers': rows, 'orders': rows, 'carts': rows,
+            }, batch_size=2000)
+
+            cases = [
+                ('menu-items', MenuItem.objects.order_by('id')[:rows], MenuItemSerializer, menu_item_reader),
+                ('cart', Cart.objects.order_by('id')[:rows], CartSerializer, cart_reader),
+                ('orders', Order.objects.order_by('-date', '-id')[:rows], OrderSerializer, order_reader),
+            ]
+            for name, queryset, serializer_class, reader in cases:
+                count = queryset.count()
+                serializer = rows_per_second(lambda: serializer_class(queryset.all(), many=True).data, count, options['repeat'])
+                fast = rows_per_second(lambda: reader.read(queryset.all()), count, options['repeat'])
+                self.stdout.write(
+                    f"{name:<11} {count:>6} rows  serializer={serializer:>10,.0f} rows/s  "
+                    f"values={fast:>10,.0f} rows/s  x{fast / serializer:.1f}"
+                )
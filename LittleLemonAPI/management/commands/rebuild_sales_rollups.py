@@ -0,0 +1,25 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = ("Recalcula desde cero los rollups de ventas (por día y por día/menuitem) a partir de "
+            "los pedidos, para backfills o si se han cargado pedidos sin pasar por el checkout")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', type=datetime.date.fromisoformat, help='YYYY-MM-DD (incluido)')
+        parser.add_argument('--date-to', type=datetime.date.fromisoformat, help='YYYY-MM-DD (incluido)')
+
+    def handle(self, *args, **options):
+        date_from, date_to = options['date_from'], options['date_to']
+        if date_from and date_to and date_from > date_to:
+            raise CommandError('--date-from must not be after --date-to')
+
+        start = time.perf_counter()
+        rows = rebuild_rollups(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rows} menu item rollups in {time.perf_counter() - start:.1f}s'))
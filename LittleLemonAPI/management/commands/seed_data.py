@@ -0,0 +1,53 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.seeding import DEFAULT_VOLUMES, seed_database
+
+
+class Command(BaseCommand):
+    help = ("Genera categorías, menuitems, usuarios de cada grupo con token, carritos, pedidos "
+            "y sus items con bulk_create por bloques. Con la misma --seed el dataset es el mismo")
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default, dest=name,
+                                help=f'Default: {default}')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--credentials', help='Fichero JSON (solo legible por el usuario) con la contraseña y todos los tokens')
+
+    def handle(self, *args, **options):
+        volumes = {name: options[name] for name in DEFAULT_VOLUMES}
+        if any(count < 0 for count in volumes.values()):
+            raise CommandError('Volumes must be zero or positive')
+        if volumes['orders'] and not (volumes['customers'] and volumes['menu_items']):
+            raise CommandError('Orders need at least one customer and one menu item')
+        if volumes['menu_items'] and not volumes['categories']:
+            raise CommandError('Menu items need at least one category')
+
+        last_report = {}
+
+        def progress(model, count):
+            # Una línea cada 100.000 filas por modelo
+            name = model._meta.label
+            if count - last_report.get(name, 0) >= 100000:
+                last_report[name] = count
+                self.stdout.write(f'  {name}: {count}')
+
+        start = time.perf_counter()
+        dataset = seed_database(volumes, seed=options['seed'], batch_size=options['batch_size'], progress=progress)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(f'Seeded {volumes} in {elapsed:.1f}s'))
+        self.stdout.write(f"Every seeded user has password '{dataset.password}'")
+        for role, keys in dataset.tokens.items():
+            if keys:
+                self.stdout.write(f'  {role} token: {keys[0]}')
+        if options['credentials']:
+            fd = os.open(options['credentials'], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as fh:
+                json.dump({'password': dataset.password, 'tokens': dataset.tokens}, fh)
+            self.stdout.write(f"Credentials written to {options['credentials']}")
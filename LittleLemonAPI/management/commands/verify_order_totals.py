@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.order_totals import DRIFT_BATCH_SIZE, find_drift, order_id_batches, repair_drift
+
+
+class Command(BaseCommand):
+    help = ("Comprueba por lotes de ids que el precio de cada OrderItem y el total e item_count de "
+            "cada pedido coinciden con sus líneas; con --repair corrige los descuadres y "
+            "reconstruye los rollups de ventas de las fechas afectadas")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Corrige los descuadres encontrados')
+        parser.add_argument('--batch-size', type=int, default=DRIFT_BATCH_SIZE, help='Pedidos por lote')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        start = time.perf_counter()
+        items = orders = repaired = 0
+        for batch_start, batch_end in order_id_batches(options['batch_size']):
+            item_ids, order_ids = find_drift(batch_start, batch_end)
+            items += len(item_ids)
+            orders += len(order_ids)
+            if options['repair'] and (item_ids or order_ids):
+                repaired += repair_drift(item_ids, order_ids)
+
+        elapsed = time.perf_counter() - start
+        if not items and not orders:
+            self.stdout.write(self.style.SUCCESS(f'No drift found in {elapsed:.1f}s'))
+        elif options['repair']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Repaired {items} order items and {repaired} orders in {elapsed:.1f}s'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Found drift in {items} order items and {orders} orders ({elapsed:.1f}s); '
+                f'run with --repair to fix it'))
@@ -0,0 +1,66 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .dispatch import dispatcher
+from .roles import DELIVERY_CREW, invalidate_roles
+
+# Máximo de usuarios por petición en los endpoints de grupos en bloque
+MEMBERSHIP_BULK_LIMIT = 1000
+
+ADD, REMOVE, REPLACE = 'add', 'remove', 'replace'
+
+Membership = User.groups.through
+
+
+class UnknownUsers(Exception):
+    def __init__(self, ids):
+        super().__init__(ids)
+        self.ids = ids
+
+
+def group_members(group):
+    # Solo id y username: sin instanciar User
+    return [
+        {"id": user_id, "username": username}
+        for user_id, username in group.user_set.order_by('id').values_list('id', 'username')
+    ]
+
+
+def update_members(group, user_ids, mode):
+    # Añade, quita o sustituye (mode) los miembros del grupo con una query para resolver los
+    # usuarios, otra para leer los miembros actuales y un INSERT/DELETE en bloque sobre la tabla
+    # intermedia, en una transacción. Devuelve (añadidos, quitados).
+    # Escribir en la tabla intermedia no envía m2m_changed: cachés de roles y dispatcher se
+    # invalidan aquí
+    user_ids = set(user_ids)
+    with transaction.atomic():
+        found = set(User.objects.filter(pk__in=user_ids).values_list('id', flat=True)) if user_ids else set()
+        missing = sorted(user_ids - found)
+        if missing:
+            raise UnknownUsers(missing)
+
+        members = Membership.objects.filter(group=group)
+        if mode != REPLACE:
+            members = members.filter(user_id__in=user_ids)
+        current = set(members.values_list('user_id', flat=True))
+
+        if mode == ADD:
+            added, removed = sorted(user_ids - current), []
+        elif mode == REMOVE:
+            added, removed = [], sorted(current)
+        else:
+            added, removed = sorted(user_ids - current), sorted(current - user_ids)
+
+        if added:
+            Membership.objects.bulk_create([Membership(group=group, user_id=user_id) for user_id in added],
+                                           ignore_conflicts=True)
+        if removed:
+            Membership.objects.filter(group=group, user_id__in=removed).delete()
+
+        changed = [*added, *removed]
+        if changed:
+            # Tras el commit: antes, otra request podría volver a cachear los roles viejos
+            transaction.on_commit(lambda: invalidate_roles(*changed))
+            if group.name == DELIVERY_CREW:
+                transaction.on_commit(dispatcher.invalidate)
+    return added, removed
@@ -0,0 +1,252 @@
+import threading
+import time
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+
+_stats_lock = threading.Lock()
+_query_stats = {}
+
+
+def query_stats():
+    # Copia de la tabla por endpoint: {url_name: {requests, queries, db_ms, max_queries}}
+    with _stats_lock:
+        return {name: dict(row) for name, row in _query_stats.items()}
+
+
+def reset_query_stats():
+    with _stats_lock:
+        _query_stats.clear()
+
+
+def _record(endpoint, queries, db_time):
+    with _stats_lock:
+        row = _query_stats.setdefault(endpoint, {'requests': 0, 'queries': 0, 'db_ms': 0.0, 'max_queries': 0})
+        row['requests'] += 1
+        row['queries'] += queries
+        row['db_ms'] = round(row['db_ms'] + db_time * 1000, 3)
+        row['max_queries'] = max(row['max_queries'], queries)
+
+
+def endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return match.url_name or match.route
+
+
+class QueryCounter:
+    # execute_wrapper de la conexión: cuenta queries y tiempo en base de datos
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+def _install_counter(counter):
+    connection.execute_wrappers.append(counter)
+
+
+def _remove_counter(counter):
+    connection.execute_wrappers.remove(counter)
+
+
+class QueryStatsMiddleware:
+    # Cuenta las queries SQL y el tiempo de base de datos de cada request, los agrega
+    # por nombre de URL y, si QUERY_STATS_HEADERS está activo, los devuelve en las
+    # cabeceras X-Query-Count y Server-Timing
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(settings, 'QUERY_STATS_ENABLED', True):
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        return self._finish(request, response, counter)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'QUERY_STATS_ENABLED', True):
+            return await self.get_response(request)
+
+        # Bajo ASGI el ORM corre en el hilo síncrono de la request (sync_to_async thread_sensitive),
+        # que tiene su propia conexión: el wrapper se pone y se quita en ese mismo hilo
+        counter = QueryCounter()
+        await sync_to_async(_install_counter)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_counter)(counter)
+        return self._finish(request, response, counter)
+
+    def _finish(self, request, response, counter):
+        endpoint = endpoint_name(request)
+        if response.streaming:
+            # Las queries de un StreamingHttpResponse se ejecutan al consumir el contenido
+            response.streaming_content = self._stream(response.streaming_content, counter, endpoint)
+            return response
+
+        if endpoint is not None:
+            _record(endpoint, counter.queries, counter.db_time)
+        if getattr(settings, 'QUERY_STATS_HEADERS', False):
+            response['X-Query-Count'] = str(counter.queries)
+            response['Server-Timing'] = f'db;dur={counter.db_time * 1000:.3f};desc="{counter.queries} queries"'
+        return response
+
+    def _stream(self, content, counter, endpoint):
+        with connection.execute_wrapper(counter):
+            yield from content
+        if endpoint is not None:
+            _record(endpoint, counter.queries, counter.db_time)
+
+
+class AsyncReadsMiddleware:
+    # Bajo ASGI, los GET/HEAD del API van a las vistas async de async_views.py (LittleLemon.async_urls).
+    # Con WSGI, en el resto de métodos y en la API navegable (Accept: text/html) siguen las vistas DRF
+    sync_capable = True
+    async_capable = True
+    urlconf = 'LittleLemon.async_urls'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.use_async_views(request):
+            request.urlconf = self.urlconf
+        return await self.get_response(request)
+
+    def use_async_views(self, request):
+        return (
+            getattr(settings, 'ASYNC_READS_ENABLED', True)
+            and isinstance(request, ASGIRequest)
+            and request.method in ('GET', 'HEAD')
+            and 'text/html' not in request.headers.get('Accept', '')
+        )
+
+
+# wbits de zlib para cada Content-Encoding ("deflate" en HTTP es el formato zlib, RFC 1950)
+CODINGS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+# Solo los formatos de datos del API: el HTML de la API navegable lleva el token CSRF y comprimirlo
+# sin mitigación contra BREACH (como el relleno aleatorio de GZipMiddleware) lo expondría
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/csv')
+
+
+def negotiate_encoding(accept_encoding):
+    # Codificación con mayor q de Accept-Encoding entre las soportadas (a igualdad, gzip) o None
+    qualities = {}
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip()] = quality
+    best = None
+    for coding in CODINGS:
+        quality = qualities.get(coding, qualities.get('*', 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (coding, quality)
+    return best[0] if best else None
+
+
+def _compressor(coding):
+    return zlib.compressobj(getattr(settings, 'COMPRESSION_LEVEL', 1), zlib.DEFLATED, CODINGS[coding])
+
+
+class CompressionMiddleware:
+    # Comprime con gzip o deflate, según Accept-Encoding, las respuestas JSON/NDJSON/CSV de al menos
+    # COMPRESSION_MIN_SIZE bytes (por debajo, las cabeceras y la CPU cuestan más de lo que se ahorra).
+    # Los streaming (exportaciones) se comprimen sobre la marcha sin vaciar el compresor en cada fila
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if (not getattr(settings, 'COMPRESSION_ENABLED', True)
+                or response.has_header('Content-Encoding')
+                or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)):
+            return response
+        if response.streaming:
+            if response.is_async:
+                return response
+        elif len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        # La respuesta depende de Accept-Encoding aunque esta vez no se comprima
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self._stream(response.streaming_content, coding)
+            if response.has_header('Content-Length'):
+                del response['Content-Length']
+        else:
+            compressor = _compressor(coding)
+            compressed = compressor.compress(response.content) + compressor.flush()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # El cuerpo ya no es el mismo byte a byte: ETag débil (If-None-Match compara en débil)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+        return response
+
+    def _stream(self, content, coding):
+        compressor = _compressor(coding)
+        for chunk in content:
+            data = compressor.compress(chunk)  # streaming_content ya entrega bytes
+            if data:
+                yield data
+        yield compressor.flush()
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+from LittleLemonAPI.db import create_triggers, drop_triggers
+from LittleLemonAPI.search import SEARCH_TRIGGERS
+
+# Índice FTS5 de menuitems (LittleLemonAPI/search.py). Solo en SQLite: en otros motores
+# la búsqueda cae a LIKE y la migración no hace nada. Los triggers se definen en search.py:
+# las migraciones posteriores que toquen MenuItem o Category usan catalog.without_catalog_triggers()
+FORWARD = [
+    """CREATE VIRTUAL TABLE "LittleLemonAPI_menuitem_fts" USING fts5(
+        title, category, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    """INSERT INTO "LittleLemonAPI_menuitem_fts" (rowid, title, category)
+        SELECT m.id, m.title, c.title
+        FROM "LittleLemonAPI_menuitem" m INNER JOIN "LittleLemonAPI_category" c ON c.id = m.category_id""",
+]
+
+BACKWARD = [
+    'DROP TABLE IF EXISTS "LittleLemonAPI_menuitem_fts"',
+]
+
+
+def forward(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FORWARD:
+        schema_editor.execute(statement)
+    create_triggers(schema_editor, SEARCH_TRIGGERS)
+
+
+def backward(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    drop_triggers(schema_editor, SEARCH_TRIGGERS)
+    for statement in BACKWARD:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0008_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, backward),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:48
+
+import time
+
+from django.db import migrations, models
+
+from LittleLemonAPI.catalog import CATALOG_TRIGGERS
+from LittleLemonAPI.db import create_triggers, drop_triggers
+
+
+def forward(apps, schema_editor):
+    # La fila única de la huella del catálogo y, en SQLite, los triggers que la mantienen
+    CatalogState = apps.get_model('LittleLemonAPI', 'CatalogState')
+    CatalogState.objects.create(pk=1, modified=int(time.time()))
+    create_triggers(schema_editor, CATALOG_TRIGGERS)
+
+
+def backward(apps, schema_editor):
+    drop_triggers(schema_editor, CATALOG_TRIGGERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0010_order_item_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('modified', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(forward, backward),
+    ]
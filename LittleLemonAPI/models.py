@@ -1,10 +1,17 @@
 from django.db import models
+from django.db.models.functions import Collate
 from django.contrib.auth.models import User
 
 class Category(models.Model):
     slug = models.SlugField()
     title = models.CharField(max_length=255, db_index=True)
 
+    class Meta:
+        indexes = [
+            # category__title__iexact se traduce a LIKE en SQLite, que solo usa un índice NOCASE
+            models.Index(Collate('title', 'NOCASE'), name='category_title_nocase_idx'),
+        ]
+
 class MenuItem(models.Model):
     title = models.CharField(max_length=255, db_index=True)
     price = models.DecimalField(max_digits=6, decimal_places=2, db_index=True)
@@ -26,8 +33,16 @@ class Order(models.Model):
     delivery_crew = models.ForeignKey(User, related_name='delivery_crew', on_delete=models.SET_NULL, null=True)
     status = models.BooleanField(db_index=True,default=0)
     total = models.DecimalField(max_digits=6, decimal_places=2)
+    item_count = models.IntegerField(default=0)  # unidades (suma de quantity de sus OrderItem), se mantiene con total
     date = models.DateField(db_index=True, auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='order_user_date_idx'),  # pedidos del cliente por fecha
+            models.Index(fields=['delivery_crew', 'status'], name='order_crew_status_idx'),  # pedidos abiertos de cada repartidor
+            models.Index(fields=['delivery_crew', 'date'], name='order_crew_date_idx'),  # pedidos del repartidor por fecha
+        ]
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -36,4 +51,28 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=6, decimal_places=2)
 
     class Meta:
-        unique_together = ('order', 'menuitem')
\ No newline at end of file
+        unique_together = ('order', 'menuitem')
+
+class SalesRollup(models.Model):
+    # Ventas por día y menuitem, mantenidas en el checkout y al borrar pedidos (LittleLemonAPI/rollups.py)
+    date = models.DateField()
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'menuitem')
+
+class DailySalesRollup(models.Model):
+    # Pedidos e ingresos por día (un pedido con varios menuitems cuenta una vez)
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+class CatalogState(models.Model):
+    # Fila única (pk=1): contador de cambios del catálogo y segundos Unix del último. En SQLite lo
+    # mantienen triggers de menuitem y category (LittleLemonAPI/catalog.py), así cuenta también
+    # update(), bulk_create, SQL directo y las escrituras de otros procesos
+    version = models.BigIntegerField(default=0)
+    modified = models.BigIntegerField(default=0)
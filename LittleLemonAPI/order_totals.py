@@ -0,0 +1,138 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+from .models import Order, OrderItem
+from .rollups import change_order_item, rebuild_rollups
+
+# Pedidos por lote al verificar: acota la memoria y la duración de cada transacción de reparación
+DRIFT_BATCH_SIZE = 5000
+
+
+def _max_decimal(field):
+    # Mayor valor que cabe en un DecimalField (SQLite no aplica max_digits al guardar)
+    return Decimal(10) ** (field.max_digits - field.decimal_places) - Decimal(1).scaleb(-field.decimal_places)
+
+
+MAX_LINE_PRICE = _max_decimal(OrderItem._meta.get_field('price'))
+MAX_ORDER_TOTAL = _max_decimal(Order._meta.get_field('total'))
+
+
+class DuplicateMenuItem(Exception):
+    pass
+
+
+class OrderLimitExceeded(Exception):
+    # El precio de la línea o el total del pedido pasarían del máximo de su columna
+    pass
+
+
+def update_order_item(order_item, changes):
+    # Aplica a un OrderItem los cambios validados (menuitem y/o quantity) y propaga la diferencia
+    # a Order.total, Order.item_count y los rollups con UPDATE ... SET x = x + delta, sin volver
+    # a sumar las líneas del pedido. Todo en una transacción: o se aplica entero o nada
+    with transaction.atomic():
+        # Valores actuales dentro de la transacción, no los de la instancia (pueden ser viejos)
+        menuitem_id, quantity, unit_price, price, order_id, date, total = (
+            OrderItem.objects.filter(pk=order_item.pk)
+            .values_list('menuitem_id', 'quantity', 'unit_price', 'price', 'order_id', 'order__date', 'order__total')
+            .get()
+        )
+
+        new_menuitem = changes.get('menuitem')
+        if new_menuitem is not None and new_menuitem.pk != menuitem_id:
+            if OrderItem.objects.filter(order_id=order_id, menuitem=new_menuitem).exists():
+                raise DuplicateMenuItem()
+            # Al cambiar de menuitem se cobra su precio actual; si no, se mantiene el precio pactado
+            new_menuitem_id, new_unit_price = new_menuitem.pk, new_menuitem.price
+        else:
+            new_menuitem_id, new_unit_price = menuitem_id, unit_price
+        new_quantity = changes.get('quantity', quantity)
+        new_price = new_unit_price * new_quantity
+        price_delta = new_price - price
+        quantity_delta = new_quantity - quantity
+        if new_price > MAX_LINE_PRICE or total + price_delta > MAX_ORDER_TOTAL:
+            raise OrderLimitExceeded()
+
+        if new_menuitem_id != menuitem_id or quantity_delta or price_delta:
+            OrderItem.objects.filter(pk=order_item.pk).update(
+                menuitem_id=new_menuitem_id,
+                quantity=new_quantity,
+                unit_price=new_unit_price,
+                price=Round(F('price') + price_delta, 2),
+            )
+            Order.objects.filter(pk=order_id).update(
+                total=Round(F('total') + price_delta, 2),
+                item_count=F('item_count') + quantity_delta,
+            )
+            change_order_item(date, (menuitem_id, quantity, price), (new_menuitem_id, new_quantity, new_price))
+
+    order_item.menuitem_id = new_menuitem_id
+    if new_menuitem is not None and new_menuitem.pk == new_menuitem_id:
+        order_item.menuitem = new_menuitem
+    order_item.quantity = new_quantity
+    order_item.unit_price = new_unit_price
+    order_item.price = new_price
+    return order_item
+
+
+def _expected_totals():
+    # Subqueries correlacionadas con lo que deberían valer total e item_count (índice order_id)
+    items = OrderItem.objects.filter(order=OuterRef('pk')).values('order')
+    total = Coalesce(
+        Subquery(items.annotate(s=Sum('price')).values('s')),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=6, decimal_places=2),
+    )
+    units = Coalesce(Subquery(items.annotate(s=Sum('quantity')).values('s')), 0)
+    return Round(total, 2), units
+
+
+def find_drift(start, end):
+    # Ids de OrderItem con price != ROUND(unit_price * quantity, 2) y de Order cuyo total o
+    # item_count no coincide con sus líneas, para pedidos con id en [start, end)
+    items = list(
+        OrderItem.objects.filter(order_id__gte=start, order_id__lt=end)
+        .alias(stored=Round('price', 2), expected=Round(F('unit_price') * F('quantity'), 2))
+        .exclude(stored=F('expected'))
+        .values_list('id', flat=True)
+    )
+    total, units = _expected_totals()
+    orders = list(
+        Order.objects.filter(pk__gte=start, pk__lt=end)
+        .alias(stored=Round('total', 2), expected_total=total, expected_units=units)
+        .exclude(Q(stored=F('expected_total')) & Q(item_count=F('expected_units')))
+        .values_list('id', flat=True)
+    )
+    return items, orders
+
+
+def repair_drift(item_ids, order_ids):
+    # Corrige las líneas, recalcula los pedidos afectados (los de esas líneas también) y
+    # reconstruye los rollups de sus fechas. Devuelve el número de pedidos recalculados
+    with transaction.atomic():
+        if item_ids:
+            OrderItem.objects.filter(pk__in=item_ids).update(price=Round(F('unit_price') * F('quantity'), 2))
+            order_ids = set(order_ids) | set(
+                OrderItem.objects.filter(pk__in=item_ids).values_list('order_id', flat=True))
+        if not order_ids:
+            return 0
+        total, units = _expected_totals()
+        orders = Order.objects.filter(pk__in=order_ids)
+        repaired = orders.update(total=total, item_count=units)
+        dates = sorted(set(orders.values_list('date', flat=True)))
+        for date in dates:
+            rebuild_rollups(date, date)
+    return repaired
+
+
+def order_id_batches(batch_size=DRIFT_BATCH_SIZE):
+    # Rangos [start, end) de ids que cubren todos los pedidos
+    bounds = Order.objects.order_by('pk').values_list('pk', flat=True)
+    first, last = bounds.first(), bounds.last()
+    if first is None:
+        return
+    for start in range(first, last + 1, batch_size):
+        yield start, start + batch_size
@@ -0,0 +1,135 @@
+import base64
+import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from django.core.paginator import InvalidPage, Page
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    # Paginación por cursor sobre (date, id), de más reciente a más antiguo.
+    # Cada página es un "WHERE (date, id) < cursor ORDER BY date DESC, id DESC LIMIT n",
+    # así que cuesta lo mismo en la página 1 que en la 10.000 y no se desplaza con inserts nuevos
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        page_size = api_settings.PAGE_SIZE or 10
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def encode_cursor(self, obj, reverse):
+        # Acepta instancias o filas de values()
+        date, pk = (obj['date'], obj['id']) if isinstance(obj, dict) else (obj.date, obj.pk)
+        raw = f"{date.isoformat()}|{pk}|{int(reverse)}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            date, pk, reverse = base64.urlsafe_b64decode(encoded.encode()).decode().split('|')
+            return datetime.date.fromisoformat(date), int(pk), bool(int(reverse))
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._prepare(queryset, request)
+        return self._paginate(list(queryset[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # Para las vistas async: misma página, leída con el ORM async
+        queryset = self._prepare(queryset, request)
+        return self._paginate([row async for row in queryset[:self.page_size + 1]])
+
+    def _prepare(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        if self.cursor is None:
+            return queryset.order_by('-date', '-id')
+        date, pk, reverse = self.cursor
+        if reverse:
+            # Página anterior: se recorre hacia delante y luego se invierte
+            return queryset.filter(Q(date__gt=date) | Q(date=date, id__gt=pk)).order_by('date', 'id')
+        return queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=pk)).order_by('-date', '-id')
+
+    def _paginate(self, results):
+        reverse = self.cursor is not None and self.cursor[2]
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, self.cursor is not None
+
+        # Los cursores se calculan ya: las filas pueden transformarse después al serializarlas
+        self.next_cursor = self.encode_cursor(results[-1], False) if has_next and results else None
+        self.previous_cursor = self.encode_cursor(results[0], True) if has_previous and results else None
+        return results
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.next_cursor)
+
+    def get_previous_link(self):
+        if self.previous_cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    # PageNumberPagination para las vistas async: el COUNT y la página se leen con el ORM
+    # async y se montan en un Page de Django, así los enlaces y la respuesta son los mismos
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.__dict__['count'] = await queryset.acount()  # count es cached_property
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        bottom = (number - 1) * page_size
+        object_list = [obj async for obj in queryset[bottom:bottom + page_size]]
+        self.page = Page(object_list, number, paginator)
+        self.request = request
+        return object_list
@@ -0,0 +1,41 @@
+import datetime
+import decimal
+import json
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+_drf_default = JSONEncoder().default
+
+
+def _default(obj):
+    # Los tipos más frecuentes en las respuestas, con la misma salida que el JSONEncoder de DRF;
+    # el resto pasa por su cadena de isinstance
+    kind = type(obj)
+    if kind is decimal.Decimal:
+        return float(obj)  # los serializers ya los convierten a string; esto es lo que haría DRF
+    if kind is datetime.date:
+        return obj.isoformat()
+    return _drf_default(obj)
+
+# Un único encoder configurado una vez: json.dumps(cls=...) construye uno nuevo en cada respuesta
+_encoder = json.JSONEncoder(ensure_ascii=JSONRenderer.ensure_ascii, allow_nan=not JSONRenderer.strict,
+                            separators=(',', ':'), default=_default)
+
+
+class CompactJSONRenderer(JSONRenderer):
+    # JSON compacto (sin espacios) con el encoder C de la stdlib; misma salida que JSONRenderer.
+    # Con 'application/json; indent=N' o desde la API navegable se usa el render de DRF
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Solo se analiza la cabecera si trae parámetros (indent=...)
+        if (accepted_media_type and ';' in accepted_media_type) or (renderer_context or {}).get('indent') is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = _encoder.encode(data)
+        # Como DRF: \u2028 y \u2029 escapados para que la salida sea un subconjunto estricto de JavaScript
+        if '\u2028' in ret or '\u2029' in ret:
+            ret = ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return ret.encode()
@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+MANAGER = "Manager"
+DELIVERY_CREW = "Delivery crew"
+
+ROLE_CACHE_PREFIX = "roles:"
+
+
+def _cache_key(user_id):
+    return f"{ROLE_CACHE_PREFIX}{user_id}"
+
+
+def get_roles(user):
+    # Nombres de grupo del usuario: una vez por request (en el propio objeto user)
+    # y compartidos entre requests a través de la caché con TTL
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, "_cached_roles", None)
+    if roles is not None:
+        return roles
+
+    key = _cache_key(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        roles = frozenset(user.groups.values_list("name", flat=True))
+        cache.set(key, roles, getattr(settings, "ROLE_CACHE_TTL", 60))
+
+    user._cached_roles = roles
+    return roles
+
+
+async def aget_roles(user):
+    # get_roles() para las vistas async: misma caché, la query de grupos va por el ORM async
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, "_cached_roles", None)
+    if roles is not None:
+        return roles
+
+    key = _cache_key(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        roles = frozenset([name async for name in user.groups.values_list("name", flat=True)])
+        cache.set(key, roles, getattr(settings, "ROLE_CACHE_TTL", 60))
+
+    user._cached_roles = roles
+    return roles
+
+
+def is_manager(user):
+    return MANAGER in get_roles(user)
+
+
+def is_delivery_crew(user):
+    return DELIVERY_CREW in get_roles(user)
+
+
+def is_customer(user):
+    # Clientes = usuarios sin ningún grupo
+    return not get_roles(user)
+
+
+def invalidate_roles(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def _membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Cubre ManagerGroupView/DeliveryGroupView y sus Remove*, pero también admin y shell
+    if action not in ("post_add", "post_remove", "post_clear", "pre_clear"):
+        return
+
+    if not reverse:
+        # user.groups.add/remove/clear
+        instance.__dict__.pop("_cached_roles", None)
+        invalidate_roles(instance.pk)
+    elif pk_set:
+        # group.user_set.add/remove
+        invalidate_roles(*pk_set)
+    elif action == "pre_clear":
+        # group.user_set.clear(): pk_set no está disponible, se calcula antes de borrar
+        invalidate_roles(*instance.user_set.values_list("id", flat=True))
@@ -0,0 +1,107 @@
+from django.db import connection, transaction
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .db import upsert_batches, upsert_sql
+from .models import DailySalesRollup, Order, OrderItem, SalesRollup
+
+
+def _qn(name):
+    return connection.ops.quote_name(name)
+
+
+def _upsert_sql(model, keys, counters, rows):
+    # Upsert que suma los contadores a la fila existente.
+    # Los importes se redondean a 2 decimales en cada suma (SQLite opera en coma flotante)
+    table = _qn(model._meta.db_table)
+    updates = {}
+    for column in counters:
+        value = f"{table}.{_qn(column)} + excluded.{_qn(column)}"
+        updates[column] = f"ROUND({value}, 2)" if column == 'revenue' else value
+    return upsert_sql(model, [*keys, *counters], keys, updates, rows)
+
+
+def _apply(date, orders, revenue, rows):
+    # Suma deltas: (orders, revenue) al día y rows = [(menuitem_id, quantity, orders, revenue), ...] por menuitem
+    rows = [(date, *row) for row in rows]
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_sql(DailySalesRollup, ['date'], ['orders', 'revenue'], 1), [date, orders, revenue])
+        for batch, params in upsert_batches(rows):
+            cursor.execute(_upsert_sql(SalesRollup, ['date', 'menuitem_id'], ['quantity', 'orders', 'revenue'], len(batch)), params)
+
+
+def _drop_empty(date, menuitem_ids):
+    # Las filas que se quedan sin pedidos desaparecen
+    DailySalesRollup.objects.filter(date=date, orders__lte=0).delete()
+    if menuitem_ids:
+        SalesRollup.objects.filter(date=date, menuitem__in=menuitem_ids, orders__lte=0).delete()
+
+
+def add_order(order, items):
+    # Suma un pedido nuevo a los rollups; se llama dentro de la transacción del checkout
+    _apply(order.date, 1, order.total, [(item.menuitem_id, item.quantity, 1, item.price) for item in items])
+
+
+def remove_order(order):
+    # Resta un pedido que se va a borrar
+    items = list(OrderItem.objects.filter(order=order).values_list('menuitem_id', 'quantity', 'price'))
+    _apply(order.date, -1, -order.total, [(menuitem_id, -quantity, -1, -price) for menuitem_id, quantity, price in items])
+    _drop_empty(order.date, [menuitem_id for menuitem_id, _, _ in items])
+
+
+def change_order_item(date, before, after):
+    # Aplica la edición de un OrderItem; before/after: (menuitem_id, quantity, price)
+    if before[0] == after[0]:
+        rows = [(after[0], after[1] - before[1], 0, after[2] - before[2])]
+    else:
+        rows = [(before[0], -before[1], -1, -before[2]), (after[0], after[1], 1, after[2])]
+    _apply(date, 0, after[2] - before[2], rows)
+    if before[0] != after[0]:
+        _drop_empty(date, [before[0]])
+
+
+def rebuild_rollups(date_from=None, date_to=None):
+    # Recalcula desde cero los rollups del rango (todos si no hay rango) con dos INSERT ... SELECT
+    conditions, params = [], []
+    if date_from is not None:
+        conditions.append(f"o.{_qn('date')} >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append(f"o.{_qn('date')} <= %s")
+        params.append(date_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    orders = _qn(Order._meta.db_table)
+    order_items = _qn(OrderItem._meta.db_table)
+    date, total = _qn('date'), _qn('total')
+    with transaction.atomic():
+        rollups = SalesRollup.objects.all()
+        daily = DailySalesRollup.objects.all()
+        if date_from is not None:
+            rollups, daily = rollups.filter(date__gte=date_from), daily.filter(date__gte=date_from)
+        if date_to is not None:
+            rollups, daily = rollups.filter(date__lte=date_to), daily.filter(date__lte=date_to)
+        rollups.delete()
+        daily.delete()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {_qn(DailySalesRollup._meta.db_table)} ({date}, {_qn('orders')}, {_qn('revenue')}) "
+                f"SELECT o.{date}, COUNT(*), ROUND(SUM(o.{total}), 2) FROM {orders} o {where} GROUP BY o.{date}",
+                params,
+            )
+            cursor.execute(
+                f"INSERT INTO {_qn(SalesRollup._meta.db_table)} "
+                f"({date}, {_qn('menuitem_id')}, {_qn('quantity')}, {_qn('orders')}, {_qn('revenue')}) "
+                f"SELECT o.{date}, i.{_qn('menuitem_id')}, SUM(i.{_qn('quantity')}), COUNT(*), ROUND(SUM(i.{_qn('price')}), 2) "
+                f"FROM {order_items} i INNER JOIN {orders} o ON o.{_qn('id')} = i.{_qn('order_id')} {where} "
+                f"GROUP BY o.{date}, i.{_qn('menuitem_id')}",
+                params,
+            )
+            return cursor.rowcount
+
+
+@receiver(pre_delete, sender=Order)
+def _order_deleted(sender, instance, **kwargs):
+    # pre_delete se envía dentro de la transacción del borrado y antes de borrar sus OrderItem
+    remove_order(instance)
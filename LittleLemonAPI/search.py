@@ -0,0 +1,74 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+# Tabla FTS5 (rowid = MenuItem.id) con el título del menuitem y el de su categoría.
+# La crea la migración 0009_menuitem_search, y sus triggers la mantienen al día
+# en cada INSERT/UPDATE/DELETE de menuitems y al renombrar una categoría. Las migraciones que
+# cambien MenuItem o Category deben usar catalog.without_catalog_triggers()
+SEARCH_TABLE = 'LittleLemonAPI_menuitem_fts'
+MAX_TERMS = 8
+
+SEARCH_TRIGGERS = {
+    'LittleLemonAPI_menuitem_fts_insert':
+        """AFTER INSERT ON "LittleLemonAPI_menuitem" BEGIN
+        INSERT INTO "LittleLemonAPI_menuitem_fts" (rowid, title, category)
+        VALUES (new.id, new.title, (SELECT title FROM "LittleLemonAPI_category" WHERE id = new.category_id));
+    END""",
+    'LittleLemonAPI_menuitem_fts_update':
+        """AFTER UPDATE OF title, category_id ON "LittleLemonAPI_menuitem"
+    WHEN old.title IS NOT new.title OR old.category_id IS NOT new.category_id BEGIN
+        UPDATE "LittleLemonAPI_menuitem_fts"
+        SET title = new.title, category = (SELECT title FROM "LittleLemonAPI_category" WHERE id = new.category_id)
+        WHERE rowid = old.id;
+    END""",
+    'LittleLemonAPI_menuitem_fts_delete':
+        """AFTER DELETE ON "LittleLemonAPI_menuitem" BEGIN
+        DELETE FROM "LittleLemonAPI_menuitem_fts" WHERE rowid = old.id;
+    END""",
+    'LittleLemonAPI_category_fts_update':
+        """AFTER UPDATE OF title ON "LittleLemonAPI_category"
+    WHEN old.title IS NOT new.title BEGIN
+        UPDATE "LittleLemonAPI_menuitem_fts" SET category = new.title
+        WHERE rowid IN (SELECT id FROM "LittleLemonAPI_menuitem" WHERE category_id = new.id);
+    END""",
+}
+
+
+def search_terms(text):
+    return re.findall(r'\w+', text)[:MAX_TERMS]
+
+
+def match_expression(terms):
+    # Cada término como prefijo entre comillas ("pas"* "mai"*, AND implícito): solo se pasan
+    # palabras, así que la sintaxis de FTS5 (OR, NEAR, -, col:) no llega desde la query string
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_menu_items(queryset, text):
+    terms = search_terms(text)
+    if not terms:
+        return queryset
+
+    connection = connections[queryset.db]
+    if connection.vendor != 'sqlite':
+        # Sin FTS5: mismo resultado con LIKE (sin índice)
+        for term in terms:
+            queryset = queryset.filter(Q(title__icontains=term) | Q(category__title__icontains=term))
+        return queryset
+
+    table = connection.ops.quote_name(SEARCH_TABLE)
+    matches = RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [match_expression(terms)])
+    return queryset.filter(id__in=matches)
+
+
+class MenuItemSearchFilter(BaseFilterBackend):
+    # ?search= por prefijo sobre el título del menuitem y el de su categoría
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        return search_menu_items(queryset, request.query_params.get(self.search_param, ''))
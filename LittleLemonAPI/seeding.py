@@ -0,0 +1,195 @@
+import random
+import secrets
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from .models import Category, MenuItem, Cart, Order, OrderItem
+from .roles import MANAGER, DELIVERY_CREW
+from .rollups import rebuild_rollups
+
+DEFAULT_VOLUMES = {
+    'categories': 20,
+    'menu_items': 2000,
+    'managers': 20,
+    'delivery_crew': 200,
+    'customers': 20000,
+    'orders': 200000,
+    'carts': 2000,
+}
+
+
+def _batches(iterable, size):
+    batch = []
+    for obj in iterable:
+        batch.append(obj)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _bulk_insert(model, objs, batch_size, progress=None):
+    # bulk_create por bloques, sin tener todas las filas en memoria; una transacción
+    # por bloque para no pagar un commit por fila ni mantener abierta una transacción enorme
+    total = 0
+    for batch in _batches(objs, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=batch_size)
+        total += len(batch)
+        if progress is not None:
+            progress(model, total)
+    return total
+
+
+def _next_id(model):
+    last = model.objects.order_by('-id').values_list('id', flat=True).first()
+    return (last or 0) + 1
+
+
+@contextmanager
+def _without_auto_now_add(model, field_name):
+    # bulk_create respeta auto_now_add y pondría la fecha de hoy en todas las filas
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Dataset:
+    # Ids y credenciales generados, para que los benchmarks sepan con quién autenticarse
+    def __init__(self):
+        self.categories = []
+        self.menu_items = []
+        self.password = None
+        self.tokens = {'manager': [], 'delivery_crew': [], 'customer': []}
+
+
+def seed_database(volumes=None, seed=0, batch_size=5000, today=None, progress=None):
+    # Misma semilla y mismos volúmenes => mismo dataset (salvo los ids, que continúan los existentes).
+    # Las credenciales no salen de la semilla: contraseña y tokens son aleatorios en cada ejecución
+    # y solo se conocen por el Dataset devuelto
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    rng = random.Random(seed)
+    today = today or date.today()
+    dataset = Dataset()
+
+    first_category = _next_id(Category)
+    dataset.categories = [first_category + i for i in range(volumes['categories'])]
+    _bulk_insert(Category, (
+        Category(id=category_id, slug=f'category-{category_id}', title=f'Category {category_id}')
+        for category_id in dataset.categories
+    ), batch_size, progress)
+
+    first_item = _next_id(MenuItem)
+    prices = {}
+    def menu_items():
+        for i in range(volumes['menu_items']):
+            price = Decimal(rng.randint(200, 3000)) / 100
+            prices[first_item + i] = price
+            yield MenuItem(
+                id=first_item + i,
+                title=f'Menu item {first_item + i}',
+                price=price,
+                featured=rng.random() < 0.1,
+                category_id=rng.choice(dataset.categories),
+            )
+    _bulk_insert(MenuItem, menu_items(), batch_size, progress)
+    dataset.menu_items = list(prices)
+
+    # Un único hash para todos: make_password es deliberadamente lento
+    dataset.password = secrets.token_urlsafe(16)
+    password = make_password(dataset.password)
+    first_user = _next_id(User)
+    user_roles = (
+        ['manager'] * volumes['managers']
+        + ['delivery_crew'] * volumes['delivery_crew']
+        + ['customer'] * volumes['customers']
+    )
+    users = {'manager': [], 'delivery_crew': [], 'customer': []}
+    def user_rows():
+        for i, role in enumerate(user_roles):
+            user_id = first_user + i
+            users[role].append(user_id)
+            yield User(id=user_id, username=f'{role}-{user_id}', password=password)
+    _bulk_insert(User, user_rows(), batch_size, progress)
+
+    membership = User.groups.through
+    for role, group_name in (('manager', MANAGER), ('delivery_crew', DELIVERY_CREW)):
+        group, _ = Group.objects.get_or_create(name=group_name)
+        _bulk_insert(membership, (membership(user_id=user_id, group_id=group.id) for user_id in users[role]),
+                     batch_size, progress)
+
+    def tokens():
+        for role, user_ids in users.items():
+            for user_id in user_ids:
+                key = Token.generate_key()
+                dataset.tokens[role].append(key)
+                yield Token(key=key, user_id=user_id)
+    _bulk_insert(Token, tokens(), batch_size, progress)
+
+    def carts():
+        # Usuarios distintos y menuitems distintos por carrito: respeta unique_together ('menuitem', 'user')
+        for user_id in rng.sample(users['customer'], k=min(volumes['carts'], len(users['customer']))):
+            for menuitem_id in rng.sample(dataset.menu_items, k=min(len(dataset.menu_items), rng.randint(1, 5))):
+                quantity = rng.randint(1, 3)
+                yield Cart(user_id=user_id, menuitem_id=menuitem_id, quantity=quantity,
+                           unit_price=prices[menuitem_id], price=prices[menuitem_id] * quantity)
+    _bulk_insert(Cart, carts(), batch_size, progress)
+
+    first_order = _next_id(Order)
+    order_items = []
+    def orders():
+        for i in range(volumes['orders']):
+            order_id = first_order + i
+            crew = rng.choice(users['delivery_crew']) if users['delivery_crew'] and rng.random() < 0.8 else None
+            total = Decimal('0')
+            units = 0
+            # sample() no repite menuitems: respeta unique_together ('order', 'menuitem')
+            for menuitem_id in rng.sample(dataset.menu_items, k=min(len(dataset.menu_items), rng.randint(1, 4))):
+                quantity = rng.randint(1, 3)
+                price = prices[menuitem_id] * quantity
+                total += price
+                units += quantity
+                order_items.append(OrderItem(
+                    order_id=order_id, menuitem_id=menuitem_id, quantity=quantity,
+                    unit_price=prices[menuitem_id], price=price,
+                ))
+            yield Order(
+                id=order_id,
+                user_id=rng.choice(users['customer']),
+                delivery_crew_id=crew,
+                status=crew is not None and rng.random() < 0.7,
+                total=total,
+                item_count=units,
+                date=today - timedelta(days=rng.randint(0, 364)),
+            )
+
+    with _without_auto_now_add(Order, 'date'):
+        created = 0
+        item_count = 0
+        for batch in _batches(orders(), batch_size):
+            # Cada bloque de pedidos se guarda junto con sus items
+            with transaction.atomic():
+                Order.objects.bulk_create(batch, batch_size=batch_size)
+                OrderItem.objects.bulk_create(order_items, batch_size=batch_size)
+            created += len(batch)
+            item_count += len(order_items)
+            order_items.clear()
+            if progress is not None:
+                progress(Order, created)
+                progress(OrderItem, item_count)
+
+    if volumes['orders']:
+        # Los pedidos no pasan por el checkout: rollups de ventas recalculados para las fechas sembradas
+        rebuild_rollups(today - timedelta(days=364), today)
+
+    return dataset
@@ -1,5 +1,14 @@
+import datetime
+import decimal
+
+from .cart import MAX_QUANTITY
+from .memberships import MEMBERSHIP_BULK_LIMIT
 from .models import MenuItem, Category, Order, OrderItem, Cart
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework import ISO_8601
+from rest_framework.settings import api_settings
+from django.utils.functional import cached_property
 from django.contrib.auth.models import User
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -28,6 +37,21 @@ class CartSerializer(serializers.ModelSerializer):
             'unit_price': {'required': True, 'max_digits': 6, 'decimal_places': 2}
         }
 
+class CartEntrySerializer(serializers.Serializer):
+    # Una línea de POST /cart/menu-items/ (se admite un objeto o una lista)
+    menuitem = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=MAX_QUANTITY)
+
+class UserIdsSerializer(serializers.Serializer):
+    # Cuerpo de los endpoints de grupos en bloque (/groups/<grupo>/users/bulk)
+    user_ids = serializers.ListField(child=serializers.IntegerField(), max_length=MEMBERSHIP_BULK_LIMIT)
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    # Usuario expandido dentro de otra respuesta (?expand=delivery_crew)
+    class Meta:
+        model = User
+        fields = ['id', 'username']
+
 class OrderSerializer(serializers.ModelSerializer):
     delivery_crew = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),  # Aquí ponemos todos para validar después
@@ -37,8 +61,8 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'date']
-        read_only_fields = ['user', 'date', 'total']
+        fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'item_count', 'date']
+        read_only_fields = ['user', 'date', 'total', 'item_count']
 
     def validate_delivery_crew(self, value):
         if value is not None:
@@ -47,6 +71,17 @@ class OrderSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("the user is not from Delivery crew.")
         return value
 
+class OrderUpdateEntrySerializer(serializers.Serializer):
+    # Una entrada de PATCH /orders/bulk/: pedido y valores nuevos de delivery_crew y/o status
+    order = serializers.IntegerField()
+    delivery_crew = serializers.IntegerField(allow_null=True, required=False)
+    status = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        if 'delivery_crew' not in attrs and 'status' not in attrs:
+            raise serializers.ValidationError("delivery_crew or status is required.")
+        return attrs
+
 class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
@@ -55,4 +90,181 @@ class OrderItemSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             'menuitem': {'required': True},
             'quantity': {'required': True, 'min_value': 1},
-        }
\ No newline at end of file
+        }
+
+class OrderLineSerializer(serializers.ModelSerializer):
+    # Línea dentro del detalle de un pedido, con el título del plato
+    title = serializers.CharField(source='menuitem.title', read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ['id', 'menuitem', 'title', 'quantity', 'unit_price', 'price']
+
+class OrderDetailSerializer(OrderSerializer):
+    # GET /orders/<pk>/: el pedido con sus líneas (prefetch en Order.lines, ver views.order_detail)
+    items = OrderLineSerializer(source='lines', many=True, read_only=True)
+
+    class Meta(OrderSerializer.Meta):
+        fields = OrderSerializer.Meta.fields + ['items']
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def _split_param(query_params, name):
+    value = query_params.get(name, '')
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+class ReadShape:
+    # Forma de una lectura con ValuesReader: campos pedidos (?fields=, None = todos) y
+    # relaciones a expandir (?expand=)
+    __slots__ = ('fields', 'expand')
+
+    def __init__(self, fields=None, expand=frozenset()):
+        self.fields = fields
+        self.expand = expand
+
+
+class ValuesReader:
+    # Ruta rápida de solo lectura: lee dicts con values() y les aplica conversores precalculados
+    # a partir de los campos de un ModelSerializer, sin instanciar modelos ni serializers.
+    # La salida es idéntica a la del serializer; las escrituras siguen validando con él.
+    # Con un ReadShape solo se seleccionan las columnas pedidas (más key_fields, que necesita la
+    # paginación) y las FK de expandable se leen con JOIN en la misma query y se anidan como dicts
+    def __init__(self, serializer_class, expandable=None, key_fields=('id',)):
+        self.serializer_class = serializer_class
+        self.expandable = expandable or {}  # {campo FK: ValuesReader del modelo relacionado}
+        self.key_fields = key_fields
+
+    @cached_property
+    def _fields(self):
+        # Se construyen en el primer uso, con el registro de apps ya cargado
+        return self.serializer_class().fields
+
+    @cached_property
+    def field_names(self):
+        return list(self._fields)
+
+    @cached_property
+    def converters(self):
+        converters = []
+        for name, field in self._fields.items():
+            converter = self._converter(field)
+            if converter is not None:
+                converters.append((name, converter))
+        return converters
+
+    def _converter(self, field):
+        if isinstance(field, (serializers.PrimaryKeyRelatedField, serializers.IntegerField,
+                              serializers.BooleanField, serializers.CharField)):
+            return None  # values() ya devuelve pk, int, bool o str
+        if isinstance(field, serializers.DecimalField):
+            if field.localize or field.normalize_output or not getattr(
+                    field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+                return field.to_representation
+            exponent = decimal.Decimal('.1') ** field.decimal_places
+            context = decimal.getcontext().copy()
+            context.prec = field.max_digits
+            rounding = field.rounding
+            return lambda value: f'{value.quantize(exponent, rounding=rounding, context=context):f}'
+        if isinstance(field, serializers.DateField) and not isinstance(field, serializers.DateTimeField):
+            if getattr(field, 'format', api_settings.DATE_FORMAT).lower() == ISO_8601:
+                return datetime.date.isoformat
+            return field.to_representation
+        raise TypeError(f'{type(field).__name__} is not supported by ValuesReader ({self.serializer_class.__name__})')
+
+    def shape(self, query_params):
+        # ReadShape de ?fields= y ?expand=, o None sin ninguno de los dos (la ruta de siempre).
+        # Los nombres desconocidos son un 400; una expansión válida que este endpoint no tiene
+        # se ignora, así el mismo ?expand= sirve para carrito, menú y pedidos
+        fields = _split_param(query_params, FIELDS_PARAM)
+        expand = _split_param(query_params, EXPAND_PARAM)
+        if not fields and not expand:
+            return None
+        errors = {}
+        unknown = [name for name in fields if name not in self.field_names]
+        if unknown:
+            errors[FIELDS_PARAM] = [f'Unknown field: {name}' for name in unknown]
+        unknown = [name for name in expand if name not in EXPANDABLE]
+        if unknown:
+            errors[EXPAND_PARAM] = [f'Cannot expand: {name}' for name in unknown]
+        if errors:
+            raise ValidationError(errors)
+        return ReadShape(set(fields) if fields else None, frozenset(expand))
+
+    def _selected(self, shape):
+        if shape is None or shape.fields is None:
+            return self.field_names
+        return [name for name in self.field_names if name in shape.fields or name in self.key_fields]
+
+    def _expanded(self, shape):
+        if shape is None or not shape.expand:
+            return []
+        return [(name, reader) for name, reader in self.expandable.items()
+                if name in shape.expand and (shape.fields is None or name in shape.fields)]
+
+    def _columns(self, shape, prefix=''):
+        columns = [prefix + name for name in self._selected(shape)]
+        for name, reader in self._expanded(shape):
+            # El equivalente en values() de select_related: JOIN (LEFT OUTER si la FK es nullable)
+            columns += reader._columns(ReadShape(expand=shape.expand), f'{prefix}{name}__')
+        return columns
+
+    def values(self, queryset, shape=None):
+        return queryset.values(*self._columns(shape))
+
+    def to_representation(self, rows, shape=None):
+        converters = self.converters
+        if shape is None:
+            data = []
+            for row in rows:
+                for name, converter in converters:
+                    value = row[name]
+                    if value is not None:
+                        row[name] = converter(value)
+                data.append(row)
+            return data
+
+        selected = self._selected(shape)
+        converters = [(name, converter) for name, converter in converters if name in selected]
+        expanded = [(name, reader, ReadShape(expand=shape.expand)) for name, reader in self._expanded(shape)]
+        dropped = [name for name in selected if shape.fields is not None and name not in shape.fields]
+        data = []
+        for row in rows:
+            for name, converter in converters:
+                value = row[name]
+                if value is not None:
+                    row[name] = converter(value)
+            for name, reader, nested in expanded:
+                row[name] = reader._nest(row, f'{name}__', nested)
+            for name in dropped:
+                del row[name]
+            data.append(row)
+        return data
+
+    def _nest(self, row, prefix, shape):
+        # Saca de la fila las columnas prefix__* del objeto relacionado; None si la FK es nula
+        obj = {name: row.pop(prefix + name) for name in self.field_names}
+        for name, reader in self._expanded(shape):
+            obj[name] = reader._nest(row, f'{prefix}{name}__', shape)
+        if obj['id'] is None:
+            return None
+        for name, converter in self.converters:
+            value = obj[name]
+            if value is not None:
+                obj[name] = converter(value)
+        return obj
+
+    def read(self, queryset, shape=None):
+        return self.to_representation(self.values(queryset, shape), shape)
+
+
+category_reader = ValuesReader(CategorySerializer)
+menu_item_reader = ValuesReader(MenuItemSerializer, expandable={'category': category_reader})
+cart_reader = ValuesReader(CartSerializer, expandable={'menuitem': menu_item_reader})
+order_reader = ValuesReader(OrderSerializer, expandable={'delivery_crew': ValuesReader(UserSummarySerializer)},
+                            key_fields=('id', 'date'))  # el cursor de KeysetPagination
+
+# Relaciones que acepta ?expand= (cada endpoint aplica las suyas)
+EXPANDABLE = {'menuitem', 'category', 'delivery_crew'}
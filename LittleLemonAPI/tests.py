@@ -1,3 +1,1682 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import zlib
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User, Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, migrations, models
+from django.db.migrations.loader import MigrationLoader
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.test import APITestCase
+
+from . import async_views, views
+from .admission import TokenBucket, admission_stats, controller, reset_admission
+from . import authentication
+from .authentication import CachedTokenAuthentication, LRUCache, clear_token_cache, invalidate_token
+from .catalog import cache_stats, reset_cache_stats, without_catalog_triggers
+from .db import retry_on_busy
+from .dispatch import dispatcher
+from .middleware import CompressionMiddleware, negotiate_encoding, query_stats, reset_query_stats
+from .models import CatalogState, Category, MenuItem, Cart, Order, OrderItem, SalesRollup, DailySalesRollup
+from .order_totals import find_drift
+from .renderers import CompactJSONRenderer
+from .roles import get_roles, MANAGER, DELIVERY_CREW
+from .rollups import rebuild_rollups
+from .search import search_menu_items
+from .serializers import MenuItemSerializer, CartSerializer, OrderSerializer
+from .serializers import menu_item_reader, cart_reader, order_reader
+
+
+class LittleLemonTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager_group = Group.objects.create(name=MANAGER)
+        cls.crew_group = Group.objects.create(name=DELIVERY_CREW)
+
+        cls.manager = User.objects.create_user('manager', password='pass')
+        cls.manager.groups.add(cls.manager_group)
+        cls.crew = User.objects.create_user('crew', password='pass')
+        cls.crew.groups.add(cls.crew_group)
+        cls.customer = User.objects.create_user('customer', password='pass')
+
+        cls.category = Category.objects.create(slug='mains', title='Mains')
+        cls.pasta = MenuItem.objects.create(title='Pasta', price=Decimal('9.50'), featured=False, category=cls.category)
+        cls.pizza = MenuItem.objects.create(title='Pizza', price=Decimal('12.00'), featured=True, category=cls.category)
+
+    def setUp(self):
+        cache.clear()
+        clear_token_cache()
+        dispatcher.invalidate()
+        reset_admission()
+
+    def login(self, user):
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def create_order(self, user=None, delivery_crew=None, items=((None, 1),)):
+        order = Order.objects.create(user=user or self.customer, delivery_crew=delivery_crew, total=0)
+        total = Decimal('0')
+        for menuitem, quantity in items:
+            menuitem = menuitem or self.pasta
+            price = menuitem.price * quantity
+            OrderItem.objects.create(order=order, menuitem=menuitem, quantity=quantity,
+                                     unit_price=menuitem.price, price=price)
+            total += price
+        order.total = total
+        order.item_count = sum(quantity for _, quantity in items)
+        order.save()
+        return order
+
+    def fill_cart(self, user, size):
+        items = [
+            MenuItem(title=f'Item {i}', price=Decimal('2.50'), featured=False, category=self.category)
+            for i in range(size)
+        ]
+        MenuItem.objects.bulk_create(items)
+        Cart.objects.bulk_create(
+            Cart(user=user, menuitem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+            for item in items
+        )
+
+    def group_queries(self, captured):
+        return [q['sql'] for q in captured.captured_queries if 'auth_user_groups' in q['sql']]
+
+
+# Máximo de queries SQL por endpoint (incluye la autenticación por token y la
+# carga de roles con la caché fría); subirlos debe ser una decisión consciente
+QUERY_BUDGETS = {
+    'menu-items': 4,  # con la huella del catálogo
+    'menu-item-detail': 2,
+    'categories': 4,
+    'cart': 3,
+    'orders': 3,
+    'orders-bulk': 7,  # con un solo destino: validación del repartidor, lectura y un UPDATE (+ savepoint)
+    'order-detail': 4,
+    'manager-users': 4,
+    'delivery-crew-users': 4,
+    'delivery-crew-users-bulk': 9,  # grupo, usuarios, miembros, INSERT, listado (+ savepoint)
+    'stats': 2,
+    'sales-report': 4,
+}
+
+
+class QueryBudgetMixin:
+    @override_settings(QUERY_STATS_HEADERS=True)
+    def assertQueryBudget(self, method, url, data=None, budget=None):
+        # Hace la request y falla si QueryStatsMiddleware cuenta más queries que el presupuesto del endpoint
+        name = resolve(url.split('?')[0]).url_name
+        if budget is None:
+            budget = QUERY_BUDGETS[name]
+        response = getattr(self.client, method)(url, data, format='json')
+        queries = int(response['X-Query-Count'])
+        self.assertLessEqual(queries, budget, f'{method.upper()} {url} ({name}) used {queries} queries, budget is {budget}')
+        return response
+
+
+class RoleResolutionTests(LittleLemonTestCase):
+    def test_roles_are_loaded_once_per_request(self):
+        order = self.create_order(delivery_crew=self.crew)
+        self.login(self.manager)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.patch(f'/api/orders/{order.pk}/', {'status': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # Antes: IsManager + groups.exists() + groups.filter(Manager) en el handler
+        self.assertEqual(len(self.group_queries(captured)), 1)
+
+    def test_roles_are_cached_between_requests(self):
+        self.login(self.customer)
+        self.client.get('/api/orders/')
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.group_queries(captured), [])
+
+    def test_query_counts_per_endpoint_with_warm_cache(self):
+        order = self.create_order(delivery_crew=self.crew)
+        cases = [
+            # (usuario, método, url, datos, queries)
+            (self.customer, 'get', '/api/orders/', None, 1),            # orders
+            (self.customer, 'get', f'/api/orders/{order.pk}/', None, 2),  # order + items
+            (self.customer, 'get', '/api/cart/menu-items/', None, 1),   # cart
+            (self.manager, 'get', '/api/orders/', None, 1),             # orders
+            (self.manager, 'get', '/api/groups/manager/users', None, 2),  # group + users
+        ]
+        for user, method, url, data, expected in cases:
+            with self.subTest(user=user.username, method=method, url=url):
+                self.login(user)
+                getattr(self.client, method)(url, data, format='json')  # calienta la caché de roles
+                with self.assertNumQueries(expected):
+                    response = getattr(self.client, method)(url, data, format='json')
+                self.assertLess(response.status_code, 400)
+
+    def test_adding_user_to_group_invalidates_cache(self):
+        self.assertEqual(get_roles(User.objects.get(pk=self.customer.pk)), frozenset())
+        self.login(self.manager)
+        response = self.client.post('/api/groups/delivery-crew/users', {'user_id': self.customer.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(get_roles(User.objects.get(pk=self.customer.pk)), {DELIVERY_CREW})
+
+    def test_removing_user_from_group_invalidates_cache(self):
+        self.assertEqual(get_roles(User.objects.get(pk=self.crew.pk)), {DELIVERY_CREW})
+        self.login(self.manager)
+        response = self.client.delete(f'/api/groups/delivery-crew/users/{self.crew.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_roles(User.objects.get(pk=self.crew.pk)), frozenset())
+
+    def test_manager_membership_changes_invalidate_cache(self):
+        self.login(self.manager)
+        self.assertEqual(get_roles(User.objects.get(pk=self.customer.pk)), frozenset())
+        self.client.post('/api/groups/manager/users', {'user_id': self.customer.pk}, format='json')
+        self.assertEqual(get_roles(User.objects.get(pk=self.customer.pk)), {MANAGER})
+        self.client.delete(f'/api/groups/manager/users/{self.customer.pk}')
+        self.assertEqual(get_roles(User.objects.get(pk=self.customer.pk)), frozenset())
+
+
+class GroupMembersBulkTests(QueryBudgetMixin, LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = [User.objects.create_user(f'seasonal{i}', password='pass') for i in range(3)]
+        self.login(self.manager)
+
+    def ids(self, *users):
+        return sorted(user.pk for user in users)
+
+    def call(self, method, user_ids, group='delivery-crew'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(f'/api/groups/{group}/users/bulk', {'user_ids': user_ids}, format='json')
+
+    def test_add_skips_existing_members_and_invalidates_roles(self):
+        get_roles(User.objects.get(pk=self.staff[0].pk))  # roles cacheados antes del cambio
+        response = self.call('post', [self.crew.pk, *self.ids(*self.staff)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['added'], self.ids(*self.staff))
+        self.assertEqual(response.data['removed'], [])
+        self.assertEqual(response.data['users'], [
+            {'id': user.pk, 'username': user.username} for user in sorted([self.crew, *self.staff], key=lambda u: u.pk)
+        ])
+        self.assertEqual(get_roles(User.objects.get(pk=self.staff[0].pk)), {DELIVERY_CREW})
+        self.assertEqual(set(dispatcher.open_counts()), set(self.ids(self.crew, *self.staff)))
+
+    def test_remove_and_replace(self):
+        self.call('post', self.ids(*self.staff))
+        response = self.call('delete', [self.staff[0].pk, self.customer.pk])
+        self.assertEqual((response.data['added'], response.data['removed']), ([], [self.staff[0].pk]))
+        response = self.call('put', [self.staff[0].pk, self.staff[1].pk])
+        self.assertEqual(response.data['added'], [self.staff[0].pk])
+        self.assertEqual(response.data['removed'], self.ids(self.crew, self.staff[2]))
+        self.assertEqual(get_roles(User.objects.get(pk=self.crew.pk)), frozenset())
+        self.assertEqual(self.call('put', []).data['users'], [])
+
+    def test_unknown_users_change_nothing(self):
+        response = self.call('post', [self.staff[0].pk, 999999], group='manager')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['users'], [999999])
+        self.assertFalse(self.staff[0].groups.exists())
+
+    def test_many_users_use_a_fixed_number_of_queries(self):
+        users = [User(username=f'bulk{i}') for i in range(50)]
+        User.objects.bulk_create(users)
+        user_ids = list(User.objects.filter(username__startswith='bulk').values_list('id', flat=True))
+        response = self.assertQueryBudget('post', '/api/groups/delivery-crew/users/bulk', {'user_ids': user_ids})
+        self.assertEqual(len(response.data['added']), 50)
+
+    def test_validation_and_permissions(self):
+        self.assertEqual(self.call('post', []).status_code, 400)
+        self.assertEqual(self.client.post('/api/groups/manager/users/bulk', {'user_ids': 'all'}, format='json').status_code, 400)
+        self.login(self.customer)
+        self.assertEqual(self.call('post', [self.customer.pk], group='manager').status_code, 403)
+
+
+class AdmissionControlTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login(self.customer)
+
+    def add_to_cart(self):
+        return self.client.post('/api/cart/menu-items/', {'menuitem': self.pasta.pk, 'quantity': 1}, format='json')
+
+    def test_token_bucket_refills_at_its_rate(self):
+        bucket = TokenBucket(rate=2, capacity=2, now=0.0)
+        self.assertEqual([bucket.take(0.0), bucket.take(0.0)], [0.0, 0.0])
+        self.assertEqual(bucket.take(0.0), 0.5)
+        self.assertEqual(bucket.take(0.5), 0.0)
+
+    @override_settings(THROTTLE_RATES_PER_ROLE={'customer': (0.5, 2), 'delivery_crew': (5, 40), 'manager': (20, 100)})
+    def test_writes_are_throttled_per_user_with_retry_after(self):
+        self.assertEqual([self.add_to_cart().status_code for _ in range(2)], [201, 201])
+        response = self.add_to_cart()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(self.client.get('/api/cart/menu-items/').status_code, 200)  # las lecturas no gastan tokens
+
+        other = User.objects.create_user('other', password='pass')
+        self.login(other)
+        self.assertEqual(self.add_to_cart().status_code, 201)
+        self.assertEqual(admission_stats()['throttled_customer'], 1)
+
+    @override_settings(THROTTLE_RATES_PER_ROLE={'customer': (2, 20), 'manager': (20, 100)})
+    def test_stats_follow_the_roles_in_settings(self):
+        stats = admission_stats()
+        self.assertEqual({name for name in stats if name.startswith('throttled_')}, {'throttled_customer', 'throttled_manager'})
+
+    @override_settings(LOAD_SHEDDING_MAX_IN_FLIGHT=0)
+    def test_sheds_writes_when_too_many_are_in_flight(self):
+        response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.client.get('/api/orders/').status_code, 200)
+        self.assertEqual(admission_stats()['shed_in_flight'], 1)
+
+    def test_sheds_writes_when_db_latency_is_high(self):
+        for _ in range(30):
+            controller.record_query(0.5)
+        self.assertEqual(self.add_to_cart().status_code, 503)
+        self.assertEqual(admission_stats()['shed_db_latency'], 1)
+        with override_settings(LOAD_SHEDDING_DB_P95_MS=1000):
+            self.assertEqual(self.add_to_cart().status_code, 201)
+
+    def test_in_flight_is_released_after_errors(self):
+        self.assertEqual(self.client.post('/api/orders/').status_code, 400)  # carrito vacío
+        self.assertEqual(self.add_to_cart().status_code, 201)
+        stats = admission_stats()
+        self.assertEqual((stats['in_flight'], stats['admitted']), (0, 2))
+
+    @override_settings(ADMISSION_CONTROL_ENABLED=False, LOAD_SHEDDING_MAX_IN_FLIGHT=0)
+    def test_can_be_disabled(self):
+        self.assertEqual(self.add_to_cart().status_code, 201)
+
+    def test_counters_are_exposed_in_stats(self):
+        self.add_to_cart()
+        self.login(self.manager)
+        response = self.client.get('/api/stats/')
+        self.assertEqual(response.data['admission']['admitted'], 1)
+
+
+class CheckoutTests(LittleLemonTestCase):
+    def checkout_queries(self, size):
+        self.fill_cart(self.customer, size)
+        self.login(self.customer)
+        self.client.get('/api/orders/')  # calienta la caché de roles
+        dispatcher.pick()  # y el heap de repartidores
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 201)
+        return len(captured.captured_queries)
+
+    def test_checkout_query_count_is_constant(self):
+        small = self.checkout_queries(1)
+        large = self.checkout_queries(50)
+        self.assertEqual(small, large)
+
+    def test_checkout_creates_order_items_and_clears_cart(self):
+        self.fill_cart(self.customer, 3)
+        self.login(self.customer)
+        response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.total, Decimal('15.00'))
+        self.assertEqual(order.orderitem_set.count(), 3)
+        self.assertFalse(Cart.objects.filter(user=self.customer).exists())
+
+    def test_empty_cart_is_rejected(self):
+        self.login(self.customer)
+        response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_cart_total_overflowing_the_order_total_is_rejected(self):
+        # Cada línea (10 x 999.00) cabe en Cart.price, pero el total (19980.00) no cabe en Order.total
+        items = [MenuItem.objects.create(title=f'Caviar {i}', price=Decimal('999.00'), featured=False, category=self.category)
+                 for i in range(2)]
+        Cart.objects.bulk_create(Cart(user=self.customer, menuitem=item, quantity=10, unit_price=item.price,
+                                      price=item.price * 10) for item in items)
+        self.login(self.customer)
+        response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Cart.objects.filter(user=self.customer).count(), 2)
+        self.assertEqual(self.client.get('/api/orders/').status_code, 200)
+
+    def test_failed_checkout_leaves_cart_intact(self):
+        self.fill_cart(self.customer, 3)
+        self.login(self.customer)
+        with mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.client.post('/api/orders/')
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Cart.objects.filter(user=self.customer).count(), 3)
+
+
+class CatalogCacheTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_cache_stats()
+        self.login(self.customer)
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get('/api/menu-items/')
+        with self.assertNumQueries(1):  # solo la huella: token, roles y página salen de caché
+            second = self.client.get('/api/menu-items/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 1)
+
+    def test_query_params_are_part_of_the_key(self):
+        self.client.get('/api/menu-items/?ordering=price&page=1')
+        self.assertEqual(self.client.get('/api/menu-items/?page=1&ordering=price')['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get('/api/menu-items/?ordering=-price&page=1')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/menu-items/?category=mains')['X-Cache'], 'MISS')
+
+    def test_menu_item_writes_invalidate_cached_pages(self):
+        self.client.get('/api/menu-items/')
+        self.login(self.manager)
+        response = self.client.patch(f'/api/menu-items/{self.pasta.pk}/', {'price': '7.25'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/menu-items/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['price'], '7.25')
+
+    def test_menu_item_create_invalidates_cached_pages(self):
+        self.login(self.manager)
+        self.client.get('/api/menu-items/?page=2')
+        self.client.post('/api/menu-items/', {
+            'title': 'Soup', 'price': '4.00', 'featured': False, 'category': self.category.pk,
+        }, format='json')
+        response = self.client.get('/api/menu-items/?page=2')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([item['title'] for item in response.data['results']], ['Soup'])
+
+    def test_category_changes_invalidate_cached_pages(self):
+        self.client.get('/api/categories/')
+        Category.objects.create(slug='desserts', title='Desserts')
+        response = self.client.get('/api/categories/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 2)
+
+
+class ConditionalGetTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_cache_stats()
+        self.login(self.customer)
+
+    def test_if_none_match_returns_304_without_touching_the_catalog(self):
+        response = self.client.get('/api/menu-items/')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        # Solo la huella del catálogo (una fila y dos MAX por la PK)
+        self.assertEqual(len(captured), 1)
+        self.assertIn('LittleLemonAPI_catalogstate', captured[0]['sql'])
+        self.assertEqual(cache_stats()['not_modified'], 1)
+
+    def test_etag_depends_on_query_params(self):
+        first = self.client.get('/api/categories/')['ETag']
+        second = self.client.get('/api/categories/?ordering=id')['ETag']
+        self.assertNotEqual(first, second)
+
+    def test_write_changes_etag(self):
+        etag = self.client.get('/api/menu-items/')['ETag']
+        MenuItem.objects.filter(pk=self.pizza.pk).first().save()
+        response = self.client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_writes_without_signals_change_etag(self):
+        # update(), bulk_create y SQL directo (p. ej. de otro proceso o de seed_data) no envían señales
+        writes = [
+            lambda: MenuItem.objects.filter(pk=self.pizza.pk).update(price=Decimal('13.00')),
+            lambda: MenuItem.objects.bulk_create([MenuItem(title='Soup', price=Decimal('4.00'), featured=False,
+                                                           category=self.category)]),
+            lambda: connection.cursor().execute('UPDATE "LittleLemonAPI_category" SET title = %s', ['Principales']),
+            lambda: MenuItem.objects.filter(title='Soup').delete(),
+        ]
+        for write in writes:
+            response = self.client.get('/api/menu-items/')
+            write()
+            changed = self.client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(changed.status_code, 200)
+            self.assertEqual(changed['X-Cache'], 'MISS')
+        self.assertEqual(changed.data['results'][1]['price'], '13.00')
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get('/api/categories/')['Last-Modified']
+        response = self.client.get('/api/categories/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get('/api/categories/', HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2001 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+
+class OrderPaginationTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.orders = [self.create_order() for _ in range(5)]
+        self.login(self.customer)
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [order['id'] for order in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_walks_every_order_newest_first(self):
+        ids = self.collect('/api/orders/?page_size=2')
+        self.assertEqual(ids, sorted((order.pk for order in self.orders), reverse=True))
+
+    def test_pages_are_stable_under_concurrent_inserts(self):
+        first = self.client.get('/api/orders/?page_size=2').data
+        self.create_order()
+        second = self.client.get(first['next']).data
+        self.assertEqual([order['id'] for order in second['results']], [self.orders[2].pk, self.orders[1].pk])
+
+    def test_previous_link_returns_the_previous_page(self):
+        first = self.client.get('/api/orders/?page_size=2').data
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(back['results'], first['results'])
+
+    def test_page_fetch_is_a_single_query(self):
+        first = self.client.get('/api/orders/?page_size=2').data
+        with self.assertNumQueries(1):  # solo la página (token y roles en caché)
+            self.client.get(first['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/orders/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_managers_are_paginated_too(self):
+        self.login(self.manager)
+        response = self.client.get('/api/orders/')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+
+class OrderDetailTests(QueryBudgetMixin, LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.order = self.create_order(delivery_crew=self.crew, items=((self.pasta, 2), (self.pizza, 1)))
+
+    def test_returns_the_order_with_its_lines(self):
+        self.login(self.customer)
+        response = self.assertQueryBudget('get', f'/api/orders/{self.order.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.order.pk)
+        self.assertEqual(response.data['total'], '31.00')
+        self.assertEqual(response.data['delivery_crew'], self.crew.pk)
+        lines = [(line['menuitem'], line['title'], line['quantity'], line['price']) for line in response.data['items']]
+        self.assertEqual(lines, [(self.pasta.pk, 'Pasta', 2, '19.00'), (self.pizza.pk, 'Pizza', 1, '12.00')])
+
+    def test_every_authorized_role_can_read_it(self):
+        for user in (self.customer, self.manager, self.crew):
+            with self.subTest(user=user.username):
+                self.login(user)
+                response = self.client.get(f'/api/orders/{self.order.pk}/')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['items']), 2)
+
+    def test_other_users_orders_are_not_found(self):
+        other = User.objects.create_user('other', password='pass')
+        other_crew = User.objects.create_user('other-crew', password='pass')
+        other_crew.groups.add(self.crew_group)
+        for user in (other, other_crew):
+            with self.subTest(user=user.username):
+                self.login(user)
+                self.assertEqual(self.client.get(f'/api/orders/{self.order.pk}/').status_code, 404)
+        self.login(self.manager)
+        self.assertEqual(self.client.get('/api/orders/999999/').status_code, 404)
+
+    def test_two_queries_whatever_the_number_of_lines(self):
+        items = [MenuItem(title=f'Item {i}', price=Decimal('2.50'), featured=False, category=self.category)
+                 for i in range(30)]
+        MenuItem.objects.bulk_create(items)
+        big = self.create_order(items=[(item, 1) for item in items])
+        self.login(self.customer)
+        for order in (self.order, big):
+            url = f'/api/orders/{order.pk}/'
+            self.client.get(url)  # token y roles en caché
+            with self.assertNumQueries(2):  # pedido + líneas con sus platos
+                response = self.client.get(url)
+            self.assertEqual(len(response.data['items']), order.orderitem_set.count())
+
+
+class OrderExportTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.open_order = self.create_order(items=((self.pasta, 2), (self.pizza, 1)))
+        self.done_order = self.create_order()
+        Order.objects.filter(pk=self.done_order.pk).update(status=True, date=datetime.date(2020, 1, 1))
+        self.login(self.manager)
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_nests_items(self):
+        response = self.client.get('/api/orders/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['order_id'] for row in rows], [self.done_order.pk, self.open_order.pk])
+        self.assertEqual([item['menuitem'] for item in rows[1]['items']], [self.pasta.pk, self.pizza.pk])
+        self.assertEqual(rows[1]['total'], '31.00')
+
+    def test_csv_has_one_row_per_item(self):
+        response = self.client.get('/api/orders/export/?output=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(self.read(response).splitlines()))
+        self.assertEqual(rows[0][:2], ['order_id', 'user'])
+        self.assertEqual(len(rows), 4)
+
+    def test_filters(self):
+        response = self.client.get('/api/orders/export/?status=1&date_to=2020-12-31')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['order_id'] for row in rows], [self.done_order.pk])
+        response = self.client.get('/api/orders/export/?date_from=2021-01-01')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['order_id'] for row in rows], [self.open_order.pk])
+
+    def test_invalid_parameters(self):
+        for query in ('output=xml', 'status=2', 'date_from=yesterday'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/orders/export/?{query}').status_code, 400)
+
+    def test_managers_only(self):
+        self.login(self.customer)
+        self.assertEqual(self.client.get('/api/orders/export/').status_code, 403)
+
+
+class DispatchTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.crew2 = User.objects.create_user('crew2', password='pass')
+        self.crew2.groups.add(self.crew_group)
+        self.login(self.customer)
+
+    def checkout(self):
+        Cart.objects.create(user=self.customer, menuitem=self.pasta, quantity=1,
+                            unit_price=self.pasta.price, price=self.pasta.price)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 201)
+        return response.data['delivery_crew']
+
+    def test_orders_go_to_the_least_loaded_crew_member(self):
+        self.create_order(delivery_crew=self.crew)
+        self.create_order(delivery_crew=self.crew)
+        self.assertEqual(self.checkout(), self.crew2.pk)
+        self.assertEqual(self.checkout(), self.crew2.pk)
+        self.assertEqual(dispatcher.open_counts(), {self.crew.pk: 2, self.crew2.pk: 2})
+        self.assertEqual(self.checkout(), min(self.crew.pk, self.crew2.pk))
+
+    def test_delivered_and_deleted_orders_free_the_crew_member(self):
+        first = self.checkout()
+        second = self.checkout()
+        self.assertNotEqual(first, second)
+        order = Order.objects.get(delivery_crew=first)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = True
+            order.save()
+        self.assertEqual(dispatcher.open_counts()[first], 0)
+        self.assertEqual(self.checkout(), first)
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.filter(delivery_crew=second).get().delete()
+        self.assertEqual(dispatcher.open_counts()[second], 0)
+
+    def test_membership_changes_reload_the_crew(self):
+        self.checkout()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crew2.groups.remove(self.crew_group)
+        self.assertEqual(set(dispatcher.open_counts()), {self.crew.pk})
+        self.assertEqual(self.checkout(), self.crew.pk)
+
+    def test_inactive_crew_members_get_no_orders(self):
+        dispatcher.pick()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crew.is_active = False
+            self.crew.save()
+        self.assertEqual(self.checkout(), self.crew2.pk)
+        self.assertEqual(self.checkout(), self.crew2.pk)
+
+    def test_warm_dispatcher_needs_no_queries(self):
+        dispatcher.pick()
+        with self.assertNumQueries(0):
+            dispatcher.pick()
+
+    @override_settings(AUTO_DISPATCH_ENABLED=False)
+    def test_auto_dispatch_can_be_disabled(self):
+        self.assertIsNone(self.checkout())
+
+    def test_delivery_crew_only_lists_their_own_orders(self):
+        mine = self.create_order(delivery_crew=self.crew)
+        self.create_order(delivery_crew=self.crew2)
+        self.login(self.crew)
+        response = self.client.get('/api/orders/')
+        self.assertEqual([order['id'] for order in response.data['results']], [mine.pk])
+
+
+class OrderBulkUpdateTests(QueryBudgetMixin, LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.crew2 = User.objects.create_user('crew2', password='pass')
+        self.crew2.groups.add(self.crew_group)
+        self.login(self.manager)
+
+    def bulk(self, changes):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch('/api/orders/bulk/', changes, format='json')
+
+    def test_applies_the_changes_and_reports_each_order(self):
+        first, second, third = (self.create_order(delivery_crew=self.crew) for _ in range(3))
+        response = self.bulk([
+            {'order': first.pk, 'delivery_crew': self.crew2.pk},
+            {'order': second.pk, 'status': 1},
+            {'order': third.pk, 'delivery_crew': self.customer.pk},
+            {'order': 999999, 'status': 1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'updated': 2, 'results': [
+            {'order': first.pk, 'delivery_crew': self.crew2.pk, 'status': False},
+            {'order': second.pk, 'delivery_crew': self.crew.pk, 'status': True},
+            {'order': third.pk, 'error': 'the user is not from Delivery crew.'},
+            {'order': 999999, 'error': 'Order not found'},
+        ]})
+        self.assertEqual(
+            sorted(Order.objects.values_list('id', 'delivery_crew', 'status')),
+            [(first.pk, self.crew2.pk, False), (second.pk, self.crew.pk, True), (third.pk, self.crew.pk, False)],
+        )
+
+    def test_many_orders_use_a_fixed_number_of_queries(self):
+        orders = [self.create_order() for _ in range(30)]
+        changes = [{'order': order.pk, 'delivery_crew': self.crew.pk, 'status': 0} for order in orders]
+        response = self.assertQueryBudget('patch', '/api/orders/bulk/', changes)
+        self.assertEqual(response.data['updated'], 30)
+        self.assertEqual(Order.objects.filter(delivery_crew=self.crew).count(), 30)
+
+    def test_keeps_the_dispatcher_counts_in_sync(self):
+        orders = [self.create_order(delivery_crew=self.crew) for _ in range(3)]
+        self.assertEqual(dispatcher.open_counts(), {self.crew.pk: 3, self.crew2.pk: 0})
+        self.bulk([{'order': orders[0].pk, 'delivery_crew': self.crew2.pk},
+                   {'order': orders[1].pk, 'status': True},
+                   {'order': orders[2].pk, 'delivery_crew': None}])
+        self.assertEqual(dispatcher.open_counts(), {self.crew.pk: 0, self.crew2.pk: 1})
+
+    def test_duplicated_orders_are_rejected(self):
+        order = self.create_order()
+        response = self.bulk([{'order': order.pk, 'status': 1}, {'order': order.pk, 'status': 0}])
+        self.assertEqual(response.data['updated'], 0)
+        self.assertFalse(Order.objects.get(pk=order.pk).status)
+
+    def test_validation_and_permissions(self):
+        self.assertEqual(self.client.patch('/api/orders/bulk/', {'order': 1, 'status': 1}, format='json').status_code, 400)
+        self.assertEqual(self.client.patch('/api/orders/bulk/', [], format='json').status_code, 400)
+        self.assertEqual(self.client.patch('/api/orders/bulk/', [{'order': 1}], format='json').status_code, 400)
+        self.login(self.customer)
+        self.assertEqual(self.client.patch('/api/orders/bulk/', [{'order': 1, 'status': 1}], format='json').status_code, 403)
+
+
+class SalesRollupTests(QueryBudgetMixin, LittleLemonTestCase):
+    def checkout(self, *lines):
+        for menuitem, quantity in lines:
+            Cart.objects.create(user=self.customer, menuitem=menuitem, quantity=quantity,
+                                unit_price=menuitem.price, price=menuitem.price * quantity)
+        self.login(self.customer)
+        response = self.client.post('/api/orders/')
+        self.assertEqual(response.status_code, 201)
+        return Order.objects.get(pk=response.data['id'])
+
+    def rollups(self):
+        return (
+            sorted(SalesRollup.objects.values_list('date', 'menuitem', 'quantity', 'orders', 'revenue')),
+            sorted(DailySalesRollup.objects.values_list('date', 'orders', 'revenue')),
+        )
+
+    def test_checkout_updates_the_rollups(self):
+        order = self.checkout((self.pasta, 2), (self.pizza, 1))
+        self.checkout((self.pasta, 1))
+        today = order.date
+        self.assertEqual(self.rollups(), (
+            [(today, self.pasta.pk, 3, 2, Decimal('28.50')), (today, self.pizza.pk, 1, 1, Decimal('12.00'))],
+            [(today, 2, Decimal('40.50'))],
+        ))
+
+    def test_deleting_an_order_subtracts_it(self):
+        first = self.checkout((self.pasta, 2), (self.pizza, 1))
+        second = self.checkout((self.pasta, 1))
+        self.login(self.manager)
+        self.assertEqual(self.client.delete(f'/api/orders/{first.pk}/').status_code, 204)
+        self.assertEqual(self.rollups(), (
+            [(second.date, self.pasta.pk, 1, 1, Decimal('9.50'))],
+            [(second.date, 1, Decimal('9.50'))],
+        ))
+        second.delete()
+        self.assertEqual(self.rollups(), ([], []))
+
+    def test_rebuild_matches_the_incremental_rollups(self):
+        self.checkout((self.pasta, 2), (self.pizza, 1))
+        self.checkout((self.pizza, 3))
+        incremental = self.rollups()
+        SalesRollup.objects.all().delete()
+        self.create_order(items=((self.pasta, 1),))  # pedido cargado sin checkout
+        rebuild_rollups()
+        today = datetime.date.today()
+        self.assertEqual(self.rollups(), (
+            [(today, self.pasta.pk, 3, 2, Decimal('28.50')), (today, self.pizza.pk, 4, 2, Decimal('48.00'))],
+            [(today, incremental[1][0][1] + 1, incremental[1][0][2] + Decimal('9.50'))],
+        ))
+
+    def test_rebuild_only_touches_the_requested_range(self):
+        old = self.create_order()
+        Order.objects.filter(pk=old.pk).update(date=datetime.date(2020, 1, 1))
+        rebuild_rollups(datetime.date(2020, 1, 1), datetime.date(2020, 1, 1))
+        self.assertEqual(self.rollups()[1], [(datetime.date(2020, 1, 1), 1, Decimal('9.50'))])
+
+    def test_report(self):
+        self.checkout((self.pasta, 2), (self.pizza, 1))
+        self.checkout((self.pizza, 3))
+        self.login(self.manager)
+        response = self.assertQueryBudget('get', '/api/reports/sales/?top=1')
+        self.assertEqual(response.status_code, 200)
+        today = datetime.date.today().isoformat()
+        self.assertEqual(response.json(), {
+            'date_from': (datetime.date.today() - datetime.timedelta(days=29)).isoformat(),
+            'date_to': today,
+            'orders': 2,
+            'revenue': '67.00',
+            'days': [{'date': today, 'orders': 2, 'revenue': '67.00'}],
+            'top_menu_items': [{'menuitem': self.pizza.pk, 'title': 'Pizza', 'quantity': 4, 'revenue': '48.00'}],
+        })
+
+    def test_report_validation_and_permissions(self):
+        self.login(self.customer)
+        self.assertEqual(self.client.get('/api/reports/sales/').status_code, 403)
+        self.login(self.manager)
+        self.assertEqual(self.client.get('/api/reports/sales/?date_from=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/api/reports/sales/?date_from=2024-02-01&date_to=2024-01-01').status_code, 400)
+        self.assertEqual(self.client.get('/api/reports/sales/?top=many').status_code, 400)
+
+
+class OrderTotalsTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        for menuitem, quantity in ((self.pasta, 2), (self.pizza, 1)):
+            Cart.objects.create(user=self.customer, menuitem=menuitem, quantity=quantity,
+                                unit_price=menuitem.price, price=menuitem.price * quantity)
+        self.login(self.customer)
+        self.order = Order.objects.get(pk=self.client.post('/api/orders/').data['id'])
+        self.line = OrderItem.objects.get(order=self.order, menuitem=self.pasta)
+
+    def rollups(self):
+        return (
+            sorted(SalesRollup.objects.values_list('date', 'menuitem', 'quantity', 'orders', 'revenue')),
+            sorted(DailySalesRollup.objects.values_list('date', 'orders', 'revenue')),
+        )
+
+    def assertRollupsMatchRebuild(self):
+        incremental = self.rollups()
+        rebuild_rollups()
+        self.assertEqual(incremental, self.rollups())
+
+    def test_quantity_change_applies_the_delta(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.patch(f'/api/orders/{self.line.pk}/', {'quantity': 5}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['price'], '47.50')
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.total, self.order.item_count), (Decimal('59.50'), 6))
+        # Se aplica la diferencia: no se vuelven a sumar las líneas del pedido
+        self.assertFalse([q['sql'] for q in captured.captured_queries if 'SUM(' in q['sql']])
+        self.assertRollupsMatchRebuild()
+
+    def test_menu_item_swap_charges_the_current_price(self):
+        other = MenuItem.objects.create(title='Soup', price=Decimal('4.25'), featured=False, category=self.category)
+        response = self.client.put(f'/api/orders/{self.line.pk}/', {'menuitem': other.pk, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['unit_price'], response.data['price']), ('4.25', '8.50'))
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.total, self.order.item_count), (Decimal('20.50'), 3))
+        self.assertFalse(SalesRollup.objects.filter(menuitem=self.pasta).exists())
+        self.assertRollupsMatchRebuild()
+
+    def test_swapping_to_a_menu_item_already_in_the_order_is_rejected(self):
+        response = self.client.put(f'/api/orders/{self.line.pk}/', {'menuitem': self.pizza.pk, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.total, self.order.item_count), (Decimal('31.00'), 3))
+
+    def assertOrderUnchanged(self):
+        self.order.refresh_from_db()
+        self.line.refresh_from_db()
+        self.assertEqual((self.order.total, self.order.item_count), (Decimal('31.00'), 3))
+        self.assertEqual((self.line.menuitem, self.line.quantity, self.line.price), (self.pasta, 2, Decimal('19.00')))
+        self.assertEqual(self.client.get(f'/api/orders/{self.order.pk}/').status_code, 200)
+
+    def test_quantity_overflowing_the_line_price_is_rejected(self):
+        response = self.client.patch(f'/api/orders/{self.line.pk}/', {'quantity': 30000}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertOrderUnchanged()
+
+    def test_menu_item_swap_overflowing_the_order_total_is_rejected(self):
+        # La línea cabe (9990.00) pero el total del pedido pasaría a 10002.00
+        other = MenuItem.objects.create(title='Caviar', price=Decimal('9990.00'), featured=False, category=self.category)
+        response = self.client.put(f'/api/orders/{self.line.pk}/', {'menuitem': other.pk, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertOrderUnchanged()
+
+    def test_verify_command_detects_and_repairs_drift(self):
+        healthy = self.create_order(items=((self.pizza, 2),))
+        OrderItem.objects.filter(pk=self.line.pk).update(price=Decimal('1.00'))
+        Order.objects.filter(pk=healthy.pk).update(item_count=7)
+        self.assertEqual(find_drift(0, healthy.pk + 1), ([self.line.pk], [self.order.pk, healthy.pk]))
+
+        out = io.StringIO()
+        call_command('verify_order_totals', '--batch-size', '1', stdout=out)
+        self.assertIn('Found drift in 1 order items and 2 orders', out.getvalue())
+
+        call_command('verify_order_totals', '--repair', stdout=out)
+        self.assertEqual(find_drift(0, healthy.pk + 1), ([], []))
+        self.order.refresh_from_db()
+        healthy.refresh_from_db()
+        self.assertEqual((self.order.total, self.order.item_count), (Decimal('31.00'), 3))
+        self.assertEqual((healthy.total, healthy.item_count), (Decimal('24.00'), 2))
+        self.assertEqual(self.rollups()[1], [(self.order.date, 2, Decimal('55.00'))])
+
+
+class MenuItemSearchTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.desserts = Category.objects.create(slug='desserts', title='Desserts')
+        self.tiramisu = MenuItem.objects.create(title='Tiramisú casero', price=Decimal('6.00'), featured=False,
+                                                category=self.desserts)
+        self.login(self.customer)
+
+    def search(self, text, **params):
+        # Ids de todas las páginas
+        ids = []
+        url, data = '/api/menu-items/', {'search': text, **params}
+        while url:
+            response = self.client.get(url, data)
+            self.assertEqual(response.status_code, 200)
+            ids += [item['id'] for item in response.data['results']]
+            url, data = response.data['next'], None
+        return ids
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.search('pas'), [self.pasta.pk])
+        self.assertEqual(self.search('tirami'), [self.tiramisu.pk])
+        self.assertEqual(self.search('tiramisu'), [self.tiramisu.pk])  # sin acentos
+        self.assertEqual(self.search('CASER'), [self.tiramisu.pk])
+
+    def test_category_title_is_searched(self):
+        self.assertEqual(self.search('mains'), [self.pasta.pk, self.pizza.pk])
+        self.assertEqual(self.search('main piz'), [self.pizza.pk])  # todos los términos
+        self.assertEqual(self.search('mai', ordering='-price'), [self.pizza.pk, self.pasta.pk])
+
+    def test_index_follows_creates_updates_and_deletes(self):
+        item = MenuItem.objects.create(title='Lasagna', price=Decimal('11.00'), featured=False, category=self.category)
+        self.assertEqual(self.search('lasa'), [item.pk])
+        item.title = 'Gnocchi'
+        item.save()
+        self.assertEqual(self.search('lasa'), [])
+        self.assertEqual(self.search('gnoc'), [item.pk])
+        item.category = self.desserts
+        item.save()
+        self.assertEqual(self.search('dessert'), [self.tiramisu.pk, item.pk])
+        item.delete()
+        self.assertEqual(self.search('gnoc'), [])
+
+    def test_category_rename_is_indexed(self):
+        self.category.title = 'Principales'
+        self.category.save()
+        self.assertEqual(self.search('princ'), [self.pasta.pk, self.pizza.pk])
+        self.assertEqual(self.search('mains'), [])
+
+    def test_query_syntax_is_not_passed_through(self):
+        self.assertEqual(self.search('"pasta'), [self.pasta.pk])
+        self.assertEqual(self.search('pasta OR pizza'), [])
+        self.assertEqual(self.search('pizza:'), [self.pizza.pk])
+        self.assertEqual(self.search('*'), [self.pasta.pk, self.pizza.pk, self.tiramisu.pk])
+
+    def test_search_uses_the_fts_index(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.search('pas')
+        with connection.cursor() as cursor:
+            for query in captured.captured_queries:
+                if 'MATCH' in query['sql']:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                    plan = ' '.join(row[-1] for row in cursor.fetchall())
+                    self.assertIn('VIRTUAL TABLE INDEX', plan)
+                    self.assertNotIn('LIKE', query['sql'])
+
+
+class SearchSchemaChangeTests(TransactionTestCase):
+    # Una migración posterior a 0009 que rehace la tabla de menuitems (SQLite copia, borra y
+    # renombra la tabla en AddField/AlterField/RemoveField); fuera de transacción, como migrate
+
+    def migrate(self, operations, backwards=False):
+        loader = MigrationLoader(connection)
+        state = loader.project_state(loader.graph.leaf_nodes('LittleLemonAPI')[0])
+        migration = migrations.Migration('9999_remake_menuitem', 'LittleLemonAPI')
+        migration.operations = operations
+        with connection.schema_editor() as editor:
+            if backwards:
+                migration.unapply(migration.mutate_state(state), editor)  # necesita el estado anterior
+            else:
+                migration.apply(state, editor)
+
+    def search(self, text):
+        return sorted(search_menu_items(MenuItem.objects.all(), text).values_list('id', flat=True))
+
+    def test_menuitem_table_can_be_remade(self):
+        category = Category.objects.create(slug='mains', title='Mains')
+        pasta = MenuItem.objects.create(title='Pasta', price=Decimal('9.50'), featured=False, category=category)
+        add_note = migrations.AddField('menuitem', 'note', models.CharField(max_length=20, null=True, default=''))
+
+        with self.assertRaises(OperationalError):  # los triggers referencian la tabla que se rehace
+            self.migrate([add_note])
+
+        self.migrate(without_catalog_triggers(add_note))
+        try:
+            # Índice y triggers siguen funcionando sobre la tabla nueva
+            lasagna = MenuItem.objects.create(title='Lasagna', price=Decimal('11.00'), featured=False, category=category)
+            self.assertEqual(self.search('mai'), [pasta.pk, lasagna.pk])
+            category.title = 'Principales'
+            category.save()
+            self.assertEqual(self.search('princ'), [pasta.pk, lasagna.pk])
+            lasagna.delete()
+            self.assertEqual(self.search('lasa'), [])
+            # Los triggers de la huella del catálogo también se recrean
+            version = CatalogState.objects.get(pk=1).version
+            MenuItem.objects.filter(pk=pasta.pk).update(price=Decimal('8.00'))
+            self.assertEqual(CatalogState.objects.get(pk=1).version, version + 1)
+        finally:
+            self.migrate(without_catalog_triggers(add_note), backwards=True)
+        with connection.cursor() as cursor:
+            columns = [column.name for column in connection.introspection.get_table_description(cursor, MenuItem._meta.db_table)]
+        self.assertNotIn('note', columns)
+
+
+class QueryPlanTests(LittleLemonTestCase):
+    # Cada endpoint filtrado debe resolver su query principal con un índice:
+    # un "SCAN <tabla>" sin índice en EXPLAIN QUERY PLAN es un full table scan
+    def setUp(self):
+        super().setUp()
+        self.create_order(delivery_crew=self.crew)
+        Cart.objects.create(user=self.customer, menuitem=self.pasta, quantity=1,
+                            unit_price=self.pasta.price, price=self.pasta.price)
+
+    def query_plans(self, user, url):
+        self.login(user)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+            if hasattr(response, 'streaming_content'):
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in captured.captured_queries:
+                sql = query['sql']
+                if sql.startswith('SELECT') and 'littlelemonapi_' in sql.lower():
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                    plans[sql] = [row[-1] for row in cursor.fetchall()]
+        self.assertTrue(plans)
+        return plans
+
+    def assertNoFullScan(self, user, url):
+        for sql, plan in self.query_plans(user, url).items():
+            for step in plan:
+                if step.startswith('SCAN ') and ' INDEX ' not in step:
+                    self.fail(f'{url}: full table scan ({step}) in {sql}')
+
+    def test_menu_items_by_category(self):
+        self.assertNoFullScan(self.customer, '/api/menu-items/?category=mains')
+
+    def test_cart(self):
+        self.assertNoFullScan(self.customer, '/api/cart/menu-items/')
+
+    def test_customer_orders(self):
+        self.assertNoFullScan(self.customer, '/api/orders/')
+
+    def test_delivery_crew_orders(self):
+        self.assertNoFullScan(self.crew, '/api/orders/')
+
+    def test_manager_orders(self):
+        self.assertNoFullScan(self.manager, '/api/orders/')
+
+    def test_order_detail(self):
+        order = Order.objects.get(user=self.customer)
+        self.assertNoFullScan(self.customer, f'/api/orders/{order.pk}/')
+
+    def test_export_by_status_and_date(self):
+        self.assertNoFullScan(self.manager, '/api/orders/export/?status=0')
+        self.assertNoFullScan(self.manager, '/api/orders/export/?date_from=2020-01-01')
+
+    def test_sales_report(self):
+        rebuild_rollups()
+        self.assertNoFullScan(self.manager, '/api/reports/sales/')
+
+    def test_delivery_crew_orders_use_the_crew_date_index(self):
+        plans = self.query_plans(self.crew, '/api/orders/')
+        self.assertIn('order_crew_date_idx', ' '.join(step for plan in plans.values() for step in plan))
+
+    def test_customer_orders_use_the_user_date_index(self):
+        plans = self.query_plans(self.customer, '/api/orders/')
+        self.assertIn('order_user_date_idx', ' '.join(step for plan in plans.values() for step in plan))
+
+
+class QueryStatsTests(QueryBudgetMixin, LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_query_stats()
+
+    @override_settings(QUERY_STATS_HEADERS=True)
+    def test_headers(self):
+        self.login(self.customer)
+        response = self.client.get('/api/orders/')
+        self.assertEqual(response['X-Query-Count'], '3')
+        self.assertTrue(response['Server-Timing'].startswith('db;dur='))
+
+    @override_settings(QUERY_STATS_HEADERS=False)
+    def test_headers_are_optional(self):
+        self.login(self.customer)
+        response = self.client.get('/api/orders/')
+        self.assertNotIn('X-Query-Count', response)
+        self.assertEqual(query_stats()['orders']['requests'], 1)
+
+    def test_stats_are_aggregated_per_url_name(self):
+        self.login(self.customer)
+        self.client.get('/api/orders/')
+        self.client.get('/api/orders/')
+        self.client.get('/api/menu-items/')
+        stats = query_stats()
+        self.assertEqual(stats['orders']['requests'], 2)
+        self.assertEqual(stats['orders']['queries'], 4)  # token + roles + pedidos, y luego solo pedidos
+        self.assertEqual(stats['orders']['max_queries'], 3)
+        self.assertEqual(stats['menu-items']['requests'], 1)
+
+    def test_streaming_responses_are_counted_when_consumed(self):
+        self.create_order()
+        self.login(self.manager)
+        response = self.client.get('/api/orders/export/')
+        b''.join(response.streaming_content)
+        self.assertGreaterEqual(query_stats()['orders-export']['queries'], 4)
+
+    def test_stats_endpoint_is_for_managers(self):
+        self.login(self.customer)
+        self.assertEqual(self.client.get('/api/stats/').status_code, 403)
+        self.login(self.manager)
+        response = self.client.get('/api/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['queries']['stats']['requests'], 1)
+        self.assertIn('hits', response.data['catalog_cache'])
+
+    def test_endpoint_query_budgets(self):
+        order = self.create_order(items=((self.pasta, 1), (self.pizza, 2)))
+        Cart.objects.create(user=self.customer, menuitem=self.pasta, quantity=1,
+                            unit_price=self.pasta.price, price=self.pasta.price)
+        cases = [
+            (self.customer, 'get', '/api/menu-items/'),
+            (self.customer, 'get', f'/api/menu-items/{self.pasta.pk}/'),
+            (self.customer, 'get', '/api/categories/'),
+            (self.customer, 'get', '/api/cart/menu-items/'),
+            (self.customer, 'get', '/api/orders/'),
+            (self.customer, 'get', f'/api/orders/{order.pk}/'),
+            (self.manager, 'get', '/api/orders/'),
+            (self.manager, 'get', '/api/groups/manager/users'),
+            (self.manager, 'get', '/api/groups/delivery-crew/users'),
+            (self.manager, 'get', '/api/stats/'),
+        ]
+        for user, method, url in cases:
+            with self.subTest(user=user.username, url=url):
+                cache.clear()
+                clear_token_cache()
+                self.login(user)
+                self.assertQueryBudget(method, url)
+
+
+class ValuesReaderTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_order(items=((self.pasta, 3), (self.pizza, 1)))
+        self.create_order(delivery_crew=self.crew)
+        self.fill_cart(self.customer, 3)
+
+    def assertSameBytes(self, reader, serializer_class, queryset):
+        renderer = JSONRenderer()
+        expected = renderer.render(serializer_class(queryset, many=True).data)
+        self.assertEqual(renderer.render(reader.read(queryset)), expected)
+
+    def test_menu_items(self):
+        self.assertSameBytes(menu_item_reader, MenuItemSerializer, MenuItem.objects.order_by('id'))
+
+    def test_cart(self):
+        self.assertSameBytes(cart_reader, CartSerializer, Cart.objects.order_by('id'))
+
+    def test_orders(self):
+        self.assertSameBytes(order_reader, OrderSerializer, Order.objects.order_by('id'))
+
+    def test_list_endpoints_match_the_serializers(self):
+        self.login(self.customer)
+        response = self.client.get('/api/menu-items/?ordering=-price')
+        expected = MenuItemSerializer(MenuItem.objects.order_by('-price')[:2], many=True).data
+        self.assertEqual(JSONRenderer().render(response.data['results']), JSONRenderer().render(expected))
+
+        response = self.client.get('/api/orders/')
+        expected = OrderSerializer(Order.objects.order_by('-date', '-id'), many=True).data
+        self.assertEqual(JSONRenderer().render(response.data['results']), JSONRenderer().render(expected))
+
+
+class SparseFieldsetTests(QueryBudgetMixin, LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.fill_cart(self.customer, 3)
+        self.create_order(delivery_crew=self.crew)
+        self.create_order()
+        self.login(self.customer)
+
+    def test_fields_trim_the_selected_columns(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/cart/menu-items/?fields=menuitem,quantity')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0], {'menuitem': response.data[0]['menuitem'], 'quantity': 2})
+        sql = [q['sql'] for q in captured.captured_queries if 'LittleLemonAPI_cart' in q['sql']][-1]
+        self.assertNotIn('unit_price', sql)
+
+    def test_cart_expands_menu_items_and_categories(self):
+        response = self.assertQueryBudget('get', '/api/cart/menu-items/?expand=menuitem,category')
+        line = response.data[0]
+        item = MenuItem.objects.get(pk=line['menuitem']['id'])
+        self.assertEqual(line['menuitem'], {
+            'id': item.pk, 'title': item.title, 'price': '2.50', 'featured': False,
+            'category': {'id': self.category.pk, 'slug': 'mains', 'title': 'Mains'},
+        })
+        self.assertEqual(line['price'], '5.00')
+
+    def test_expanded_cart_costs_the_same_queries_at_any_size(self):
+        url = '/api/cart/menu-items/?expand=menuitem,category'
+        self.client.get(url)  # token y roles en caché
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        self.fill_cart(self.customer, 30)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 33)
+        self.assertEqual(len(large), len(small))
+
+    def test_orders_expand_the_delivery_crew(self):
+        self.login(self.manager)
+        response = self.assertQueryBudget('get', '/api/orders/?expand=delivery_crew&fields=id,delivery_crew')
+        crews = [order['delivery_crew'] for order in response.data['results']]
+        self.assertEqual(crews, [None, {'id': self.crew.pk, 'username': 'crew'}])
+        self.assertEqual(set(response.data['results'][0]), {'id', 'delivery_crew'})
+
+    def test_order_pages_keep_their_cursor_without_the_date(self):
+        first = self.client.get('/api/orders/?page_size=1&fields=total').data
+        self.assertEqual(set(first['results'][0]), {'total'})
+        second = self.client.get(first['next']).data
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+
+    def test_menu_item_list_and_detail(self):
+        response = self.assertQueryBudget('get', '/api/menu-items/?fields=title,category&expand=category')
+        self.assertEqual(response.data['results'][0], {
+            'title': 'Pasta', 'category': {'id': self.category.pk, 'slug': 'mains', 'title': 'Mains'}})
+        response = self.assertQueryBudget('get', f'/api/menu-items/{self.pizza.pk}/?fields=price')
+        self.assertEqual(response.data, {'price': '12.00'})
+
+    def test_expansion_needs_the_field(self):
+        response = self.client.get('/api/cart/menu-items/?fields=quantity&expand=menuitem')
+        self.assertEqual(set(response.data[0]), {'quantity'})
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get('/api/cart/menu-items/?fields=quantity,secret&expand=user')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'fields', 'expand'})
+        # Las expansiones válidas de otros endpoints se ignoran
+        self.assertEqual(self.client.get('/api/menu-items/?expand=delivery_crew').status_code, 200)
+
+
+class AddToCartTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login(self.customer)
+
+    def cart(self):
+        return {row['menuitem_id']: row for row in Cart.objects.filter(user=self.customer).values()}
+
+    def test_single_item(self):
+        response = self.client.post('/api/cart/menu-items/', {'menuitem': self.pasta.pk, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.cart()[self.pasta.pk]['price'], Decimal('19.00'))
+
+    def test_form_encoded_single_item(self):
+        response = self.client.post('/api/cart/menu-items/', {'menuitem': self.pasta.pk, 'quantity': 1})
+        self.assertEqual(response.status_code, 201)
+
+    def test_adding_an_existing_item_increases_the_quantity(self):
+        self.client.post('/api/cart/menu-items/', {'menuitem': self.pasta.pk, 'quantity': 2}, format='json')
+        response = self.client.post('/api/cart/menu-items/', {'menuitem': self.pasta.pk, 'quantity': 3}, format='json')
+        self.assertEqual(response.status_code, 201)
+        line = self.cart()[self.pasta.pk]
+        self.assertEqual(line['quantity'], 5)
+        self.assertEqual(line['price'], Decimal('47.50'))
+
+    def test_basket_in_one_round_trip(self):
+        self.client.post('/api/cart/menu-items/', {'menuitem': self.pizza.pk, 'quantity': 1}, format='json')
+        MenuItem.objects.filter(pk=self.pizza.pk).update(price=Decimal('13.00'))
+        basket = [
+            {'menuitem': self.pasta.pk, 'quantity': 1},
+            {'menuitem': self.pizza.pk, 'quantity': 2},
+            {'menuitem': self.pasta.pk, 'quantity': 1},
+        ]
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post('/api/cart/menu-items/', basket, format='json')
+        self.assertEqual(response.status_code, 201)
+        writes = [q for q in captured.captured_queries if 'littlelemonapi_cart' in q['sql'].lower()]
+        self.assertEqual(len(writes), 1)
+        cart = self.cart()
+        self.assertEqual(cart[self.pasta.pk]['quantity'], 2)
+        self.assertEqual(cart[self.pasta.pk]['price'], Decimal('19.00'))
+        self.assertEqual(cart[self.pizza.pk]['quantity'], 3)
+        self.assertEqual(cart[self.pizza.pk]['unit_price'], Decimal('13.00'))
+        self.assertEqual(cart[self.pizza.pk]['price'], Decimal('39.00'))
+
+    def test_unknown_menu_item_rejects_the_whole_basket(self):
+        basket = [{'menuitem': self.pasta.pk, 'quantity': 1}, {'menuitem': 9999, 'quantity': 1}]
+        response = self.client.post('/api/cart/menu-items/', basket, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['menuitems'], [9999])
+        self.assertEqual(self.cart(), {})
+
+    def test_line_price_cannot_exceed_the_column(self):
+        # 32767 x 12.00 no cabe en price (max_digits=6); antes se guardaba y el GET daba 500
+        response = self.client.post('/api/cart/menu-items/', {'menuitem': self.pizza.pk, 'quantity': 32767}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['menuitems'], [self.pizza.pk])
+        self.client.post('/api/cart/menu-items/', {'menuitem': self.pizza.pk, 'quantity': 800}, format='json')
+        basket = [{'menuitem': self.pasta.pk, 'quantity': 1}, {'menuitem': self.pizza.pk, 'quantity': 50}]
+        response = self.client.post('/api/cart/menu-items/', basket, format='json')  # 850 x 12.00
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['menuitems'], [self.pizza.pk])
+        self.assertEqual(set(self.cart()), {self.pizza.pk})  # la petición entera se deshace
+        self.assertEqual(self.cart()[self.pizza.pk]['quantity'], 800)
+        self.assertEqual(self.client.get('/api/cart/menu-items/').status_code, 200)
+
+    def test_merged_quantity_cannot_exceed_the_column(self):
+        cheap = MenuItem.objects.create(title='Bread', price=Decimal('0.01'), featured=False, category=self.category)
+        self.assertEqual(self.client.post('/api/cart/menu-items/', {'menuitem': cheap.pk, 'quantity': 20000},
+                                          format='json').status_code, 201)
+        response = self.client.post('/api/cart/menu-items/', {'menuitem': cheap.pk, 'quantity': 20000}, format='json')
+        self.assertEqual(response.status_code, 400)
+        # Repetido dentro de la misma petición
+        response = self.client.post('/api/cart/menu-items/', [{'menuitem': self.pasta.pk, 'quantity': 20000}] * 2,
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.cart()[cheap.pk]['quantity'], 20000)
+        self.assertEqual(self.client.post('/api/orders/').status_code, 201)
+
+    def test_invalid_entries(self):
+        for body in ({'menuitem': self.pasta.pk, 'quantity': 0}, {'quantity': 1}, []):
+            with self.subTest(body=body):
+                response = self.client.post('/api/cart/menu-items/', body, format='json')
+                self.assertEqual(response.status_code, 400)
+
+
+class CachedTokenAuthenticationTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login(self.customer)
+        self.client.get('/api/orders/')  # token y roles en caché
+
+    def test_cached_token_skips_the_auth_query(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in captured.captured_queries if 'authtoken_token' in q['sql']])
+        self.assertEqual(response.wsgi_request.user, self.customer)
+
+    def test_process_local_cache_is_not_used_as_the_shared_tier(self):
+        # Con LocMemCache la revocación en otro proceso no llegaría aquí: solo cuenta el LRU local
+        self.assertFalse(authentication.shared_cache_enabled())
+        Token.objects.filter(user=self.customer)._raw_delete(Token.objects.db)  # logout en otro worker
+        self.assertEqual(self.client.get('/api/orders/').status_code, 200)  # LRU local aún vigente
+        clear_token_cache()  # pasa TOKEN_CACHE_LOCAL_TTL
+        self.assertEqual(self.client.get('/api/orders/').status_code, 401)
+
+    def test_logout_revokes_the_token_immediately(self):
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get('/api/orders/').status_code, 401)
+
+    def test_deactivating_the_user_revokes_the_token(self):
+        self.customer.is_active = False
+        self.customer.save()
+        self.assertEqual(self.client.get('/api/orders/').status_code, 401)
+
+    def test_deleting_the_user_revokes_the_token(self):
+        User.objects.get(pk=self.customer.pk).delete()
+        self.assertEqual(self.client.get('/api/orders/').status_code, 401)
+
+    def test_unknown_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + '0' * 40)
+        self.assertEqual(self.client.get('/api/orders/').status_code, 401)
+
+    def test_each_request_gets_a_fresh_user(self):
+        first = self.client.get('/api/orders/').wsgi_request.user
+        second = self.client.get('/api/orders/').wsgi_request.user
+        self.assertIsNot(first, second)
+
+
+class SharedTokenCacheTests(LittleLemonTestCase):
+    # Caché en ficheros: compartida entre procesos como Redis o Memcached. Cada "worker" tiene
+    # su propio LRU local
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        caches_setting = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': self.tmp.name}})
+        caches_setting.enable()
+        self.addCleanup(caches_setting.disable)
+        super().setUp()
+        self.key = Token.objects.create(user=self.customer).key
+        self.login(self.customer)
+
+    def as_worker(self, local_tokens):
+        return mock.patch.object(authentication, '_local_tokens', local_tokens)
+
+    def status(self):
+        return self.client.get('/api/orders/').status_code
+
+    def test_shared_cache_is_used_when_the_local_entry_is_gone(self):
+        self.assertTrue(authentication.shared_cache_enabled())
+        self.client.get('/api/orders/')
+        clear_token_cache()
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get('/api/orders/')
+        self.assertFalse([q for q in captured.captured_queries if 'authtoken_token' in q['sql']])
+
+    def test_revocation_reaches_other_workers_after_their_local_ttl(self):
+        worker_b = LRUCache(100, 5)
+        self.assertEqual(self.status(), 200)  # worker A
+        with self.as_worker(worker_b):
+            self.assertEqual(self.status(), 200)  # worker B, desde la caché compartida
+        self.assertEqual(self.client.post('/api/auth/token/logout/').status_code, 204)  # en A
+        self.assertEqual(self.status(), 401)
+        with self.as_worker(worker_b):
+            self.assertEqual(self.status(), 200)  # B aún tiene su entrada local
+            worker_b.clear()  # pasa TOKEN_CACHE_LOCAL_TTL
+            self.assertEqual(self.status(), 401)
+
+    def test_a_load_that_overlaps_an_invalidation_is_not_stored(self):
+        auth = CachedTokenAuthentication()
+        entry, stamp = auth._cached_entry(self.key)
+        self.assertIsNone(entry)
+        loaded = auth._load(self.key)
+        invalidate_token(self.key)  # p. ej. el usuario se desactiva mientras se leía el token
+        auth._store(self.key, loaded, stamp)
+        self.assertIsNone(auth._cached_entry(self.key)[0])
+        # Con otro LRU (otro worker) tampoco vale la entrada compartida
+        with self.as_worker(LRUCache(100, 5)):
+            self.assertIsNone(auth._cached_entry(self.key)[0])
+
+
+class AsyncReadTests(LittleLemonTestCase):
+    # Bajo ASGI (AsyncClient) los GET van a async_views.py; la salida debe ser la de las vistas DRF
+    def setUp(self):
+        super().setUp()
+        self.fill_cart(self.customer, 3)
+        self.create_order(delivery_crew=self.crew)
+        self.create_order()
+
+    def aget(self, url, user=None, **headers):
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            headers['Authorization'] = f'Token {token.key}'
+        return async_to_sync(self.async_client.get)(url, headers=headers)
+
+    def test_reads_match_the_sync_views(self):
+        urls = [
+            (self.customer, '/api/menu-items/'),
+            (self.customer, '/api/menu-items/?ordering=-price&page=2'),
+            (self.customer, '/api/menu-items/?category=mains'),
+            (self.customer, '/api/menu-items/?search=piz'),
+            (self.customer, f'/api/menu-items/{self.pizza.pk}/'),
+            (self.customer, '/api/menu-items/999999/'),
+            (self.customer, '/api/categories/'),
+            (self.customer, '/api/cart/menu-items/'),
+            (self.customer, '/api/cart/menu-items/?expand=menuitem,category&fields=id,menuitem'),
+            (self.customer, '/api/cart/menu-items/?fields=nope'),
+            (self.customer, '/api/menu-items/?expand=category&fields=title,category'),
+            (self.customer, f'/api/menu-items/{self.pizza.pk}/?expand=category'),
+            (self.customer, '/api/orders/?page_size=1'),
+            (self.manager, '/api/orders/?expand=delivery_crew&fields=total,delivery_crew'),
+            (self.crew, '/api/orders/'),
+            (self.manager, '/api/orders/'),
+            (self.crew, '/api/cart/menu-items/'),
+            (None, '/api/orders/'),
+        ]
+        for user, url in urls:
+            with self.subTest(url=url, user=user):
+                cache.clear()
+                self.client.credentials()
+                if user is not None:
+                    self.login(user)
+                expected = self.client.get(url, HTTP_ACCEPT='application/json')
+                cache.clear()
+                response = self.aget(url, user)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(json.loads(response.content), expected.json())
+
+    def test_get_is_served_by_the_async_views(self):
+        response = self.aget('/api/menu-items/', self.customer)
+        self.assertIs(response.asgi_request.resolver_match.func.view_class, async_views.MenuItemView)
+
+    def test_writes_and_browsable_api_stay_on_the_sync_views(self):
+        token, _ = Token.objects.get_or_create(user=self.customer)
+        response = async_to_sync(self.async_client.post)(
+            '/api/cart/menu-items/', {'menuitem': self.pasta.pk, 'quantity': 1},
+            content_type='application/json', headers={'Authorization': f'Token {token.key}'})
+        self.assertEqual(response.status_code, 201)
+        response = self.aget('/api/menu-items/', self.customer, Accept='text/html')
+        self.assertIs(response.asgi_request.resolver_match.func.view_class, views.MenuItemView)
+
+    def test_authentication_errors(self):
+        response = self.aget('/api/orders/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        self.assertEqual(self.aget('/api/orders/', Authorization='Token ' + '0' * 40).status_code, 401)
+
+    def test_session_authentication(self):
+        self.async_client.force_login(self.customer)
+        self.assertEqual(self.aget('/api/cart/menu-items/').status_code, 200)
+
+    def test_catalog_cache_and_conditional_get(self):
+        first = self.aget('/api/menu-items/', self.customer)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(self.aget('/api/menu-items/', self.customer)['X-Cache'], 'HIT')
+        response = self.aget('/api/menu-items/', self.customer, If_None_Match=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(QUERY_STATS_HEADERS=True)
+    def test_queries_are_counted_under_asgi(self):
+        reset_query_stats()
+        response = self.aget('/api/orders/', self.customer)
+        self.assertLessEqual(int(response['X-Query-Count']), QUERY_BUDGETS['orders'])
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        self.assertEqual(query_stats()['orders']['requests'], 1)
+
+
+class ResponseCompressionTests(LittleLemonTestCase):
+    def setUp(self):
+        super().setUp()
+        for _ in range(40):
+            self.create_order(items=((self.pasta, 2), (self.pizza, 1)))
+        self.login(self.customer)
+
+    def test_compact_renderer_matches_drf(self):
+        data = {
+            'price': Decimal('9.50'), 'date': datetime.date(2024, 5, 1),
+            'at': datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+            'title': 'Pa\u00f1uelo \u2028', 'items': [1, None, True], 'nested': {'a': 1.5},
+        }
+        self.assertEqual(CompactJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(CompactJSONRenderer().render(data, 'application/json; indent=2'),
+                         JSONRenderer().render(data, 'application/json; indent=2'))
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate, br'), 'gzip')
+        self.assertEqual(negotiate_encoding('deflate;q=1.0, gzip;q=0.5'), 'deflate')
+        self.assertEqual(negotiate_encoding('gzip;q=0, *;q=0.1'), 'deflate')
+        self.assertIsNone(negotiate_encoding('br, identity'))
+        self.assertIsNone(negotiate_encoding(''))
+
+    def test_large_responses_are_compressed(self):
+        url = '/api/orders/?page_size=40'
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        compressed = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(compressed['Content-Length'], str(len(compressed.content)))
+        self.assertLess(len(compressed.content), len(plain.content) // 3)
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+
+        deflated = self.client.get(url, HTTP_ACCEPT_ENCODING='deflate')
+        self.assertEqual(deflated['Content-Encoding'], 'deflate')
+        self.assertEqual(zlib.decompress(deflated.content), plain.content)
+
+    def test_compressed_etags_are_weak(self):
+        response = HttpResponse(b'[' + b'1,' * 1000 + b'1]', content_type='application/json', headers={'ETag': '"v1"'})
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = CompressionMiddleware(lambda request: response)(request)
+        self.assertEqual((response['Content-Encoding'], response['ETag']), ('gzip', 'W/"v1"'))
+
+    def test_html_responses_are_not_compressed(self):
+        # La API navegable incluye el token CSRF (BREACH)
+        response = HttpResponse(b'<html>' + b'<p>csrf</p>' * 1000 + b'</html>', content_type='text/html; charset=utf-8')
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = CompressionMiddleware(lambda request: response)(request)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.client.get('/api/orders/?page_size=2', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertLess(len(response.content), settings.COMPRESSION_MIN_SIZE)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_streaming_exports_are_compressed(self):
+        self.login(self.manager)
+        plain = b''.join(self.client.get('/api/orders/export/').streaming_content)
+        response = self.client.get('/api/orders/export/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    @override_settings(COMPRESSION_ENABLED=False)
+    def test_can_be_disabled(self):
+        response = self.client.get('/api/orders/?page_size=40', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+
+class SeedDataTests(LittleLemonTestCase):
+    def test_credentials_are_not_derived_from_the_seed(self):
+        volumes = {'categories': 1, 'menu_items': 2, 'managers': 1, 'delivery_crew': 1, 'customers': 2,
+                   'orders': 3, 'carts': 1}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'credentials.json')
+            call_command('seed_data', *[f"--{name.replace('_', '-')}={count}" for name, count in volumes.items()],
+                         '--seed=1', f'--credentials={path}', stdout=io.StringIO())
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+            with open(path) as fh:
+                first = json.load(fh)
+            call_command('seed_data', *[f"--{name.replace('_', '-')}={count}" for name, count in volumes.items()],
+                         '--seed=1', f'--credentials={path}', stdout=io.StringIO())
+            with open(path) as fh:
+                second = json.load(fh)
+        self.assertNotEqual(first['password'], second['password'])
+        self.assertFalse(set(first['tokens']['manager']) & set(second['tokens']['manager']))
+        manager = Token.objects.get(key=first['tokens']['manager'][0]).user
+        self.assertTrue(manager.check_password(first['password']))
+        self.assertFalse(manager.check_password('littlelemon'))
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    def test_production_pragmas_are_applied_to_new_connections(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            wrapper = SQLiteDatabaseWrapper({
+                **connection.settings_dict,
+                'NAME': os.path.join(tmp, 'profile.sqlite3'),
+                'OPTIONS': {'init_command': '; '.join(settings.SQLITE_PRODUCTION_PRAGMAS)},
+            }, alias='profile-test')
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA synchronous')
+                    self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], 20000)
+            finally:
+                wrapper.close()
+
+    def test_conn_max_age_is_zero_under_asgi(self):
+        def conn_max_age(entry_point, **env):
+            environ = {key: value for key, value in os.environ.items() if key != 'LITTLELEMON_CONN_MAX_AGE'}
+            code = (f'import {entry_point}; from django.conf import settings; '
+                    f"print(settings.DATABASES['default']['CONN_MAX_AGE'])")
+            result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                    cwd=settings.BASE_DIR, env={**environ, 'LITTLELEMON_DB_PROFILE': 'production', **env})
+            return int(result.stdout.strip())
+
+        self.assertEqual(conn_max_age('LittleLemon.wsgi'), 600)
+        self.assertEqual(conn_max_age('LittleLemon.asgi'), 0)
+        self.assertEqual(conn_max_age('LittleLemon.asgi', LITTLELEMON_CONN_MAX_AGE='60'), 60)
+
+    def test_browsable_api_is_off_in_production(self):
+        browsable = BrowsableAPIRenderer in api_settings.DEFAULT_RENDERER_CLASSES
+        self.assertEqual(browsable, settings.DATABASE_PROFILE != 'production')
+        self.assertIs(api_settings.DEFAULT_RENDERER_CLASSES[0], CompactJSONRenderer)
+
+    def test_retry_on_busy(self):
+        handler = mock.Mock(side_effect=[OperationalError('database is locked'), 'ok'])
+        with override_settings(DB_BUSY_BACKOFF=0):
+            self.assertEqual(retry_on_busy(handler)(), 'ok')
+        self.assertEqual(handler.call_count, 2)
+
+    def test_retry_on_busy_gives_up(self):
+        handler = mock.Mock(side_effect=OperationalError('database is locked'))
+        with override_settings(DB_BUSY_BACKOFF=0, DB_BUSY_RETRIES=2):
+            with self.assertRaises(OperationalError):
+                retry_on_busy(handler)()
+        self.assertEqual(handler.call_count, 3)
+
+    def test_other_errors_are_not_retried(self):
+        handler = mock.Mock(side_effect=OperationalError('no such table: foo'))
+        with self.assertRaises(OperationalError):
+            retry_on_busy(handler)()
+        self.assertEqual(handler.call_count, 1)
@@ -1,18 +1,25 @@
 from django.urls import include, path
 from . import views
+from .roles import MANAGER, DELIVERY_CREW
 
 urlpatterns = [
     path('auth/', include('djoser.urls')),                  # Registro, login, logout, etc.
     path('auth/', include('djoser.urls.authtoken')),        # Para login por token
-    path('groups/manager/users', views.ManagerGroupView.as_view()),  # Vista para obtener usuarios del grupo Manager
-    path('groups/manager/users/<int:user_id>', views.RemoveManagerUserView.as_view()),  # Vista para eliminar usuario del grupo Manager
-    path('groups/delivery-crew/users', views.DeliveryGroupView.as_view()),  # Vista para obtener usuarios del grupo Delivery-crew
-    path('groups/delivery-crew/users/<int:user_id>', views.RemoveDeliveryUserView.as_view()),  # Vista para eliminar usuario del grupo Delivery-crew
+    path('groups/manager/users', views.ManagerGroupView.as_view(), name='manager-users'),  # Vista para obtener usuarios del grupo Manager
+    path('groups/manager/users/<int:user_id>', views.RemoveManagerUserView.as_view(), name='manager-user-detail'),  # Vista para eliminar usuario del grupo Manager
+    path('groups/manager/users/bulk', views.GroupMembersBulkView.as_view(group_name=MANAGER), name='manager-users-bulk'),  # Altas, bajas y sustitución en bloque del grupo Manager
+    path('groups/delivery-crew/users', views.DeliveryGroupView.as_view(), name='delivery-crew-users'),  # Vista para obtener usuarios del grupo Delivery-crew
+    path('groups/delivery-crew/users/<int:user_id>', views.RemoveDeliveryUserView.as_view(), name='delivery-crew-user-detail'),  # Vista para eliminar usuario del grupo Delivery-crew
+    path('groups/delivery-crew/users/bulk', views.GroupMembersBulkView.as_view(group_name=DELIVERY_CREW), name='delivery-crew-users-bulk'),  # Igual para Delivery crew
     path('menu-items/', views.MenuItemView.as_view(), name='menu-items'),  # Vista para MenuItem
     path('menu-items/<int:pk>/', views.MenuItemDetailView.as_view(), name='menu-item-detail'),  # Vista para detalle de MenuItem
     path('cart/menu-items/', views.CartView.as_view(), name='cart'),
     path('orders/', views.OrderView.as_view(), name='orders'),
+    path('orders/export/', views.OrderExportView.as_view(), name='orders-export'),  # Exportación en streaming (NDJSON/CSV) para managers
+    path('orders/bulk/', views.OrderBulkUpdateView.as_view(), name='orders-bulk'),  # Asignación y estado de varios pedidos a la vez (managers)
     path('orders/<int:pk>/', views.OrderItemView.as_view(), name='order-detail'),  # Vista para detalle de Order
-    path('categories/', views.CategoryView.as_view(), name='categories')
+    path('categories/', views.CategoryView.as_view(), name='categories'),
+    path('stats/', views.StatsView.as_view(), name='stats'),  # Estadísticas en proceso (queries por endpoint, caché del catálogo)
+    path('reports/sales/', views.SalesReportView.as_view(), name='sales-report'),  # Ventas por día y menuitems más vendidos (managers)
 
 ]
\ No newline at end of file
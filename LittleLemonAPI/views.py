@@ -1,15 +1,35 @@
+import datetime
+from decimal import Decimal
+
+from django.db.models import Prefetch, Sum
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, BasePermission
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth.models import User, Group
-from .models import MenuItem, Category, Order, OrderItem, Cart
-from .serializers import MenuItemSerializer, CategorySerializer, OrderSerializer, OrderItemSerializer, CartSerializer
+from .models import MenuItem, Category, Order, OrderItem, Cart, SalesRollup, DailySalesRollup
+from .serializers import MenuItemSerializer, CategorySerializer, OrderSerializer, OrderItemSerializer, CartSerializer, CartEntrySerializer
+from .serializers import OrderDetailSerializer, OrderUpdateEntrySerializer, UserIdsSerializer
+from .serializers import menu_item_reader, cart_reader, order_reader
 from rest_framework import generics
 from rest_framework.filters import OrderingFilter
 from django.utils import timezone
 from django.core.exceptions import PermissionDenied
+from .admission import AdmissionControlMixin, admission_stats
+from .bulk_orders import bulk_update_orders, BULK_ORDER_LIMIT
+from .cart import add_to_cart, UnknownMenuItems, CartLimitExceeded, MAX_QUANTITY, MAX_PRICE
+from .catalog import CachedCatalogListMixin, cache_stats
+from .checkout import checkout, EmptyCartError, OrderTotalExceeded
+from .db import retry_on_busy
+from .exports import export_queryset, iter_csv, iter_ndjson
+from .memberships import group_members, update_members, UnknownUsers, ADD, REMOVE, REPLACE
+from .middleware import query_stats
+from .order_totals import update_order_item, DuplicateMenuItem, OrderLimitExceeded, MAX_LINE_PRICE, MAX_ORDER_TOTAL
+from .pagination import KeysetPagination
+from .roles import get_roles, is_manager, is_customer, is_delivery_crew, MANAGER, DELIVERY_CREW
+from .search import MenuItemSearchFilter
 # Create your views here.
 class IsSuperUser(BasePermission):
     def has_permission(self, request, view):
@@ -18,17 +38,46 @@ class IsSuperUser(BasePermission):
 class IsManager(BasePermission):
     def has_permission(self, request, view):
         user = request.user
-        return user.is_authenticated and (user.is_superuser or user.groups.filter(name="Manager").exists())
+        return user.is_authenticated and (user.is_superuser or is_manager(user))
 
 class IsCustomer(BasePermission):
     def has_permission(self, request, view):
         user = request.user
-        return user.is_authenticated and (user.is_superuser or not user.groups.exists())
+        return user.is_authenticated and (user.is_superuser or is_customer(user))
     
 class IsDeliveryCrew(BasePermission):
     def has_permission(self, request, view):
         user = request.user
-        return user.is_authenticated and (user.is_superuser or user.groups.filter(name="Delivery crew").exists())
+        return user.is_authenticated and (user.is_superuser or is_delivery_crew(user))
+
+def visible_orders(user, roles):
+    # Pedidos que puede leer el usuario, o None si su rol no ve ninguno
+    if not roles: #user gets orders only if they are a customer
+        return Order.objects.filter(user=user)
+    if MANAGER in roles: #Managers can see all orders
+        return Order.objects.all()
+    if DELIVERY_CREW in roles: #Delivery crew can see their own orders
+        return Order.objects.filter(delivery_crew=user)
+    return None
+
+def order_detail(orders, pk):
+    # El pedido y sus líneas con el título de cada plato en dos queries, sea cual sea el número
+    # de líneas: la del pedido y la del Prefetch (líneas con JOIN a menuitem, solo las columnas usadas)
+    lines = OrderItem.objects.select_related('menuitem').only(
+        'order', 'menuitem__title', 'quantity', 'unit_price', 'price').order_by('id')
+    return orders.prefetch_related(Prefetch('orderitem_set', queryset=lines, to_attr='lines')).get(pk=pk)
+
+class ValuesListMixin:
+    # list() de solo lectura con un ValuesReader en vez del serializer (misma salida, sin instanciar modelos)
+    values_reader = None
+
+    def list(self, request, *args, **kwargs):
+        shape = self.values_reader.shape(request.query_params)  # ?fields= y ?expand=
+        queryset = self.values_reader.values(self.filter_queryset(self.get_queryset()), shape)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.values_reader.to_representation(page, shape))
+        return Response(self.values_reader.to_representation(queryset, shape))
 
 #Manager API views
 class ManagerGroupView(APIView):
@@ -40,10 +89,9 @@ class ManagerGroupView(APIView):
         except Group.DoesNotExist:
             return Response({"error": "Group Manager not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        users = group.user_set.all()
-        data = [{"id": u.id, "username": u.username} for u in users]
-        return Response(data)
+        return Response(group_members(group))
     
+    @retry_on_busy
     def post(self, request):
         user_id = request.data.get("user_id")
         try:
@@ -59,6 +107,7 @@ class ManagerGroupView(APIView):
 class RemoveManagerUserView(APIView):
     permission_classes = [IsAuthenticated, IsManager]
 
+    @retry_on_busy
     def delete(self, request, user_id):
         try:
             user = User.objects.get(id=user_id)
@@ -82,10 +131,9 @@ class DeliveryGroupView(APIView):
         except Group.DoesNotExist:
             return Response({"error": "Group Delivery crew not found"}, status=status.HTTP_404_NOT_FOUND)
         
-        users = group.user_set.all()
-        data = [{"id": u.id, "username": u.username} for u in users]
-        return Response(data)   
+        return Response(group_members(group))   
     
+    @retry_on_busy
     def post(self, request):
         user_id = request.data.get("user_id")
         try:
@@ -104,6 +152,7 @@ class DeliveryGroupView(APIView):
 class RemoveDeliveryUserView(APIView):
     permission_classes = [IsAuthenticated, IsManager]
 
+    @retry_on_busy
     def delete(self, request, user_id):
         try:
             user = User.objects.get(id=user_id)
@@ -118,12 +167,48 @@ class RemoveDeliveryUserView(APIView):
         group.user_set.remove(user)
         return Response({"message": "User removed from Delivery crew group"}, status=status.HTTP_200_OK)
 
+class GroupMembersBulkView(APIView):
+    # Altas (POST), bajas (DELETE) y sustitución (PUT) de muchos miembros de un grupo a la vez
+    permission_classes = [IsAuthenticated, IsManager]
+    group_name = None
+
+    def update(self, request, mode):
+        serializer = UserIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = serializer.validated_data['user_ids']
+        if not user_ids and mode != REPLACE:  # PUT con lista vacía vacía el grupo
+            return Response({"error": "No users given"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            group = Group.objects.get(name=self.group_name)
+        except Group.DoesNotExist:
+            return Response({"error": f"Group {self.group_name} not found"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            added, removed = update_members(group, user_ids, mode)
+        except UnknownUsers as exc:
+            return Response({"error": "User not found", "users": exc.ids}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"added": added, "removed": removed, "users": group_members(group)})
+
+    @retry_on_busy
+    def post(self, request):
+        return self.update(request, ADD)
+
+    @retry_on_busy
+    def put(self, request):
+        return self.update(request, REPLACE)
+
+    @retry_on_busy
+    def delete(self, request):
+        return self.update(request, REMOVE)
+
 #API views for MenuItem
 
-class MenuItemView(generics.ListCreateAPIView):  
+class MenuItemView(CachedCatalogListMixin, ValuesListMixin, generics.ListCreateAPIView):
+    catalog_cache_prefix = 'menu-items'
     serializer_class = MenuItemSerializer
+    values_reader = menu_item_reader
     queryset = MenuItem.objects.all()
-    filter_backends = [OrderingFilter]  # habilita ordenación
+    filter_backends = [MenuItemSearchFilter, OrderingFilter]  # ?search= (FTS5) y ordenación
     ordering_fields = ['price']  # campos por los que se puede ordenar
     ordering = ['id']  # orden por defecto
 
@@ -139,6 +224,10 @@ class MenuItemView(generics.ListCreateAPIView):
         if self.request.method == 'POST':
             return [IsAuthenticated(), IsManager()]
         return [IsAuthenticated()]
+
+    @retry_on_busy
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
     
 
 class MenuItemDetailView(APIView):
@@ -150,13 +239,14 @@ class MenuItemDetailView(APIView):
         return [IsAuthenticated()]
 
     def get(self, request, pk):
+        shape = menu_item_reader.shape(request.query_params)
         try:
-            menu_item = MenuItem.objects.get(pk=pk)
-            serializer = MenuItemSerializer(menu_item)
-            return Response(serializer.data)
+            row = menu_item_reader.values(MenuItem.objects.filter(pk=pk), shape).get()
         except MenuItem.DoesNotExist:
             return Response({"error": "Menu item not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(menu_item_reader.to_representation([row], shape)[0])
 
+    @retry_on_busy
     def put(self, request, pk):
         try:
             menu_item = MenuItem.objects.get(pk=pk)
@@ -168,6 +258,7 @@ class MenuItemDetailView(APIView):
         except MenuItem.DoesNotExist:
             return Response({"error": "Menu item not found"}, status=status.HTTP_404_NOT_FOUND)
         
+    @retry_on_busy
     def patch(self, request, pk):
         try:
             menu_item = MenuItem.objects.get(pk=pk)
@@ -179,6 +270,7 @@ class MenuItemDetailView(APIView):
         except MenuItem.DoesNotExist:
             return Response({"error": "Menu item not found"}, status=status.HTTP_404_NOT_FOUND)
 
+    @retry_on_busy
     def delete(self, request, pk):
         try:
             menu_item = MenuItem.objects.get(pk=pk)
@@ -187,41 +279,51 @@ class MenuItemDetailView(APIView):
         except MenuItem.DoesNotExist:
             return Response({"error": "Menu item not found"}, status=status.HTTP_404_NOT_FOUND)
 
-class CartView(APIView):
+class CartView(AdmissionControlMixin, APIView):
     permission_classes = [IsAuthenticated, IsCustomer]
     serializer_class = CartSerializer
 
     def get(self, request):
         user = request.user
         cart_items = Cart.objects.filter(user=user)
-        serializer = self.serializer_class(cart_items, many=True)
-        return Response(serializer.data)
+        # ?expand=menuitem,category trae los platos (y su categoría) en la misma query
+        return Response(cart_reader.read(cart_items, cart_reader.shape(request.query_params)))
     
+    @retry_on_busy
     def post(self, request):
         user = request.user
-        data = request.data.copy()
-
+        many = isinstance(request.data, list)
+        entries = CartEntrySerializer(data=request.data, many=many)
+        entries.is_valid(raise_exception=True)
+        lines = entries.validated_data if many else [entries.validated_data]
+        if not lines:
+            return Response({"error": "No items to add"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Todas las líneas en una transacción: una query de menuitems y un upsert que suma cantidades
         try:
-            menuitem = MenuItem.objects.get(id=data['menuitem'])
-        except MenuItem.DoesNotExist:
-            return Response({"error": "Menu item not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        quantity = int(data['quantity'])
-        unit_price = menuitem.price
-        price = unit_price * quantity
-
-        cart_item = Cart(user=user, menuitem=menuitem, quantity=quantity, unit_price=unit_price, price=price)
-        cart_item.save()
+            add_to_cart(user, [(line['menuitem'], line['quantity']) for line in lines])
+        except UnknownMenuItems as exc:
+            return Response({"error": "Menu item not found", "menuitems": exc.ids}, status=status.HTTP_404_NOT_FOUND)
+        except CartLimitExceeded as exc:
+            return Response({
+                "error": f"A cart line cannot exceed {MAX_QUANTITY} units or a price of {MAX_PRICE}",
+                "menuitems": exc.ids,
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if many:
+            return Response({"message": "Items added to cart"}, status=status.HTTP_201_CREATED)
         return Response({"message": "Item added to cart"}, status=status.HTTP_201_CREATED)
 
+    @retry_on_busy
     def delete(self, request):
         user = request.user
         Cart.objects.filter(user=user).delete()
         return Response({"message": "Cart cleared"}, status=status.HTTP_204_NO_CONTENT)
     
 
-class OrderView(APIView):
+class OrderView(AdmissionControlMixin, APIView):
     serializer_class = OrderSerializer
+    pagination_class = KeysetPagination
 
     def get_permissions(self):
         if self.request.method in ['POST']:
@@ -230,54 +332,75 @@ class OrderView(APIView):
 
     def get(self, request):
         user = request.user
-        if not user.groups.exists(): #user gets orders only if they are a customer
-            orders = Order.objects.filter(user=user)
-            serializer = self.serializer_class(orders, many=True)
-            return Response(serializer.data)
-        elif user.groups.filter(name="Manager").exists(): #Managers can see all orders
-            orders = Order.objects.all()
-            serializer = self.serializer_class(orders, many=True)
-            return Response(serializer.data)
-        elif user.groups.filter(name="Delivery crew").exists(): #Delivery crew can see their own orders
-
-            delivery_crew_group = Group.objects.get(name='Delivery crew')
-            delivery_crew_users = delivery_crew_group.user_set.all()
+        shape = order_reader.shape(request.query_params)
+        orders = visible_orders(user, get_roles(user))
+        if orders is None:
+            return Response([])
 
-            orders = Order.objects.filter(delivery_crew__in=delivery_crew_users)
-            serializer = self.serializer_class(orders, many=True)
-            return Response(serializer.data)
+        # Paginación por cursor (date, id) para no serializar todo el historial de golpe
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(order_reader.values(orders, shape), request, view=self)
+        return paginator.get_paginated_response(order_reader.to_representation(page, shape))
 
+    @retry_on_busy
     def post(self, request):    #Only for customers
         user = request.user
         if not user.is_authenticated:
             return Response({"error": "Debes iniciar sesión"}, status=status.HTTP_401_UNAUTHORIZED)
 
-        cart_items = Cart.objects.filter(user=user)
-        if not cart_items.exists():
+        # 🔹 Crear la orden y sus OrderItem a partir del carrito, y vaciarlo (atómico)
+        try:
+            order = checkout(user)
+        except EmptyCartError:
             return Response({"error": "El carrito está vacío"}, status=status.HTTP_400_BAD_REQUEST)
+        except OrderTotalExceeded:
+            return Response({"error": f"An order total cannot exceed {MAX_ORDER_TOTAL}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = OrderSerializer(order)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+class OrderBulkUpdateView(APIView):
+    # Reasignación y cambios de estado de muchos pedidos en una petición (managers)
+    permission_classes = [IsAuthenticated, IsManager]
 
-        # 🔹 Calcular total de todos los items
-        total = sum(item.menuitem.price * item.quantity for item in cart_items)
+    @retry_on_busy
+    def patch(self, request):
+        entries = OrderUpdateEntrySerializer(data=request.data, many=True, allow_empty=False, max_length=BULK_ORDER_LIMIT)
+        entries.is_valid(raise_exception=True)
+        results = bulk_update_orders(entries.validated_data)
+        updated = sum('error' not in result for result in results)
+        return Response({"updated": updated, "results": results})
 
-        # 🔹 Crear UNA sola orden
-        order = Order.objects.create(user=user, total=total)
 
-        # 🔹 Crear OrderItem para cada producto en el carrito
-        for item in cart_items:
-            OrderItem.objects.create(
-            order=order,
-            menuitem=item.menuitem,
-            quantity=item.quantity,
-            unit_price=item.menuitem.price,           
-            price=item.menuitem.price * item.quantity
-        )   
+class OrderExportView(APIView):
+    permission_classes = [IsAuthenticated, IsManager]
 
-        # 🔹 Vaciar el carrito
-        cart_items.delete()
+    # ?output=ndjson|csv (no se usa ?format, que DRF reserva para elegir renderer)
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in ('ndjson', 'csv'):
+            return Response({"error": "output must be 'ndjson' or 'csv'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = {}
+        try:
+            for param in ('date_from', 'date_to'):
+                if param in request.query_params:
+                    filters[param] = datetime.date.fromisoformat(request.query_params[param])
+        except ValueError:
+            return Response({"error": "Dates must use the YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST)
+        if 'status' in request.query_params:
+            if request.query_params['status'] not in ('0', '1'):
+                return Response({"error": "Status must be 0 or 1"}, status=status.HTTP_400_BAD_REQUEST)
+            filters['status'] = request.query_params['status'] == '1'
+
+        orders = export_queryset(**filters)
+        if output == 'csv':
+            response = StreamingHttpResponse(iter_csv(orders), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="orders.csv"'
+        else:
+            response = StreamingHttpResponse(iter_ndjson(orders), content_type='application/x-ndjson')
+        return response
 
-        serializer = OrderSerializer(order)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
-    
 class OrderItemView(APIView):
     serializer_class = OrderItemSerializer
 
@@ -287,17 +410,21 @@ class OrderItemView(APIView):
         return [IsAuthenticated()]
 
     def get(self, request, pk):
-        user = request.user
-        order = Order.objects.get(pk=pk, user=user)
-        if not user.groups.exists(): #user gets his orders only if they are a customer
-            order_items = OrderItem.objects.filter(order=order)
-            serializer = self.serializer_class(order_items, many=True)
-            return Response(serializer.data)
-        
+        # Cliente (sus pedidos), manager (todos) o repartidor (los asignados); el resto, 404
+        orders = visible_orders(request.user, get_roles(request.user))
+        try:
+            if orders is None:
+                raise Order.DoesNotExist
+            order = order_detail(orders, pk)
+        except Order.DoesNotExist:
+            return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(OrderDetailSerializer(order).data)
     
+    @retry_on_busy
     def put(self, request, pk):
         user = request.user
-        if not user.groups.exists():  # Solo usuarios sin grupos (clientes)
+        roles = get_roles(user)
+        if not roles:  # Solo usuarios sin grupos (clientes)
             try:
                 order_item = OrderItem.objects.get(pk=pk, order__user=user)
             except OrderItem.DoesNotExist:
@@ -305,11 +432,16 @@ class OrderItemView(APIView):
         
             serializer = OrderItemSerializer(order_item, data=request.data, partial=False)  # para PUT usa partial=False
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            try:
+                update_order_item(order_item, serializer.validated_data)  # total, item_count y rollups por deltas
+            except DuplicateMenuItem:
+                return Response({"error": "The order already contains this menu item"}, status=400)
+            except OrderLimitExceeded:
+                return Response({"error": f"An order line cannot exceed a price of {MAX_LINE_PRICE} nor an order a total of {MAX_ORDER_TOTAL}"}, status=400)
 
             return Response(serializer.data, status=status.HTTP_200_OK)
         
-        elif user.groups.filter(name="Manager").exists():
+        elif MANAGER in roles:
             try:
                 order = Order.objects.get(pk=pk)
             except Order.DoesNotExist:
@@ -334,9 +466,11 @@ class OrderItemView(APIView):
             return Response(serializer.data)
         
     
+    @retry_on_busy
     def patch(self, request, pk):
         user = request.user
-        if not user.groups.exists():  # Solo usuarios sin grupos (clientes)
+        roles = get_roles(user)
+        if not roles:  # Solo usuarios sin grupos (clientes)
             try:
              order_item = OrderItem.objects.get(pk=pk, order__user=user)
             except OrderItem.DoesNotExist:
@@ -344,11 +478,16 @@ class OrderItemView(APIView):
             
             serializer = OrderItemSerializer(order_item, data=request.data, partial=True)  # para PATCH partial=True
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            try:
+                update_order_item(order_item, serializer.validated_data)  # total, item_count y rollups por deltas
+            except DuplicateMenuItem:
+                return Response({"error": "The order already contains this menu item"}, status=400)
+            except OrderLimitExceeded:
+                return Response({"error": f"An order line cannot exceed a price of {MAX_LINE_PRICE} nor an order a total of {MAX_ORDER_TOTAL}"}, status=400)
             
             return Response(serializer.data)
         
-        elif user.groups.filter(name="Manager").exists():
+        elif MANAGER in roles:
             try:
                 order = Order.objects.get(pk=pk)
             except Order.DoesNotExist:
@@ -371,7 +510,7 @@ class OrderItemView(APIView):
             serializer.save()
 
             return Response(serializer.data)
-        elif user.groups.filter(name="Delivery crew").exists():
+        elif DELIVERY_CREW in roles:
             try:
                 delivery_crew_group = Group.objects.get(name="Delivery crew")
                 delivery_crew_users = delivery_crew_group.user_set.all()
@@ -400,9 +539,10 @@ class OrderItemView(APIView):
 
     # Solo los managers pueden eliminar una orden
 
+    @retry_on_busy
     def delete(self, request, pk):
         user = request.user
-        if not user.groups.filter(name="Manager").exists():
+        if not is_manager(user):
             return Response({"error": "You do not have permission to delete this order"}, status=403)
 
         try:
@@ -413,7 +553,73 @@ class OrderItemView(APIView):
         order.delete()
         return Response(status=204)
 
-class CategoryView(generics.ListAPIView):
+class CategoryView(CachedCatalogListMixin, generics.ListAPIView):
+    catalog_cache_prefix = 'categories'
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
-    permission_classes = [IsAuthenticated]
\ No newline at end of file
+    permission_classes = [IsAuthenticated]
+
+class StatsView(APIView):
+    permission_classes = [IsAuthenticated, IsManager]
+
+    def get(self, request):
+        return Response({
+            "queries": query_stats(),
+            "catalog_cache": cache_stats(),
+            "admission": admission_stats(),
+        })
+
+class SalesReportView(APIView):
+    permission_classes = [IsAuthenticated, IsManager]
+    default_days = 30
+    max_top = 100
+
+    # Solo lee los rollups (por día y por día/menuitem): el coste depende del rango pedido,
+    # no del número de pedidos históricos
+    def get(self, request):
+        # Por defecto, los últimos 30 días (Order.date se guarda con date.today())
+        try:
+            date_to = datetime.date.today()
+            if 'date_to' in request.query_params:
+                date_to = datetime.date.fromisoformat(request.query_params['date_to'])
+            date_from = date_to - datetime.timedelta(days=self.default_days - 1)
+            if 'date_from' in request.query_params:
+                date_from = datetime.date.fromisoformat(request.query_params['date_from'])
+        except ValueError:
+            return Response({"error": "Dates must use the YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST)
+        if date_from > date_to:
+            return Response({"error": "date_from must not be after date_to"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            top = min(max(int(request.query_params.get('top', 10)), 1), self.max_top)
+        except ValueError:
+            return Response({"error": "top must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        days = list(
+            DailySalesRollup.objects.filter(date__range=(date_from, date_to))
+            .order_by('date').values('date', 'orders', 'revenue')
+        )
+        top_items = list(
+            SalesRollup.objects.filter(date__range=(date_from, date_to))
+            .values('menuitem', 'menuitem__title')
+            .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+            .order_by('-quantity', 'menuitem')[:top]
+        )
+        return Response({
+            "date_from": date_from,
+            "date_to": date_to,
+            "orders": sum(day['orders'] for day in days),
+            "revenue": self.money(sum(day['revenue'] for day in days)),
+            "days": [
+                {"date": day['date'], "orders": day['orders'], "revenue": self.money(day['revenue'])}
+                for day in days
+            ],
+            "top_menu_items": [
+                {"menuitem": item['menuitem'], "title": item['menuitem__title'],
+                 "quantity": item['quantity'], "revenue": self.money(item['revenue'])}
+                for item in top_items
+            ],
+        })
+
+    def money(self, value):
+        # Importes como los DecimalField de los serializers: string con 2 decimales
+        return str(Decimal(value).quantize(Decimal('0.01')))